@@ -5,8 +5,9 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from dotenv import load_dotenv
 load_dotenv()  
 
-from flask import Flask, jsonify, render_template
+from flask import Flask, jsonify, render_template, request
 from flask_cors import CORS
+import click
 from config import Config
 
 def create_app(config_class=Config):
@@ -15,19 +16,33 @@ def create_app(config_class=Config):
                 static_folder='../static')
     app.config.from_object(config_class)
     
+    from api.json_provider import FastJSONProvider
+    app.json = FastJSONProvider(app)
+    
     CORS(app)
     
-    os.makedirs('data/cache/weather', exist_ok=True)
-    os.makedirs('data/cache/geo', exist_ok=True)
-    os.makedirs('data/cache/reports', exist_ok=True)
+    # instrumentation first: its after_request hook then runs last and times the others too
+    from api import instrumentation, middleware
+    instrumentation.init_app(app)
+    middleware.init_app(app)
+    
+    os.makedirs(config_class.REPORTS_DIR, exist_ok=True)
     os.makedirs('data/db', exist_ok=True)
     
-    from api.routes import offices, devices, analytics, external
+    from api.routes import offices, devices, analytics, external, poller, stream, batch, metrics
     
     app.register_blueprint(offices.bp)
     app.register_blueprint(devices.bp)
     app.register_blueprint(analytics.bp)
     app.register_blueprint(external.bp)
+    app.register_blueprint(poller.bp)
+    app.register_blueprint(stream.bp)
+    app.register_blueprint(batch.bp)
+    app.register_blueprint(metrics.bp)
+    
+    if config_class.PERF_DEBUG_ENABLED:
+        from api.routes import debug
+        app.register_blueprint(debug.bp)
     
     try:
         from api.routes import snmp
@@ -36,6 +51,39 @@ def create_app(config_class=Config):
     except ImportError:
         print("⚠️  SNMP monitoring not available (optional feature)")
     
+    from api.services.metrics_store import latest_metrics
+    from api.services.fleet_frame import fleet_frame
+    from api.services.alert_service import alert_engine
+    latest_metrics.subscribe(fleet_frame.on_sample)
+    latest_metrics.subscribe(alert_engine.on_sample)
+    
+    from api.services.perf_stats import perf
+    from api.services.time_engine import time_engine
+    with perf.timer('load', 'time_zones'):
+        time_engine.warm()
+    
+    from api.services.report_catalog import report_catalog
+    with perf.timer('load', 'report_catalog'):
+        indexed, dropped = report_catalog.sync()
+    if indexed or dropped:
+        print(f"📚 Report catalog: indexed {indexed} files, dropped {dropped} missing")
+    
+    from api.services.stream_service import broadcaster
+    latest_metrics.subscribe(broadcaster.on_sample)
+    alert_engine.subscribe(broadcaster.on_alert)
+    
+    if app.config['HISTORY_ENABLED']:
+        from api.services.history_store import history_store
+        from api.services.rollup_service import rollup_service
+        history_store.start()
+        rollup_service.start()
+        latest_metrics.subscribe(history_store.on_sample)
+        latest_metrics.subscribe(rollup_service.on_sample)
+    
+    if app.config['POLLER_ENABLED']:
+        from api.services.poller_service import fleet_poller
+        fleet_poller.start()
+    
     @app.route('/')
     def index():
         return render_template('dashboard.html')
@@ -79,6 +127,16 @@ def create_app(config_class=Config):
                     'trends': f"{app.config['API_PREFIX']}/analytics/trends",
                     'health': f"{app.config['API_PREFIX']}/analytics/health-score"
                 },
+                'poller': {
+                    'stats': f"{app.config['API_PREFIX']}/poller/stats"
+                },
+                'stream': {
+                    'events': f"{app.config['API_PREFIX']}/stream",
+                    'stats': f"{app.config['API_PREFIX']}/stream/stats"
+                },
+                'metrics': {
+                    'prometheus': '/metrics'
+                },
                 'external': {
                     'weather': f"{app.config['API_PREFIX']}/external/weather/{{office_id}}",
                     'time': f"{app.config['API_PREFIX']}/external/time/{{office_id}}",
@@ -90,6 +148,7 @@ def create_app(config_class=Config):
                     'cpu': f"{app.config['API_PREFIX']}/snmp/device/{{host}}/cpu",
                     'memory': f"{app.config['API_PREFIX']}/snmp/device/{{host}}/memory",
                     'interface': f"{app.config['API_PREFIX']}/snmp/device/{{host}}/interface/{{index}}",
+                    'interfaces': f"{app.config['API_PREFIX']}/snmp/device/{{host}}/interfaces",
                     'all_metrics': f"{app.config['API_PREFIX']}/snmp/device/{{host}}/metrics"
                 }
             },
@@ -110,6 +169,14 @@ def create_app(config_class=Config):
             'status': 404
         }), 404
     
+    @app.errorhandler(405)
+    def method_not_allowed(error):
+        return jsonify({
+            'error': 'Method not allowed',
+            'message': f'{request.method} is not supported for this URL',
+            'status': 405
+        }), 405
+    
     @app.errorhandler(500)
     def internal_error(error):
         return jsonify({
@@ -132,15 +199,22 @@ def create_app(config_class=Config):
         print("✅ Data initialization complete")
     
     @app.cli.command()
-    def clear_cache():
-        import shutil
-        cache_dirs = ['data/cache/weather', 'data/cache/geo', 'data/cache/reports']
-        for cache_dir in cache_dirs:
-            if os.path.exists(cache_dir):
-                shutil.rmtree(cache_dir)
-                os.makedirs(cache_dir)
+    @click.option('--namespace', default=None, help='Only clear this namespace, e.g. weather')
+    def clear_cache(namespace):
+        from api.services.tiered_cache import cache
+        from api.services.report_catalog import report_catalog
+        removed = cache.clear(namespace)
+        print(f"🗑️  Removed {removed} cached entries")
+        if namespace is None:
+            print(f"🗑️  Removed {report_catalog.clear()} reports")
         print("✅ Cache cleared")
     
+    @app.cli.command()
+    def prune_reports():
+        from api.services.report_catalog import report_catalog
+        removed = report_catalog.prune()
+        print(f"✅ Removed {removed} reports past retention")
+    
     return app
 
 app = create_app()
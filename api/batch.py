@@ -0,0 +1,26 @@
+"""Helpers for endpoints that answer many lookups in one round trip"""
+from concurrent.futures import ThreadPoolExecutor
+from config import Config
+
+# sub-requests of POST /batch and the upstream fetches they fan out to get
+# separate pools, so a batch of batch-style requests can't starve itself
+request_pool = ThreadPoolExecutor(max_workers=Config.BATCH_WORKERS, thread_name_prefix='batch-request')
+fetch_pool = ThreadPoolExecutor(max_workers=Config.BATCH_WORKERS, thread_name_prefix='batch-fetch')
+
+
+def parse_ids(args, name):
+    """Unique ids from ?name=a,b,c in the order given, None when absent"""
+    raw = args.get(name)
+    if raw is None:
+        return None
+    ids = list(dict.fromkeys(part.strip() for part in raw.split(',') if part.strip()))
+    if not ids:
+        raise ValueError(f'{name} must list at least one id')
+    if len(ids) > Config.BATCH_MAX_ITEMS:
+        raise ValueError(f'{name} accepts at most {Config.BATCH_MAX_ITEMS} ids')
+    return ids
+
+
+def run_all(fn, items, pool=None):
+    """fn(item) for every item concurrently, results in input order"""
+    return list((pool or fetch_pool).map(fn, items))
@@ -0,0 +1,120 @@
+"""Request timing, slow-request log and on-demand profiling"""
+from flask import Response, g, request
+from logging.handlers import RotatingFileHandler
+from api.services.perf_stats import perf
+from api.json_provider import dumps
+from datetime import datetime
+from config import Config
+import cProfile
+import logging
+import pstats
+import time
+import io
+import os
+
+try:
+    from pyinstrument import Profiler as SamplingProfiler
+except ImportError:
+    SamplingProfiler = None
+
+slow_log = logging.getLogger('api.slow_requests')
+
+
+def endpoint_name():
+    """METHOD plus the route pattern, so /devices/DEV-1 and /devices/DEV-2 share one histogram"""
+    rule = request.url_rule.rule if request.url_rule is not None else '<unmatched>'
+    return f'{request.method} {rule}'
+
+
+def requested_profiler():
+    """'cprofile', 'pyinstrument' or None, from ?_profile= or the X-Profile header"""
+    if not Config.PERF_DEBUG_ENABLED:
+        return None
+    flag = (request.args.get('_profile') or request.headers.get('X-Profile') or '').lower()
+    if not flag or flag in ('0', 'false', 'no'):
+        return None
+    if flag == 'pyinstrument' and SamplingProfiler is not None:
+        return 'pyinstrument'
+    return 'cprofile'
+
+
+def start_request():
+    g.perf_started = time.perf_counter()
+    kind = requested_profiler()
+    if kind == 'pyinstrument':
+        g.profiler = SamplingProfiler(interval=0.001)
+        g.profiler.start()
+    elif kind == 'cprofile':
+        g.profiler = cProfile.Profile()
+        g.profiler.enable()
+
+
+def profile_report(profiler):
+    if isinstance(profiler, cProfile.Profile):
+        profiler.disable()
+        out = io.StringIO()
+        pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(Config.PROFILE_TOP_FUNCTIONS)
+        return out.getvalue()
+    profiler.stop()
+    return profiler.output_text(unicode=True, color=False)
+
+
+def finish_request(response):
+    """
+    after_request hook, registered first so it runs last.
+
+    The time covers routing, the view and the caching/compression hooks.
+    A streamed body is still being sent at this point, so for those the
+    figure is time to first byte.
+    """
+    started = g.pop('perf_started', None)
+    if started is None:
+        return response
+    elapsed = time.perf_counter() - started
+    endpoint = endpoint_name()
+    perf.observe('endpoint', endpoint, elapsed, response.status_code < 500)
+
+    if elapsed * 1000 >= Config.SLOW_REQUEST_MS:
+        entry = {
+            'ts': datetime.now().isoformat(),
+            'endpoint': endpoint,
+            'path': request.path,
+            'query': request.query_string.decode('utf-8', 'replace'),
+            'status': response.status_code,
+            'duration_ms': round(elapsed * 1000, 2),
+            'bytes': None if response.is_streamed else response.calculate_content_length(),
+            'streamed': response.is_streamed,
+            'remote_addr': request.remote_addr
+        }
+        perf.record_slow(entry)
+        log_slow(entry)
+
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        report = profile_report(profiler)
+        # the profile replaces the body; the original status rides along in a header
+        profiled = Response(report, mimetype='text/plain')
+        profiled.headers['X-Profile-Status'] = str(response.status_code)
+        profiled.headers['X-Profile-Duration-Ms'] = f'{elapsed * 1000:.2f}'
+        return profiled
+    return response
+
+
+def log_slow(entry):
+    # the log file and its directory only appear once there is something to write
+    for handler in slow_log.handlers:
+        if isinstance(handler, logging.FileHandler) and handler.stream is None:
+            os.makedirs(os.path.dirname(handler.baseFilename), exist_ok=True)
+    slow_log.warning(dumps(entry))
+
+
+def init_app(app):
+    app.before_request(start_request)
+    app.after_request(finish_request)
+
+    if not slow_log.handlers:
+        handler = RotatingFileHandler(Config.SLOW_REQUEST_LOG, maxBytes=10 * 1024 * 1024, backupCount=3, delay=True)
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        slow_log.addHandler(handler)
+        slow_log.setLevel(logging.INFO)
+        slow_log.propagate = False
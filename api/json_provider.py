@@ -0,0 +1,200 @@
+"""JSON encoding for responses: orjson when installed, the standard library otherwise"""
+from flask.json.provider import JSONProvider
+from datetime import date, datetime
+from config import Config
+import numpy as np
+import dataclasses
+import decimal
+import secrets
+import time
+import uuid
+import json
+import re
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+ORJSON_OPTIONS = (orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS) if orjson else 0
+
+# local UTC offsets only change on quarter-hour boundaries
+OFFSET_SLOT = 900
+
+
+def format_timestamps(values):
+    """
+    Epoch seconds as local ISO strings, the same text as
+    datetime.fromtimestamp(ts).isoformat(), for a whole column at once.
+
+    The UTC offset is looked up once per quarter hour the values touch
+    rather than once per value, and the formatting is done by NumPy.
+    """
+    ts = np.asarray(values, dtype=np.float64)
+    if ts.size == 0:
+        return []
+
+    whole = np.trunc(ts)
+    micros = np.round((ts - whole) * 1e6).astype(np.int64)
+
+    slots, slot_rows = np.unique(np.floor_divide(whole, OFFSET_SLOT), return_inverse=True)
+    offsets = np.array([time.localtime(slot * OFFSET_SLOT).tm_gmtoff for slot in slots.tolist()], dtype=np.int64)
+
+    local = (whole.astype(np.int64) + offsets[slot_rows]) * 1000000 + micros
+    if not micros.any():
+        return np.datetime_as_string((local // 1000000).astype('datetime64[s]'), unit='s').tolist()
+
+    strings = np.datetime_as_string(local.astype('datetime64[us]'), unit='us').tolist()
+    # isoformat leaves out a zero fraction
+    for row in np.flatnonzero(micros == 0).tolist():
+        strings[row] = strings[row][:19]
+    return strings
+
+
+class Timestamps:
+    """A column of epoch seconds that is written out as ISO strings"""
+
+    __slots__ = ('values',)
+
+    def __init__(self, values):
+        self.values = values
+
+    def __len__(self):
+        return len(self.values)
+
+    def __iter__(self):
+        return iter(self.values)
+
+    def isoformat(self):
+        return format_timestamps(self.values)
+
+
+class Fragment:
+    """Already-encoded JSON, written into the output as is"""
+
+    __slots__ = ('text',)
+
+    def __init__(self, text):
+        self.text = text
+
+
+def fragment(value):
+    """Encode value once, e.g. before caching it, so later responses skip the work"""
+    return Fragment(dumps(value, sort_keys=FastJSONProvider.sort_keys))
+
+
+def to_builtin(value):
+    """The plain JSON value for one of the extra types responses may contain"""
+    if isinstance(value, Timestamps):
+        return value.isoformat()
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, Fragment):
+        return json.loads(value.text)
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    if isinstance(value, (decimal.Decimal, uuid.UUID)):
+        return str(value)
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return dataclasses.asdict(value)
+    if hasattr(value, '__html__'):
+        return str(value.__html__())
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+
+class _Fragments:
+    """
+    default hook that stands a placeholder string in for each Fragment.
+
+    orjson before 3.9 has no way to embed raw JSON, so the placeholders
+    are swapped for the fragment text once the document is encoded.
+    """
+
+    TOKEN = f'@@fragment-{secrets.token_hex(8)}-'
+    PATTERN = re.compile(f'"{TOKEN}([0-9]+)"')
+
+    def __init__(self, native=False):
+        self.native = native
+        self.texts = []
+
+    def __call__(self, value):
+        if isinstance(value, Fragment):
+            if self.native:
+                return orjson.Fragment(value.text)
+            self.texts.append(value.text)
+            return f'{self.TOKEN}{len(self.texts) - 1}'
+        return to_builtin(value)
+
+    def fill(self, text):
+        if not self.texts:
+            return text
+        return self.PATTERN.sub(lambda match: self.texts[int(match.group(1))], text)
+
+
+def use_orjson():
+    return orjson is not None and Config.JSON_BACKEND != 'json'
+
+
+def dumps(value, indent=None, sort_keys=False):
+    """Compact JSON text for value, extra types included"""
+    if isinstance(value, Fragment):
+        return value.text
+
+    if use_orjson():
+        fragments = _Fragments(native=hasattr(orjson, 'Fragment'))
+        options = ORJSON_OPTIONS
+        if indent:
+            options |= orjson.OPT_INDENT_2
+        if sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        text = orjson.dumps(value, default=fragments, option=options).decode()
+    else:
+        fragments = _Fragments()
+        separators = None if indent else (',', ':')
+        text = json.dumps(value, default=fragments, indent=indent, separators=separators,
+                          sort_keys=sort_keys, ensure_ascii=False)
+    return fragments.fill(text)
+
+
+def loads(text):
+    if use_orjson():
+        return orjson.loads(text)
+    return json.loads(text)
+
+
+class FastJSONProvider(JSONProvider):
+    """
+    The app's JSON provider.
+
+    Understands datetimes, NumPy arrays and scalars, Timestamps columns
+    and pre-encoded Fragments on top of the usual types. Responses are
+    always compact, debug mode included, so jsonify bodies match the
+    streamed and pre-encoded ones.
+    """
+
+    sort_keys = True
+    compact = True
+    mimetype = 'application/json'
+
+    def dumps(self, obj, **kwargs):
+        indent = kwargs.pop('indent', None)
+        sort_keys = kwargs.pop('sort_keys', self.sort_keys)
+        kwargs.pop('separators', None)
+        if kwargs:
+            kwargs.setdefault('default', to_builtin)
+            return json.dumps(obj, indent=indent, sort_keys=sort_keys, **kwargs)
+        return dumps(obj, indent=indent, sort_keys=sort_keys)
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return json.loads(s, **kwargs)
+        return loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = 2 if (self.compact is None and self._app.debug) or self.compact is False else None
+        return self._app.response_class(f'{self.dumps(obj, indent=indent)}\n', mimetype=self.mimetype)
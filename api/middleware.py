@@ -0,0 +1,138 @@
+"""HTTP caching and compression for API responses"""
+from flask import request, make_response, g
+from functools import wraps
+from config import Config
+import hashlib
+import gzip
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_TYPES = {
+    'application/json', 'application/x-ndjson', 'text/csv', 'text/plain',
+    'application/openmetrics-text', 'text/html', 'text/css', 'application/javascript'
+}
+
+ENCODING_SUFFIXES = ('-br', '-gzip')
+
+
+def make_etag(*parts):
+    """Strong validator from a route and whatever versions its data depends on"""
+    key = '|'.join(str(part) for part in parts)
+    return hashlib.blake2b(key.encode('utf-8'), digest_size=12).hexdigest()
+
+
+def _base_tag(tag):
+    for suffix in ENCODING_SUFFIXES:
+        if tag.endswith(suffix):
+            return tag[:-len(suffix)]
+    return tag
+
+
+def etag_matches(etag):
+    """True if If-None-Match names this representation in any encoding"""
+    if_none_match = request.if_none_match
+    if not if_none_match:
+        return False
+    if if_none_match.star_tag:
+        return True
+    return any(_base_tag(tag) == etag for tag in if_none_match.as_set())
+
+
+def not_modified(etag, cache_control=None):
+    response = make_response('', 304)
+    response.set_etag(etag)
+    response.vary.add('Accept-Encoding')
+    if cache_control:
+        response.headers['Cache-Control'] = cache_control
+    return response
+
+
+def versioned(version_fn, max_age=None):
+    """
+    Tag a GET endpoint with an ETag derived from its data version.
+
+    version_fn receives the view's arguments. When the client already
+    holds that version the view is not run at all and a 304 goes back.
+    With max_age the response is also publicly cacheable for that long.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            etag = make_etag(request.path, sorted(request.args.items(multi=True)), version_fn(*args, **kwargs))
+            cache_control = f'public, max-age={max_age}' if max_age else None
+
+            if etag_matches(etag):
+                return not_modified(etag, cache_control)
+
+            response = make_response(view(*args, **kwargs))
+            if response.status_code == 200:
+                g.etag = etag
+                if cache_control:
+                    response.headers['Cache-Control'] = cache_control
+            return response
+        return wrapper
+    return decorator
+
+
+def choose_encoding():
+    accept = request.accept_encodings
+    if brotli is not None and accept['br']:
+        return 'br'
+    if accept['gzip']:
+        return 'gzip'
+    return None
+
+
+def compress(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=Config.BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=Config.GZIP_LEVEL)
+
+
+def finalize_response(response):
+    """
+    after_request hook: ETag, conditional GET and compression.
+
+    Endpoints without a data version get an ETag hashed from the body.
+    Compressed bodies get their own ETag variant per encoding so the
+    validator stays strong.
+    """
+    if request.method not in ('GET', 'HEAD') or response.status_code != 200:
+        return response
+
+    if response.direct_passthrough or response.is_streamed:
+        # streamed bodies can't be hashed or compressed here, but a data version still applies
+        if g.get('etag') and not response.get_etag()[0]:
+            response.set_etag(g.etag)
+        return response
+
+    compressible = response.mimetype in COMPRESSIBLE_TYPES
+    if compressible:
+        response.vary.add('Accept-Encoding')
+
+    if 'Content-Encoding' in response.headers:
+        return response
+
+    data = response.get_data()
+    etag = g.get('etag') or hashlib.blake2b(data, digest_size=12).hexdigest()
+
+    if etag_matches(etag):
+        return not_modified(etag, response.headers.get('Cache-Control'))
+
+    encoding = choose_encoding() if compressible and len(data) >= Config.COMPRESS_MIN_SIZE else None
+    if encoding:
+        response.set_data(compress(data, encoding))
+        response.headers['Content-Encoding'] = encoding
+        etag = f'{etag}-{encoding}'
+
+    response.set_etag(etag)
+    return response
+
+
+def init_app(app):
+    app.after_request(finalize_response)
+    if brotli is None:
+        print("⚠️  brotli not installed, compressing with gzip only")
@@ -1,20 +1,39 @@
 from datetime import datetime
+from functools import lru_cache
 import random
+import time
+import sys
+
+
+@lru_cache(maxsize=1024)
+def format_timestamp(ts):
+    # a whole inventory load shares one timestamp, so this is formatted once
+    return datetime.fromtimestamp(ts).isoformat()
+
 
 class Device:
     """Internet Device"""
     
     DEVICE_TYPES = ['router', 'switch', 'firewall', 'access_point']
+    STATUSES = ['online', 'offline', 'warning']
+    FIELDS = ('id', 'office_id', 'name', 'type', 'ip_address', 'status', 'last_seen')
+    
+    __slots__ = ('id', 'office_id', 'name', 'device_type', 'ip_address', 'status', 'last_seen_ts')
     
     def __init__(self, id, office_id, name, device_type, 
-                 ip_address, status='online'):
+                 ip_address, status='online', last_seen=None):
         self.id = id
-        self.office_id = office_id
+        self.office_id = sys.intern(office_id) if office_id else office_id
         self.name = name
-        self.device_type = device_type
+        # a handful of distinct values shared by every device
+        self.device_type = sys.intern(device_type) if device_type else device_type
         self.ip_address = ip_address
-        self.status = status  # online, offline, warning
-        self.last_seen = datetime.now()
+        self.status = sys.intern(status) if status else status  # online, offline, warning
+        self.last_seen_ts = time.time() if last_seen is None else last_seen
+    
+    @property
+    def last_seen(self):
+        return datetime.fromtimestamp(self.last_seen_ts)
     
     def get_metrics(self, simulate=True):
         """Device Metrics"""
@@ -35,7 +54,9 @@ class Device:
             # Real data
             pass
     
-    def to_dict(self):
+    def to_dict(self, fields=None):
+        if fields is not None:
+            return {name: self._field(name) for name in fields}
         return {
             'id': self.id,
             'office_id': self.office_id,
@@ -43,5 +64,12 @@ class Device:
             'type': self.device_type,
             'ip_address': self.ip_address,
             'status': self.status,
-            'last_seen': self.last_seen.isoformat()
-        }
\ No newline at end of file
+            'last_seen': format_timestamp(self.last_seen_ts)
+        }
+    
+    def _field(self, name):
+        if name == 'type':
+            return self.device_type
+        if name == 'last_seen':
+            return format_timestamp(self.last_seen_ts)
+        return getattr(self, name)
@@ -0,0 +1,104 @@
+from api.models.device import Device, format_timestamp
+from json.encoder import encode_basestring_ascii as encode_str
+import numpy as np
+import bisect
+import json
+
+
+def encode_codes(values):
+    """(vocabulary, int codes) for a column with few distinct values"""
+    vocabulary = sorted(set(values), key=str)
+    lookup = {value: code for code, value in enumerate(vocabulary)}
+    return vocabulary, np.fromiter((lookup[v] for v in values), dtype=np.int32, count=len(values))
+
+
+class Fleet:
+    """
+    Every device as parallel columns rather than one object per device.
+
+    Rows are in id order. Low-cardinality columns (type, status, office)
+    are integer codes over a small vocabulary, so filters are array
+    comparisons. The JSON writers build output straight from the columns
+    with pre-encoded vocabulary strings, never creating a dict per device.
+    """
+
+    FIELDS = Device.FIELDS
+
+    def __init__(self, devices):
+        devices = sorted(devices, key=lambda d: d.id)
+        self.ids = [d.id for d in devices]
+        self.names = [d.name for d in devices]
+        self.ip_addresses = [d.ip_address for d in devices]
+        self.last_seen = np.array([d.last_seen_ts for d in devices], dtype=np.float64)
+
+        self.types, self.type_codes = encode_codes([d.device_type for d in devices])
+        self.statuses, self.status_codes = encode_codes([d.status for d in devices])
+        self.offices, self.office_codes = encode_codes([d.office_id for d in devices])
+
+        # json.dumps so a missing value comes out as null
+        self._encoded = {
+            'type': [json.dumps(v) for v in self.types],
+            'status': [json.dumps(v) for v in self.statuses],
+            'office_id': [json.dumps(v) for v in self.offices]
+        }
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _code(self, vocabulary, value):
+        try:
+            return vocabulary.index(value)
+        except ValueError:
+            return -1
+
+    def select(self, device_type=None, status=None, office_id=None):
+        """Row numbers matching every given filter, in id order"""
+        mask = np.ones(len(self.ids), dtype=bool)
+        for vocabulary, codes, value in ((self.types, self.type_codes, device_type),
+                                         (self.statuses, self.status_codes, status),
+                                         (self.offices, self.office_codes, office_id)):
+            if value is not None:
+                mask &= codes == self._code(vocabulary, value)
+        return np.flatnonzero(mask)
+
+    def page(self, rows, after=None, limit=None):
+        """(rows, next_cursor) for a keyset page over selected rows"""
+        if after:
+            rows = rows[rows >= bisect.bisect_right(self.ids, after)]
+        if limit is None or len(rows) <= limit:
+            return rows, None
+        rows = rows[:limit]
+        return rows, self.ids[rows[-1]]
+
+    def _column(self, name, rows):
+        """JSON text of one field for the given rows"""
+        strings = {'id': self.ids, 'name': self.names, 'ip_address': self.ip_addresses}.get(name)
+        if strings is not None:
+            return [encode_str(strings[i]) for i in rows.tolist()]
+        if name == 'last_seen':
+            encoded = {ts: encode_str(format_timestamp(ts)) for ts in np.unique(self.last_seen[rows]).tolist()}
+            return [encoded[ts] for ts in self.last_seen[rows].tolist()]
+        vocabulary, codes = {
+            'type': (self._encoded['type'], self.type_codes),
+            'status': (self._encoded['status'], self.status_codes),
+            'office_id': (self._encoded['office_id'], self.office_codes)
+        }[name]
+        return [vocabulary[c] for c in codes[rows].tolist()]
+
+    def iter_json(self, rows, fields=None, batch=500):
+        """One JSON object string per row, the same shape as Device.to_dict"""
+        fields = fields or self.FIELDS
+        template = '{' + ','.join(f'"{name}":%s' for name in fields) + '}'
+        for start in range(0, len(rows), batch):
+            chunk = rows[start:start + batch]
+            columns = [self._column(name, chunk) for name in fields]
+            for values in zip(*columns):
+                yield template % values
+
+    def columns_json(self, rows, fields=None):
+        """{"id": [...], "type": [...], ...} with one array per field"""
+        fields = fields or self.FIELDS
+        parts = []
+        for name in fields:
+            parts.append(f'"{name}":[' + ','.join(self._column(name, rows)) + ']')
+        return '{' + ','.join(parts) + '}'
@@ -1,19 +1,27 @@
+import sys
+
 
 class Office:
     
+    FIELDS = ('id', 'name', 'country', 'region', 'city', 'coordinates', 'timezone', 'status')
+    
+    __slots__ = ('id', 'name', 'country', 'region', 'city', 'latitude', 'longitude', 'timezone', 'status')
+    
     def __init__(self, id, name, country, region, city, 
                  latitude, longitude, timezone, status='active'):
-        self.id = id
+        self.id = sys.intern(id) if id else id
         self.name = name
         self.country = country
-        self.region = region  # Africa, Asia, Europe, Americas
+        self.region = sys.intern(region) if region else region  # Africa, Asia, Europe, Americas
         self.city = city
         self.latitude = latitude
         self.longitude = longitude
-        self.timezone = timezone
-        self.status = status
+        self.timezone = sys.intern(timezone) if timezone else timezone
+        self.status = sys.intern(status) if status else status
     
-    def to_dict(self):
+    def to_dict(self, fields=None):
+        if fields is not None:
+            return {name: self._field(name) for name in fields}
         return {
             'id': self.id,
             'name': self.name,
@@ -28,6 +36,11 @@ class Office:
             'status': self.status
         }
     
+    def _field(self, name):
+        if name == 'coordinates':
+            return {'lat': self.latitude, 'lng': self.longitude}
+        return getattr(self, name)
+    
     @staticmethod
     def from_dict(data):
         return Office(
@@ -0,0 +1,13 @@
+"""Group-by keys read from raw seed records, with missing or null values filled in"""
+
+
+def device_type(record):
+    return str(record.get('device_type') or 'unknown')
+
+
+def office_region(record):
+    return str(record.get('region') or 'Unknown')
+
+
+def office_status(record):
+    return str(record.get('status') or 'active')
@@ -0,0 +1,133 @@
+"""Cursor pagination, field projection and streamed list responses"""
+from flask import Response, request, jsonify, current_app, stream_with_context
+from config import Config
+import bisect
+
+
+def parse_number(args, name, default=None, kind=int):
+    """?name= as an int or float, with a client-facing message when it isn't one"""
+    raw = args.get(name)
+    if raw is None or raw == '':
+        return default
+    try:
+        return kind(raw)
+    except ValueError:
+        raise ValueError(f"{name} must be {'an integer' if kind is int else 'a number'}") from None
+
+
+def parse_limit(args, default=None, maximum=None):
+    """Page size from ?limit=, None means no paging"""
+    limit = parse_number(args, 'limit')
+    if limit is None:
+        return default
+    if limit < 1:
+        raise ValueError('limit must be at least 1')
+    maximum = maximum or Config.PAGE_MAX_LIMIT
+    return min(limit, maximum)
+
+
+def parse_fields(args, allowed):
+    """Projection from ?fields=id,status, None means every field"""
+    raw = args.get('fields')
+    if not raw:
+        return None
+    fields = [name.strip() for name in raw.split(',') if name.strip()]
+    unknown = [name for name in fields if name not in allowed]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)} (valid: {', '.join(allowed)})")
+    return fields
+
+
+def project(record, fields):
+    """Pick fields out of a plain dict record"""
+    if fields is None:
+        return record
+    return {name: record.get(name) for name in fields}
+
+
+def keyset_page(items, after, limit, key, reverse=False):
+    """
+    Slice of items (sorted ascending by key) that comes after the cursor.
+
+    With reverse the listing runs newest-first, so "after" means smaller
+    keys. Returns (page, next_cursor); next_cursor is None on the last
+    page. The start position is a binary search, so deep pages cost the
+    same as the first one.
+    """
+    if reverse:
+        end = bisect.bisect_left(items, after, key=key) if after else len(items)
+        start = 0 if limit is None else max(0, end - limit)
+        page = items[start:end][::-1]
+        return page, (key(page[-1]) if page and start > 0 else None)
+
+    start = bisect.bisect_right(items, after, key=key) if after else 0
+    if limit is None:
+        return items[start:], None
+    page = items[start:start + limit]
+    next_cursor = key(page[-1]) if page and start + limit < len(items) else None
+    return page, next_cursor
+
+
+def wants_ndjson():
+    # a query arg rather than Accept, so it is part of the cache key and ETag
+    return request.args.get('format') == 'ndjson'
+
+
+def _encoded_batches(records, separator, encoded=False):
+    dumps = current_app.json.dumps
+    batch = []
+    for record in records:
+        batch.append(record if encoded else dumps(record))
+        if len(batch) >= Config.STREAM_CHUNK_SIZE:
+            yield separator.join(batch)
+            batch = []
+    if batch:
+        yield separator.join(batch)
+
+
+def stream_ndjson(records, encoded=False):
+    """One JSON document per line, encoded in batches as the client reads"""
+    def generate():
+        for chunk in _encoded_batches(records, '\n', encoded):
+            yield chunk + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+
+def _json_body(envelope, name, records, encoded=False):
+    # compact like every other response from the app's JSON provider
+    head = current_app.json.dumps(envelope)
+    yield head[:-1] + (',' if envelope else '') + f'"{name}":['
+    first = True
+    for chunk in _encoded_batches(records, ',', encoded):
+        yield chunk if first else ',' + chunk
+        first = False
+    yield ']}'
+
+
+def stream_json(envelope, name, records, encoded=False):
+    """
+    The usual {..., name: [...]} body, written as a chunked JSON array.
+
+    Only one batch of encoded records is held in memory at a time.
+    """
+    return Response(stream_with_context(_json_body(envelope, name, records, encoded)),
+                    mimetype='application/json')
+
+
+def list_response(envelope, name, records, count, encoded=False):
+    """
+    NDJSON when asked for, a streamed array for big results, else jsonify.
+
+    Small results are returned whole so they still get compressed and
+    body-hashed ETags. With encoded the records are already JSON text.
+    """
+    if wants_ndjson():
+        return stream_ndjson(records, encoded)
+    if count > Config.STREAM_LIST_THRESHOLD:
+        return stream_json(envelope, name, records, encoded)
+    if encoded:
+        return Response(''.join(_json_body(envelope, name, records, True)), mimetype='application/json')
+    body = dict(envelope)
+    body[name] = list(records)
+    return jsonify(body)
@@ -1,21 +1,45 @@
 """Analyze API endpoints"""
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, Response, jsonify, request, send_file, url_for
 from api.services.analytics_service import AnalyticsService
-from datetime import datetime
-import json
+from api.services.response_cache import analytics_cache, cache_key
+from api.services.alert_service import ALERT_FIELDS
+from api.services.report_jobs import report_queue, REPORT_FORMATS
+from api.services.report_catalog import report_catalog, report_path, legacy_path
+from api.pagination import parse_limit, parse_number, parse_fields, project, list_response
+from api.json_provider import fragment
+from config import Config
+import queue
+import time
+import gzip
 import os
 
 bp = Blueprint('analytics', __name__, url_prefix='/api/v1/analytics')
 
 analytics_service = AnalyticsService()
 
+REPORT_FIELDS = ('id', 'type', 'generated_at', 'generated_by', 'formats', 'size_bytes', 'url')
+
+
+def cached(compute, **params):
+    """Serve compute() from the analytics cache, keyed by route and the parsed params it depends on"""
+    return analytics_cache.get_or_compute(cache_key(request.path, params), compute)
+
+
+def cached_summary():
+    # shared with the health score so it is never computed twice
+    # a literal path rather than url_for, as report workers run outside any request
+    return analytics_cache.get_or_compute(
+        cache_key(f'{bp.url_prefix}/summary'),
+        analytics_service.get_global_summary
+    )
+
 @bp.route('/summary', methods=['GET'])
 def get_global_summary():
     """
     get summary
     """
     try:
-        summary = analytics_service.get_global_summary()
+        summary = cached_summary()
         return jsonify(summary), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -27,7 +51,7 @@ def get_region_analytics(region):
 
     """
     try:
-        analytics = analytics_service.get_region_analytics(region)
+        analytics = cached(lambda: analytics_service.get_region_analytics(region))
         
         if not analytics:
             return jsonify({
@@ -46,7 +70,7 @@ def get_alerts():
     """
     try:
         severity = request.args.get('severity')  # critical, warning, info
-        limit = int(request.args.get('limit', 50))
+        limit = parse_limit(request.args, default=50, maximum=100)
         
         if severity and severity not in ['critical', 'warning', 'info']:
             return jsonify({
@@ -54,13 +78,30 @@ def get_alerts():
                 'valid_values': ['critical', 'warning', 'info']
             }), 400
         
-        if limit > 100:
-            limit = 100
+        state = request.args.get('state')  # open, resolved
+        if state and state not in ['open', 'resolved']:
+            return jsonify({
+                'error': 'Invalid state parameter',
+                'valid_values': ['open', 'resolved']
+            }), 400
+        
+        hours = parse_number(request.args, 'hours', kind=float)
+        since = time.time() - hours * 3600 if hours else None
         
-        alerts = analytics_service.get_alerts(severity, limit)
-        return jsonify(alerts), 200
-    except ValueError:
-        return jsonify({'error': 'Invalid limit parameter - must be a number'}), 400
+        fields = parse_fields(request.args, ALERT_FIELDS)
+        
+        result = analytics_service.get_alerts(
+            severity, limit,
+            office_id=request.args.get('office_id'),
+            since=since,
+            state=state,
+            after=request.args.get('after'),
+            fields=fields
+        )
+        alerts = result.pop('alerts')
+        return list_response(result, 'alerts', alerts, len(alerts))
+    except ValueError as e:
+        return jsonify({'error': f'Invalid parameter: {e}'}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -75,10 +116,20 @@ def get_performance_trends():
         if days < 1:
             return jsonify({'error': 'Days parameter must be at least 1'}), 400
         
-        if days > 30:
-            return jsonify({'error': 'Maximum 30 days allowed'}), 400
+        if days > 365:
+            return jsonify({'error': 'Maximum 365 days allowed'}), 400
         
-        trends = analytics_service.get_performance_trends(days)
+        scope, scope_id = 'global', ''
+        if request.args.get('office_id'):
+            scope, scope_id = 'office', request.args['office_id']
+        elif request.args.get('region'):
+            scope, scope_id = 'region', request.args['region']
+        elif request.args.get('device_id'):
+            scope, scope_id = 'device', request.args['device_id']
+        
+        # cached already encoded, a hit costs no serialization at all
+        trends = cached(lambda: fragment(analytics_service.get_performance_trends(days, scope, scope_id)),
+                        days=days, scope=scope, scope_id=scope_id)
         return jsonify(trends), 200
     except ValueError:
         return jsonify({'error': 'Invalid days parameter - must be a number'}), 400
@@ -113,7 +164,7 @@ def get_top_performers():
 def get_device_distribution():
     """get distribution analytics"""
     try:
-        distribution = analytics_service.get_device_type_distribution()
+        distribution = cached(lambda: fragment(analytics_service.get_device_type_distribution()))
         return jsonify(distribution), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -124,111 +175,174 @@ def get_health_score():
     get scores
     """
     try:
-        health_data = analytics_service.calculate_health_score()
+        health_data = cached(lambda: fragment(analytics_service.calculate_health_score(cached_summary())))
         return jsonify(health_data), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def report_sections(include_trends=True, include_alerts=True):
+    """(name, compute) steps of a report, run later on a report worker"""
+    sections = [('summary', cached_summary)]
+    if include_trends:
+        sections.append(('trends', lambda: analytics_service.get_performance_trends(days=7)))
+    if include_alerts:
+        sections.append(('alerts', lambda: analytics_service.get_alerts(limit=20)))
+    sections.append(('health_score', lambda: analytics_service.calculate_health_score(cached_summary())))
+    sections.append(('device_distribution', analytics_service.get_device_type_distribution))
+    return sections
+
 @bp.route('/reports/generate', methods=['POST'])
 def generate_report():
-   
+    """Queue a report and return its job id straight away"""
+    data = request.get_json(silent=True) or {}
+    
+    header = {
+        'type': data.get('type', 'summary'),
+        'generated_by': data.get('user', 'system')
+    }
+    sections = report_sections(data.get('include_trends', True), data.get('include_alerts', True))
+    
     try:
-        data = request.get_json() or {}
-        
-        report_type = data.get('type', 'summary')
-        user = data.get('user', 'system')
-        include_trends = data.get('include_trends', True)
-        include_alerts = data.get('include_alerts', True)
-        
-        report_id = f'RPT-{datetime.now().strftime("%Y%m%d%H%M%S")}'
-        
-        report_data = {
-            'id': report_id,
-            'type': report_type,
-            'generated_at': datetime.now().isoformat(),
-            'generated_by': user,
-            'summary': analytics_service.get_global_summary()
-        }
-        
-        if include_trends:
-            report_data['trends'] = analytics_service.get_performance_trends(days=7)
-        
-        if include_alerts:
-            report_data['alerts'] = analytics_service.get_alerts(limit=20)
-        
-        # score
-        report_data['health_score'] = analytics_service.calculate_health_score()
-        
-        # distribution
-        report_data['device_distribution'] = analytics_service.get_device_type_distribution()
-        
-        # save report
-        reports_dir = 'data/cache/reports'
-        os.makedirs(reports_dir, exist_ok=True)
-        
-        report_path = os.path.join(reports_dir, f'report_{report_id}.json')
-        with open(report_path, 'w', encoding='utf-8') as f:
-            json.dump(report_data, f, indent=2, ensure_ascii=False)
-        
+        job = report_queue.submit(header, sections, fmt=data.get('format', 'json'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except queue.Full:
+        return jsonify({'error': 'Report queue is full, try again later'}), 503
+    
+    status_url = url_for('analytics.get_report_job', job_id=job.id)
+    response = jsonify({
+        'message': 'Report queued',
+        'job_id': job.id,
+        'report_id': job.id,
+        'status_url': status_url,
+        'download_url': url_for('analytics.get_report', report_id=job.id, format=job.format)
+    })
+    response.status_code = 202
+    response.headers['Location'] = status_url
+    return response
+
+@bp.route('/reports/jobs/<job_id>', methods=['GET'])
+def get_report_job(job_id):
+    """
+    Status of a report job.
+
+    Queued and running jobs are only known to the worker that accepted
+    them; any worker can answer for a finished report from the catalog.
+    """
+    job = report_queue.get(job_id)
+    
+    if not job:
+        record = report_catalog.get(job_id)
+        if not record:
+            return jsonify({'error': 'Job not found'}), 404
         return jsonify({
-            'message': 'Report generated successfully',
-            'report_id': report_id,
-            'download_url': f"/api/v1/analytics/reports/{report_id}",
-            'generated_at': report_data['generated_at']
-        }), 201
-        
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+            'job_id': job_id,
+            'report_id': job_id,
+            'format': record['formats'][0],
+            'status': 'done',
+            'progress': 1.0,
+            'download_url': url_for('analytics.get_report', report_id=job_id, format=record['formats'][0])
+        })
+    
+    return jsonify(job.to_dict())
+
+@bp.route('/reports/jobs', methods=['GET'])
+def get_report_queue_stats():
+    """Queue depth, running jobs and outcomes"""
+    return jsonify(report_queue.stats())
+
+def gunzip_chunks(path):
+    with gzip.open(path, 'rb') as f:
+        while True:
+            chunk = f.read(Config.REPORT_STREAM_CHUNK)
+            if not chunk:
+                break
+            yield chunk
 
 @bp.route('/reports/<report_id>', methods=['GET'])
 def get_report(report_id):
+    """
+    Download a finished report as JSON or ?format=csv.
 
-    try:
-        report_path = f"data/cache/reports/report_{report_id}.json"
-        
-        if not os.path.exists(report_path):
-            return jsonify({'error': 'Report not found'}), 404
-        
-        with open(report_path, 'r', encoding='utf-8') as f:
-            report = json.load(f)
-        
-        return jsonify(report), 200
-        
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    Stored gzip bytes go out as they are, with Range support, to clients
+    that accept gzip; other clients get them decompressed as a stream.
+    """
+    fmt = request.args.get('format', 'json')
+    if fmt not in REPORT_FORMATS:
+        return jsonify({'error': f"format must be one of: {', '.join(REPORT_FORMATS)}"}), 400
+    
+    job = report_queue.get(report_id)
+    if job and job.state in ('queued', 'running'):
+        return jsonify(job.to_dict()), 202
+    if job and job.state == 'failed':
+        return jsonify(job.to_dict()), 500
+    
+    mimetype = 'text/csv' if fmt == 'csv' else 'application/json'
+    path = os.path.abspath(report_path(report_id, fmt))
+    
+    if not os.path.exists(path):
+        legacy = os.path.abspath(legacy_path(report_id))
+        if fmt == 'json' and os.path.exists(legacy):
+            return send_file(legacy, mimetype=mimetype, conditional=True, max_age=Config.REPORT_MAX_AGE)
+        return jsonify({'error': 'Report not found'}), 404
+    
+    if request.accept_encodings['gzip']:
+        response = send_file(path, mimetype=mimetype, conditional=True, max_age=Config.REPORT_MAX_AGE)
+        response.headers['Content-Encoding'] = 'gzip'
+    else:
+        response = Response(gunzip_chunks(path), mimetype=mimetype)
+        response.headers['Accept-Ranges'] = 'none'
+    response.vary.add('Accept-Encoding')
+    return response
 
 @bp.route('/reports', methods=['GET'])
 def list_reports():
+    """
+    Reports from the catalog, newest first by default.
+
+    ?type= and ?user= filter, ?since=/?until= bound generated_at (ISO),
+    ?sort=generated_at|type|generated_by with ?order=asc|desc.
+    """
     try:
-        reports_dir = 'data/cache/reports'
-        
-        if not os.path.exists(reports_dir):
-            return jsonify({'reports': []}), 200
+        limit = parse_limit(request.args)
+        fields = parse_fields(request.args, REPORT_FIELDS)
+        order = request.args.get('order', 'desc')
+        if order not in ('asc', 'desc'):
+            raise ValueError('order must be asc or desc')
         
-        reports = []
-        for filename in os.listdir(reports_dir):
-            if filename.startswith('report_') and filename.endswith('.json'):
-                report_id = filename.replace('report_', '').replace('.json', '')
-                file_path = os.path.join(reports_dir, filename)
-                
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    report_data = json.load(f)
-                
-                reports.append({
-                    'id': report_id,
-                    'type': report_data.get('type', 'unknown'),
-                    'generated_at': report_data.get('generated_at'),
-                    'generated_by': report_data.get('generated_by', 'unknown'),
-                    'url': f"/api/v1/analytics/reports/{report_id}"
-                })
-        
-        # sort by time
-        reports.sort(key=lambda x: x.get('generated_at', ''), reverse=True)
-        
-        return jsonify({
-            'total': len(reports),
-            'reports': reports
-        }), 200
-        
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
\ No newline at end of file
+        records, next_cursor, total = report_catalog.query(
+            limit=limit,
+            after=request.args.get('after'),
+            sort=request.args.get('sort', 'generated_at'),
+            descending=order == 'desc',
+            report_type=request.args.get('type'),
+            generated_by=request.args.get('user'),
+            since=request.args.get('since'),
+            until=request.args.get('until')
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    envelope = {'total': total}
+    if limit:
+        envelope.update({'limit': limit, 'next_cursor': next_cursor})
+    
+    return list_response(envelope, 'reports', (project(r, fields) for r in records), len(records))
+
+@bp.route('/reports/<report_id>', methods=['DELETE'])
+def delete_report(report_id):
+    if not report_catalog.get(report_id):
+        return jsonify({'error': 'Report not found'}), 404
+    
+    report_catalog.remove([report_id])
+    return '', 204
+
+@bp.route('/reports/catalog/stats', methods=['GET'])
+def get_report_catalog_stats():
+    """Stored reports, their total size and retention settings"""
+    return jsonify(report_catalog.stats())
+
+@bp.route('/cache/stats', methods=['GET'])
+def get_cache_stats():
+    """Analytics response cache hit/miss/eviction counters"""
+    return jsonify(analytics_cache.stats())
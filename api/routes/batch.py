@@ -0,0 +1,85 @@
+"""Several API calls in one round trip"""
+from flask import Blueprint, jsonify, request, current_app
+from werkzeug.exceptions import HTTPException
+from urllib.parse import urlsplit, unquote
+from api.batch import request_pool, run_all
+from config import Config
+
+bp = Blueprint('batch', __name__, url_prefix='/api/v1/batch')
+
+# never-ending or recursive endpoints can't be part of a batch
+EXCLUDED_BLUEPRINTS = ('batch', 'stream')
+
+
+def excluded(app, path):
+    """
+    True when path routes to an excluded blueprint.
+
+    Matched the way the sub-request will be routed, after percent-decoding,
+    so /api/v1/%73tream is caught as well. Unroutable paths are left to
+    come back as their own 404/405.
+    """
+    try:
+        endpoint, _ = app.url_map.bind('').match(unquote(urlsplit(path).path), method='GET')
+    except HTTPException:
+        return False
+    return endpoint.partition('.')[0] in EXCLUDED_BLUEPRINTS
+
+
+def validate(app, sub_requests):
+    if not isinstance(sub_requests, list) or not sub_requests:
+        return 'requests must be a non-empty list'
+    if len(sub_requests) > Config.BATCH_MAX_REQUESTS:
+        return f'at most {Config.BATCH_MAX_REQUESTS} requests per batch'
+    for index, sub in enumerate(sub_requests):
+        if not isinstance(sub, dict) or not isinstance(sub.get('path'), str):
+            return f'requests[{index}] needs a path'
+        if sub.get('method', 'GET').upper() != 'GET':
+            return f'requests[{index}]: only GET is supported'
+        path = sub['path']
+        if not path.startswith(Config.API_PREFIX + '/') or excluded(app, path):
+            return f'requests[{index}]: {path} cannot be batched'
+    return None
+
+
+def dispatch(app, sub):
+    """Run one GET through the app's normal routing, hooks and error handlers"""
+    with app.test_request_context(sub['path'], method='GET'):
+        if request.blueprint in EXCLUDED_BLUEPRINTS:
+            return {'id': sub.get('id'), 'status': 400, 'body': {'error': 'This endpoint cannot be batched'}}
+        try:
+            response = app.full_dispatch_request()
+        except Exception as e:
+            print(f"❌ Batch sub-request {sub['path']} failed: {e}")
+            return {'id': sub.get('id'), 'status': 500, 'body': {'error': 'Internal server error'}}
+        if response.status_code >= 400 and not response.is_json:
+            # Werkzeug's own error pages are HTML
+            response.close()
+            return {'id': sub.get('id'), 'status': response.status_code, 'body': {'error': response.status}}
+        if response.is_streamed:
+            # the body may never end; don't start reading it
+            response.close()
+            return {'id': sub.get('id'), 'status': 400,
+                    'body': {'error': 'Streamed responses cannot be batched, request a page with ?limit='}}
+        body = response.get_json(silent=True) if response.is_json else response.get_data(as_text=True)
+        return {'id': sub.get('id'), 'status': response.status_code, 'body': body}
+
+
+@bp.route('', methods=['POST'])
+def run_batch():
+    """
+    {"requests": [{"id": "office", "path": "/api/v1/offices/X"}, ...]}
+
+    Sub-requests run concurrently and come back in the order given, each
+    with its own status; one failing doesn't fail the batch.
+    """
+    payload = request.get_json(silent=True) or {}
+    sub_requests = payload.get('requests')
+    app = current_app._get_current_object()
+    error = validate(app, sub_requests)
+    if error:
+        return jsonify({'error': error}), 400
+
+    responses = run_all(lambda sub: dispatch(app, sub), sub_requests, pool=request_pool)
+
+    return jsonify({'count': len(responses), 'responses': responses})
@@ -0,0 +1,66 @@
+"""Performance introspection for finding regressions under load"""
+from flask import Blueprint, jsonify, request
+from api.services.perf_stats import perf
+from api.services.inventory_service import inventory
+from api.services.response_cache import analytics_cache
+from api.services.tiered_cache import cache
+from api.services.http_gateway import gateway
+from api.services.metrics_exporter import metrics_exporter
+from api.routes.external import weather_service, time_service
+from datetime import datetime
+from config import Config
+import time
+
+bp = Blueprint('debug', __name__, url_prefix='/debug')
+
+
+@bp.route('/perf', methods=['GET'])
+def get_perf():
+    """
+    Endpoint latency histograms, upstream call timings, cache hit ratios
+    and data load times since start-up or the last reset.
+
+    ?slow=N limits how many recent slow requests are listed.
+    """
+    slow = list(perf.slow_requests)
+    limit = request.args.get('slow', type=int)
+    if limit is not None:
+        slow = slow[-limit:] if limit > 0 else []
+
+    return jsonify({
+        'since': datetime.fromtimestamp(perf.started).isoformat(),
+        'window_seconds': round(time.time() - perf.started, 1),
+        'endpoints': perf.snapshot('endpoint'),
+        'upstream': {
+            'timings': perf.snapshot('upstream'),
+            'gateway': gateway.stats()
+        },
+        'caches': {
+            'analytics': analytics_cache.stats(),
+            'tiered': cache.stats(),
+            'weather': weather_service.swr.stats(),
+            'time': time_service.swr.stats()
+        },
+        'loads': {
+            'timings': perf.snapshot('load'),
+            'inventory': {
+                'version': inventory.get_version(),
+                'last_load_ms': round(inventory.load_seconds * 1000, 2),
+                'offices': len(inventory.office_records),
+                'devices': len(inventory.device_records)
+            }
+        },
+        'exporter': metrics_exporter.stats(),
+        'slow_requests': {
+            'threshold_ms': Config.SLOW_REQUEST_MS,
+            'log': Config.SLOW_REQUEST_LOG,
+            'recent': slow
+        }
+    })
+
+
+@bp.route('/perf', methods=['DELETE'])
+def reset_perf():
+    """Start a fresh measurement window, e.g. before a load test"""
+    perf.reset()
+    return jsonify({'message': 'Performance counters reset'})
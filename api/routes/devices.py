@@ -1,106 +1,145 @@
 """Device API endpoints"""
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, Response, current_app, jsonify, request
+from api.services.inventory_service import inventory
+from api.services.metrics_store import latest_metrics
+from api.services.history_store import history_store
+from api.services.alert_service import alert_engine
+from api.middleware import versioned
+from api.pagination import parse_limit, parse_fields, list_response
+from api.batch import parse_ids
 from api.models.device import Device
-from datetime import datetime, timedelta
-import json
-import random
+from datetime import datetime
+from config import Config
+import time
 
 bp = Blueprint('devices', __name__, url_prefix='/api/v1/devices')
 
-def load_devices():
-    with open('data/seed_data.json', 'r') as f:
-        data = json.load(f)
-    return [Device(**d) for d in data['devices']]
+
+def current_metrics(device):
+    """Latest polled sample, never blocks on the network"""
+    sample = latest_metrics.get(device.id)
+    if sample is None and Config.SIMULATE_DEVICES:
+        # poller has not reached this device yet
+        return device.get_metrics()
+    return sample or {}
+
+def device_detail(device):
+    device_info = device.to_dict()
+    device_info['current_metrics'] = current_metrics(device)
+    return device_info
+
+def devices_version():
+    # ?ids= carries live metrics, so its ETag has to follow them too
+    if 'ids' in request.args:
+        return (inventory.get_content_hash(), latest_metrics.version)
+    return inventory.get_content_hash()
 
 @bp.route('', methods=['GET'])
+@versioned(devices_version)
 def get_all_devices():
-    devices = load_devices()
-    
-    device_type = request.args.get('type')
-    if device_type:
-        devices = [d for d in devices if d.device_type == device_type]
-    
-    status = request.args.get('status')
-    if status:
-        devices = [d for d in devices if d.status == status]
-    
-    office_id = request.args.get('office_id')
-    if office_id:
-        devices = [d for d in devices if d.office_id == office_id]
+    try:
+        limit = parse_limit(request.args)
+        fields = parse_fields(request.args, Device.FIELDS)
+        device_ids = parse_ids(request.args, 'ids')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    if device_ids is not None:
+        devices = [inventory.get_device(device_id) for device_id in device_ids]
+        return jsonify({
+            'count': sum(1 for d in devices if d),
+            'devices': [device_detail(d) for d in devices if d],
+            'missing': [device_id for device_id, d in zip(device_ids, devices) if not d]
+        })
     
-    return jsonify({
-        'total': len(devices),
-        'devices': [d.to_dict() for d in devices]
-    })
+    # filtered and written straight from the fleet columns, no Device objects involved
+    fleet = inventory.get_fleet()
+    rows = fleet.select(
+        device_type=request.args.get('type'),
+        status=request.args.get('status'),
+        office_id=request.args.get('office_id')
+    )
+    
+    page, next_cursor = fleet.page(rows, request.args.get('after'), limit)
+    envelope = {'total': len(rows)}
+    if limit:
+        envelope.update({'limit': limit, 'next_cursor': next_cursor})
+    
+    if request.args.get('layout') == 'columns':
+        head = current_app.json.dumps(envelope)
+        body = head[:-1] + (',' if envelope else '') + '"columns":' + fleet.columns_json(page, fields) + '}'
+        return Response(body, mimetype='application/json')
+    
+    return list_response(envelope, 'devices', fleet.iter_json(page, fields), len(page), encoded=True)
 
 @bp.route('/<device_id>', methods=['GET'])
 def get_device(device_id):
-    devices = load_devices()
-    device = next((d for d in devices if d.id == device_id), None)
+    device = inventory.get_device(device_id)
     
     if not device:
         return jsonify({'error': 'Device not found'}), 404
     
-    device_info = device.to_dict()
-    device_info['current_metrics'] = device.get_metrics()
-    
-    return jsonify(device_info)
+    return jsonify(device_detail(device))
 
 @bp.route('/<device_id>/metrics', methods=['GET'])
 def get_device_metrics(device_id):
-    devices = load_devices()
-    device = next((d for d in devices if d.id == device_id), None)
+    device = inventory.get_device(device_id)
     
     if not device:
         return jsonify({'error': 'Device not found'}), 404
     
-    hours = int(request.args.get('hours', 24))
+    try:
+        hours = int(request.args.get('hours', 24))
+    except ValueError:
+        return jsonify({'error': 'Invalid hours parameter - must be a number'}), 400
     
-    # moch historical data
-    metrics_history = []
-    now = datetime.now()
+    max_hours = Config.HISTORY_RETENTION_DAYS * 24
+    if not 1 <= hours <= max_hours:
+        return jsonify({'error': f'hours must be between 1 and {max_hours}'}), 400
     
-    for i in range(hours):
-        timestamp = now - timedelta(hours=hours-i)
-        metrics = device.get_metrics()
-        metrics['timestamp'] = timestamp.isoformat()
-        metrics_history.append(metrics)
+    fields = request.args.get('metrics')
+    metrics = [name.strip() for name in fields.split(',') if name.strip()] if fields else None
+    
+    now = time.time()
+    try:
+        history = history_store.query(device_id, start=now - hours * 3600, end=now, metrics=metrics)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
     return jsonify({
         'device_id': device_id,
         'device_name': device.name,
         'period': f'{hours} hours',
-        'data_points': len(metrics_history),
-        'metrics': metrics_history
+        'data_points': len(history['timestamps']),
+        'metrics': history
     })
 
 @bp.route('/<device_id>/status', methods=['GET'])
 def get_device_status(device_id):
-    devices = load_devices()
-    device = next((d for d in devices if d.id == device_id), None)
+    device = inventory.get_device(device_id)
     
     if not device:
         return jsonify({'error': 'Device not found'}), 404
     
-    metrics = device.get_metrics()
+    metrics = current_metrics(device)
     
     # get health status
     health_status = 'healthy'
     warnings = []
     
-    if metrics['cpu_usage'] > 80:
+    if (metrics.get('cpu_usage') or 0) > 80:
         health_status = 'warning'
         warnings.append('High CPU usage')
     
-    if metrics['memory_usage'] > 85:
+    if (metrics.get('memory_usage') or 0) > 85:
         health_status = 'warning'
         warnings.append('High memory usage')
     
-    if metrics['temperature'] > 60:
+    if (metrics.get('temperature') or 0) > 60:
         health_status = 'warning'
         warnings.append('High temperature')
     
-    if metrics['packet_loss'] > 1:
+    if (metrics.get('packet_loss') or 0) > 1:
         health_status = 'warning'
         warnings.append('Packet loss detected')
     
@@ -115,50 +154,26 @@ def get_device_status(device_id):
         'health_status': health_status,
         'warnings': warnings,
         'metrics': metrics,
-        'last_updated': datetime.now().isoformat()
+        'last_updated': metrics.get('timestamp', datetime.now().isoformat())
     })
 
 @bp.route('/<device_id>/alerts', methods=['GET'])
 def get_device_alerts(device_id):
     """获取设备告警历史"""
-    devices = load_devices()
-    device = next((d for d in devices if d.id == device_id), None)
+    device = inventory.get_device(device_id)
     
     if not device:
         return jsonify({'error': 'Device not found'}), 404
     
-    # mock warning data
-    alerts = []
-    alert_types = [
-        'High CPU Usage',
-        'Memory Threshold Exceeded',
-        'High Temperature',
-        'Packet Loss Detected',
-        'Interface Down',
-        'Connection Timeout'
-    ]
-    
-    num_alerts = random.randint(5, 10)
-    now = datetime.now()
-    
-    for i in range(num_alerts):
-        alert_time = now - timedelta(hours=random.randint(1, 72))
-        severity = random.choice(['warning', 'critical', 'info'])
-        
-        alerts.append({
-            'id': f'ALERT-{device_id}-{i+1}',
-            'timestamp': alert_time.isoformat(),
-            'severity': severity,
-            'type': random.choice(alert_types),
-            'message': f'{random.choice(alert_types)} on {device.name}',
-            'acknowledged': random.choice([True, False])
-        })
-    
-    # sort by time
-    alerts.sort(key=lambda x: x['timestamp'], reverse=True)
+    try:
+        limit = parse_limit(request.args, default=50, maximum=100)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    alerts = alert_engine.query(device_id=device_id, state=request.args.get('state'), limit=limit)
     
     return jsonify({
         'device_id': device_id,
         'total_alerts': len(alerts),
+        'open_alerts': len([a for a in alerts if a['state'] == 'open']),
         'alerts': alerts
-    })
\ No newline at end of file
+    })
@@ -4,47 +4,26 @@ from api.services.weather_service import WeatherService
 from api.services.geo_service import GeoService
 from api.services.time_service import TimeService
 from api.services.news_service import NewsService
-
-from api.models.office import Office
-import json
+from api.services.inventory_service import inventory
+from api.services.http_gateway import gateway
+from api.services.spatial_index import spatial_index
+from api.middleware import versioned
+from api.batch import parse_ids, run_all
+from api.pagination import parse_number
+from config import Config
+import numpy as np
+import pytz
 
 bp = Blueprint('external', __name__, url_prefix='/api/v1/external')
 
 weather_service = WeatherService()
 geo_service = GeoService()
 time_service = TimeService()
+news_service = NewsService()
 
-def load_offices():
-    import os
-    base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-    seed_path = os.path.join(base_dir, 'data', 'seed_data.json')
-    
-    try:
-        if not os.path.exists(seed_path):
-            print(f"⚠️ seed_data.json not found, using empty data")
-            return []
-        
-        with open(seed_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        
-        return [Office.from_dict(o) for o in data.get('offices', [])]
-    except Exception as e:
-        print(f"❌ Error loading offices: {e}")
-        return []
-
-@bp.route('/weather/<office_id>', methods=['GET'])
-def get_office_weather(office_id):
-    offices = load_offices()
-    office = next((o for o in offices if o.id == office_id), None)
-    
-    if not office:
-        return jsonify({'error': 'Office not found'}), 404
-    
-    # get weather
-    weather = weather_service.get_weather(office.latitude, office.longitude)
-    
-    return jsonify({
-        'office_id': office_id,
+def office_weather(office):
+    return {
+        'office_id': office.id,
         'office_name': office.name,
         'location': {
             'city': office.city,
@@ -54,13 +33,62 @@ def get_office_weather(office_id):
                 'lng': office.longitude
             }
         },
-        'weather': weather
+        'weather': weather_service.get_weather(office.latitude, office.longitude)
+    }
+
+def office_time(office, time_info):
+    time_info = time_info or {}
+    
+    body = {
+        'office_id': office.id,
+        'office_name': office.name,
+        'local_time': time_info.get('datetime'),
+        'timezone': time_info.get('timezone'),
+        'utc_offset': time_info.get('utc_offset'),
+        'abbreviation': time_info.get('abbreviation'),
+        'dst': time_info.get('dst')
+    }
+    if 'remote_check' in time_info:
+        body['remote_check'] = time_info['remote_check']
+    return body
+
+def requested_offices():
+    """(found offices, missing ids) for ?office_ids=a,b,c; raises ValueError"""
+    office_ids = parse_ids(request.args, 'office_ids')
+    if office_ids is None:
+        raise ValueError('office_ids parameter required')
+    
+    offices = [inventory.get_office(office_id) for office_id in office_ids]
+    found = [office for office in offices if office]
+    missing = [office_id for office_id, office in zip(office_ids, offices) if not office]
+    return found, missing
+
+@bp.route('/weather', methods=['GET'])
+def get_weather_batch():
+    """Weather for ?office_ids=a,b,c, one concurrent upstream fetch per office"""
+    try:
+        offices, missing = requested_offices()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify({
+        'count': len(offices),
+        'weather': run_all(office_weather, offices),
+        'missing': missing
     })
 
+@bp.route('/weather/<office_id>', methods=['GET'])
+def get_office_weather(office_id):
+    office = inventory.get_office(office_id)
+    
+    if not office:
+        return jsonify({'error': 'Office not found'}), 404
+    
+    return jsonify(office_weather(office))
+
 @bp.route('/weather/forecast/<office_id>', methods=['GET'])
 def get_office_forecast(office_id):
-    offices = load_offices()
-    office = next((o for o in offices if o.id == office_id), None)
+    office = inventory.get_office(office_id)
     
     if not office:
         return jsonify({'error': 'Office not found'}), 404
@@ -92,23 +120,55 @@ def get_country_info(country_code):
     
     return jsonify(info)
 
+@bp.route('/time', methods=['GET'])
+def get_time_batch():
+    try:
+        offices, missing = requested_offices()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    # computed locally, so no fan-out: one clock read covers every office
+    times = time_service.get_office_times([office.id for office in offices])
+    
+    return jsonify({
+        'count': len(offices),
+        'times': [office_time(office, times.get(office.id)) for office in offices],
+        'missing': missing
+    })
+
 @bp.route('/time/<office_id>', methods=['GET'])
 def get_office_time(office_id):
-    offices = load_offices()
-    office = next((o for o in offices if o.id == office_id), None)
+    office = inventory.get_office(office_id)
     
     if not office:
         return jsonify({'error': 'Office not found'}), 404
     
-    time_info = time_service.get_timezone_time(office.timezone)
+    verify = request.args.get('verify', '').lower() in ('1', 'true', 'yes')
+    time_info = time_service.get_timezone_time(office.timezone, verify=verify)
     
-    return jsonify({
-        'office_id': office_id,
-        'office_name': office.name,
-        'local_time': time_info.get('datetime'),
-        'timezone': time_info.get('timezone'),
-        'utc_offset': time_info.get('utc_offset')
-    })
+    return jsonify(office_time(office, time_info))
+
+@bp.route('/time/convert', methods=['POST'])
+def convert_times():
+    """{"times": [...], "from": "Africa/Nairobi", "to": "UTC"}"""
+    payload = request.get_json(silent=True) or {}
+    times = payload.get('times')
+    if not isinstance(times, list) or not times or not payload.get('from') or not payload.get('to'):
+        return jsonify({'error': 'times (non-empty list), from and to are required'}), 400
+    if len(times) > Config.TIME_CONVERT_MAX:
+        return jsonify({'error': f'at most {Config.TIME_CONVERT_MAX} times per request'}), 400
+    
+    converted = time_service.convert_times(times, payload['from'], payload['to'])
+    if converted is None:
+        return jsonify({'error': 'Invalid timezone or time format'}), 400
+    
+    return jsonify(converted)
+
+@bp.route('/timezones', methods=['GET'])
+@versioned(lambda: pytz.__version__, max_age=Config.INVENTORY_MAX_AGE)
+def get_timezones():
+    timezones = time_service.get_all_timezones()
+    return jsonify({'count': len(timezones), 'timezones': timezones})
 
 @bp.route('/distance', methods=['GET'])
 def calculate_distance():
@@ -118,9 +178,8 @@ def calculate_distance():
     if not office1_id or not office2_id:
         return jsonify({'error': 'Both office1 and office2 parameters required'}), 400
     
-    offices = load_offices()
-    office1 = next((o for o in offices if o.id == office1_id), None)
-    office2 = next((o for o in offices if o.id == office2_id), None)
+    office1 = inventory.get_office(office1_id)
+    office2 = inventory.get_office(office2_id)
     
     if not office1 or not office2:
         return jsonify({'error': 'One or both offices not found'}), 404
@@ -144,6 +203,93 @@ def calculate_distance():
         'distance_km': distance
     })
 
+@bp.route('/distance/matrix', methods=['GET'])
+@versioned(lambda: inventory.get_content_hash(), max_age=Config.INVENTORY_MAX_AGE)
+def get_distance_matrix():
+    """All-pairs km between offices, or between ?office_ids=a,b,c"""
+    try:
+        office_ids = parse_ids(request.args, 'office_ids')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    ids, matrix = spatial_index.matrix(office_ids)
+    known = set(ids)
+    
+    return jsonify({
+        'unit': 'km',
+        'office_ids': ids,
+        'missing': [o for o in office_ids or [] if o not in known],
+        'distances': np.round(matrix, 2).tolist()
+    })
+
+def query_point():
+    """(lat, lon, office_id) from ?office_id= or ?lat=&lng=; raises ValueError/LookupError"""
+    office_id = request.args.get('office_id')
+    if office_id:
+        location = spatial_index.location(office_id)
+        if location is None:
+            raise LookupError('Office not found')
+        return location[0], location[1], office_id
+    
+    # empty values count as missing
+    lat = parse_number(request.args, 'lat', kind=float)
+    lon = parse_number(request.args, 'lng', kind=float)
+    if lat is None or lon is None:
+        raise ValueError('office_id or lat and lng parameters required')
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        raise ValueError('lat must be within ±90 and lng within ±180')
+    return lat, lon, None
+
+def office_distances(pairs):
+    offices = [inventory.get_office(office_id) for office_id, _ in pairs]
+    return [
+        {'id': office.id, 'name': office.name, 'city': office.city, 'distance_km': round(km, 2)}
+        for office, (_, km) in zip(offices, pairs)
+    ]
+
+@bp.route('/nearest', methods=['GET'])
+def get_nearest_offices():
+    """The k offices closest to a point or to another office"""
+    try:
+        lat, lon, office_id = query_point()
+        k = parse_number(request.args, 'k', default=5)
+        if not 1 <= k <= Config.SPATIAL_MAX_K:
+            raise ValueError(f'k must be between 1 and {Config.SPATIAL_MAX_K}')
+    except LookupError as e:
+        return jsonify({'error': str(e)}), 404
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    nearest = spatial_index.nearest(lat, lon, k, exclude=office_id)
+    
+    return jsonify({
+        'origin': {'office_id': office_id, 'lat': lat, 'lng': lon},
+        'k': k,
+        'offices': office_distances(nearest)
+    })
+
+@bp.route('/within', methods=['GET'])
+def get_offices_within():
+    """Every office within ?radius_km= of a point or another office"""
+    try:
+        lat, lon, office_id = query_point()
+        radius = parse_number(request.args, 'radius_km', default=0, kind=float)
+        if radius <= 0:
+            raise ValueError('radius_km must be positive')
+    except LookupError as e:
+        return jsonify({'error': str(e)}), 404
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    found = [pair for pair in spatial_index.within(lat, lon, radius) if pair[0] != office_id]
+    
+    return jsonify({
+        'origin': {'office_id': office_id, 'lat': lat, 'lng': lon},
+        'radius_km': radius,
+        'count': len(found),
+        'offices': office_distances(found)
+    })
+
 @bp.route('/connectivity/<country_code>', methods=['GET'])
 def get_connectivity_info(country_code):
     import random
@@ -164,10 +310,14 @@ def get_connectivity_info(country_code):
 
 @bp.route('/news')
 def get_latest_news():
-    service = NewsService()
-    news = service.get_latest_news()
+    news = news_service.get_latest_news()
 
     if not news:
         return jsonify({"news": []})
 
     return jsonify({"news": news})
+
+@bp.route('/stats')
+def get_gateway_stats():
+    """Outbound requests, coalesced calls and throttling per provider"""
+    return jsonify(gateway.stats())
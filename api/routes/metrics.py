@@ -0,0 +1,34 @@
+"""Prometheus scrape endpoint"""
+from flask import Blueprint, Response, request
+from api.services.metrics_exporter import metrics_exporter, OPENMETRICS_TYPE, PROMETHEUS_TYPE
+from api.middleware import choose_encoding
+
+bp = Blueprint('metrics', __name__)
+
+
+def wants_openmetrics():
+    # Prometheus sends versioned types (application/openmetrics-text;version=1.0.0),
+    # which best_match won't equate with the bare type, so compare on the type alone
+    quality = {}
+    for value, q in request.accept_mimetypes:
+        mimetype = value.split(';')[0].strip()
+        quality[mimetype] = max(q, quality.get(mimetype, 0))
+    return quality.get('application/openmetrics-text', 0) > quality.get('text/plain', 0)
+
+
+@bp.route('/metrics', methods=['GET'])
+def scrape():
+    """
+    Latest device, office and region metrics in the exposition format.
+
+    OpenMetrics when the scraper prefers it, the classic Prometheus
+    text format otherwise. Scrapers that don't accept compression get
+    the chunks streamed as they are rendered; the compression hook
+    needs the whole body, so only then is it joined.
+    """
+    openmetrics = wants_openmetrics()
+    content_type = OPENMETRICS_TYPE if openmetrics else PROMETHEUS_TYPE
+    chunks = metrics_exporter.render(openmetrics)
+    if choose_encoding() is None:
+        return Response(chunks, content_type=content_type)
+    return Response(''.join(chunks), content_type=content_type)
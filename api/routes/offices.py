@@ -1,60 +1,26 @@
 """Office API endpoints"""
 from flask import Blueprint, jsonify, request
 from api.models.office import Office
-import json
-import os
+from api.models.device import Device
+from api.services.inventory_service import inventory
+from api.middleware import versioned
+from api.pagination import parse_limit, parse_fields, list_response
+from config import Config
 
 bp = Blueprint('offices', __name__, url_prefix='/api/v1/offices')
 
 
-def load_offices():
-    import os
-    base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-    seed_path = os.path.join(base_dir, 'data', 'seed_data.json')
-    
-    try:
-        if not os.path.exists(seed_path):
-            print(f"⚠️ seed_data.json not found at {seed_path}")
-            return []
-        
-        with open(seed_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        
-        return [Office.from_dict(o) for o in data.get('offices', [])]
-    except Exception as e:
-        print(f"❌ Error loading offices: {e}")
-        return []
-
-
-def load_devices():
-    import os
-    base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-    seed_path = os.path.join(base_dir, 'data', 'seed_data.json')
-    
-    try:
-        if not os.path.exists(seed_path):
-            return []
-        
-        with open(seed_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        
-        return data.get('devices', [])
-    except Exception as e:
-        print(f"❌ Error loading devices: {e}")
-        return []
+def inventory_version(*args, **kwargs):
+    return inventory.get_content_hash()
 
 
 @bp.route('', methods=['GET'])
+@versioned(inventory_version, max_age=Config.INVENTORY_MAX_AGE)
 def get_all_offices():
-    offices = load_offices()
-    
-    region = request.args.get('region')
-    if region:
-        offices = [o for o in offices if o.region == region]
-    
-    status = request.args.get('status')
-    if status:
-        offices = [o for o in offices if o.status == status]
+    offices = inventory.get_offices(
+        region=request.args.get('region'),
+        status=request.args.get('status')
+    )
     
     return jsonify({
         'total': len(offices),
@@ -63,9 +29,9 @@ def get_all_offices():
 
 
 @bp.route('/<office_id>', methods=['GET'])
+@versioned(inventory_version, max_age=Config.INVENTORY_MAX_AGE)
 def get_office(office_id):
-    offices = load_offices()
-    office = next((o for o in offices if o.id == office_id), None)
+    office = inventory.get_office(office_id)
     
     if not office:
         return jsonify({'error': 'Office not found'}), 404
@@ -74,24 +40,32 @@ def get_office(office_id):
 
 
 @bp.route('/<office_id>/devices', methods=['GET'])
+@versioned(inventory_version)
 def get_office_devices(office_id):
-    offices = load_offices()
-    office = next((o for o in offices if o.id == office_id), None)
+    office = inventory.get_office(office_id)
     
     if not office:
         return jsonify({'error': 'Office not found'}), 404
     
-    from api.models.device import Device
-    devices_data = load_devices()
+    try:
+        limit = parse_limit(request.args)
+        fields = parse_fields(request.args, Device.FIELDS)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
-    devices = [Device(**d) for d in devices_data if d.get('office_id') == office_id]
+    fleet = inventory.get_fleet()
+    rows = fleet.select(office_id=office_id)
+    page, next_cursor = fleet.page(rows, request.args.get('after'), limit)
     
-    return jsonify({
+    envelope = {
         'office_id': office_id,
         'office_name': office.name,
-        'total_devices': len(devices),
-        'devices': [d.to_dict() for d in devices]
-    })
+        'total_devices': len(rows)
+    }
+    if limit:
+        envelope.update({'limit': limit, 'next_cursor': next_cursor})
+    
+    return list_response(envelope, 'devices', fleet.iter_json(page, fields), len(page), encoded=True)
 
 
 @bp.route('', methods=['POST'])
@@ -0,0 +1,11 @@
+"""Background poller endpoints"""
+from flask import Blueprint, jsonify
+from api.services.poller_service import fleet_poller
+
+bp = Blueprint('poller', __name__, url_prefix='/api/v1/poller')
+
+
+@bp.route('/stats', methods=['GET'])
+def get_poller_stats():
+    """Scheduler lag, queue depth and throughput"""
+    return jsonify(fleet_poller.stats())
@@ -1,6 +1,8 @@
 """SNMP API Endpoint"""
 from flask import Blueprint, jsonify, request
 from api.services.snmp_service import SNMPService
+from api.services.inventory_service import inventory
+from api.services.metrics_store import latest_metrics
 
 bp = Blueprint('snmp', __name__, url_prefix='/api/v1/snmp')
 
@@ -81,6 +83,14 @@ def get_all_metrics(host):
    
     community = request.args.get('community', 'public')
     port = int(request.args.get('port', 161))
+    live = request.args.get('live', 'false').lower() == 'true'
+    
+    # serve what the background poller already has for inventory devices
+    device = inventory.get_device_by_ip(host)
+    if device and not live:
+        sample = latest_metrics.get(device.id)
+        if sample and sample.get('snmp'):
+            return jsonify({**sample['snmp'], 'device_id': device.id, 'cached': True})
     
     metrics = snmp_service.get_all_metrics(host, community, port)
     
@@ -100,8 +110,9 @@ def snmp_walk(host):
     community = request.args.get('community', 'public')
     port = int(request.args.get('port', 161))
     max_results = int(request.args.get('max_results', 10))
+    max_repetitions = request.args.get('max_repetitions', type=int)
     
-    results = snmp_service.walk_oid(host, oid, community, port, max_results)
+    results = snmp_service.walk_oid(host, oid, community, port, max_results, max_repetitions)
     
     if not results:
         return jsonify({
@@ -118,6 +129,24 @@ def snmp_walk(host):
     })
 
 
+@bp.route('/device/<host>/interfaces', methods=['GET'])
+def get_interface_table(host):
+    
+    community = request.args.get('community', 'public')
+    port = int(request.args.get('port', 161))
+    max_repetitions = request.args.get('max_repetitions', type=int)
+    
+    table = snmp_service.get_interface_table(host, community, port, max_repetitions)
+    
+    if not table:
+        return jsonify({
+            'error': 'Unable to retrieve interface table',
+            'host': host
+        }), 404
+    
+    return jsonify(table)
+
+
 @bp.route('/discover', methods=['POST'])
 def discover_devices():
     
@@ -0,0 +1,25 @@
+"""Live update stream (Server-Sent Events)"""
+from flask import Blueprint, Response, jsonify, stream_with_context
+from api.services.stream_service import broadcaster
+
+bp = Blueprint('stream', __name__, url_prefix='/api/v1/stream')
+
+
+@bp.route('', methods=['GET'])
+def stream():
+    """Summary deltas, alert transitions and device status changes"""
+    subscriber = broadcaster.subscribe()
+    return Response(
+        stream_with_context(broadcaster.events(subscriber)),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        }
+    )
+
+
+@bp.route('/stats', methods=['GET'])
+def get_stream_stats():
+    """Connected clients, queue depth and evictions"""
+    return jsonify(broadcaster.stats())
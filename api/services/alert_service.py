@@ -0,0 +1,419 @@
+"""Stateful alert engine evaluated on every metrics sample"""
+from api.services.inventory_service import inventory
+from collections import deque
+from datetime import datetime
+from config import Config
+import threading
+import operator
+import bisect
+import time
+
+SEVERITIES = ['critical', 'warning', 'info']
+
+# fields of an alert as the API returns it
+ALERT_FIELDS = (
+    'id', 'rule', 'type', 'severity', 'state', 'device_id', 'device_name', 'office_id',
+    'office_name', 'country', 'region', 'metric', 'threshold', 'value', 'peak_value',
+    'message', 'timestamp', 'opened_at', 'reopened_at', 'last_seen', 'resolved_at', 'resolved', 'count',
+    'flapping', 'flap_count', 'acknowledged'
+)
+
+OPERATORS = {
+    '>': operator.gt,
+    '>=': operator.ge,
+    '<': operator.lt,
+    '<=': operator.le
+}
+
+# the clear condition is the opposite comparison against the clear threshold
+CLEAR_OPERATORS = {
+    '>': operator.le,
+    '>=': operator.lt,
+    '<': operator.ge,
+    '<=': operator.gt
+}
+
+
+class Rule:
+    """A threshold rule compiled from its config dict"""
+
+    __slots__ = ('name', 'metric', 'op', 'threshold', 'clear', 'severity', 'type',
+                 'for_samples', 'clear_samples', 'worse', '_breached', '_cleared')
+
+    def __init__(self, name, metric, op, threshold, severity, type, clear=None,
+                 for_samples=1, clear_samples=1):
+        if op not in OPERATORS:
+            raise ValueError(f'Unsupported operator {op!r} in rule {name}')
+        if severity not in SEVERITIES:
+            raise ValueError(f'Unsupported severity {severity!r} in rule {name}')
+
+        self.name = name
+        self.metric = metric
+        self.op = op
+        self.threshold = threshold
+        self.clear = threshold if clear is None else clear
+        self.severity = severity
+        self.type = type
+        self.for_samples = max(1, for_samples)
+        self.clear_samples = max(1, clear_samples)
+        self._breached = OPERATORS[op]
+        self._cleared = CLEAR_OPERATORS[op]
+        # picks the peak value of an open alert
+        self.worse = max if op in ('>', '>=') else min
+
+    def breached(self, value):
+        return self._breached(value, self.threshold)
+
+    def cleared(self, value):
+        return self._cleared(value, self.clear)
+
+
+def compile_rules(rules):
+    """Index rules by the metric they read so a sample only checks its own"""
+    by_metric = {}
+    for spec in rules:
+        rule = spec if isinstance(spec, Rule) else Rule(**spec)
+        by_metric.setdefault(rule.metric, []).append(rule)
+    return by_metric
+
+
+def alert_seq(alert_id):
+    """Sequence number from an ALERT-00042 id, ValueError if it isn't one"""
+    prefix, _, number = alert_id.rpartition('-')
+    if prefix != 'ALERT':
+        raise ValueError(f'Invalid alert id {alert_id!r}')
+    return int(number)
+
+
+def sample_value(sample, metric):
+    if metric == 'online':
+        return 0.0 if sample.get('status') == 'offline' else 1.0
+    return sample.get(metric)
+
+
+class AlertStore:
+    """
+    Alerts kept in memory with time-ordered indexes.
+
+    Every index is a list of alert sequence numbers in the order the
+    alerts opened, so a filtered query binary-searches its `after` cursor
+    in the narrowest matching index, walks back from there and stops once
+    it has enough rows. Pruned alerts are skipped lazily.
+
+    A reopened alert keeps its place (and opened_at), so alerts that
+    reopened are also tracked separately for `since` queries.
+    """
+
+    def __init__(self, max_alerts=None):
+        self.max_alerts = max_alerts or Config.ALERT_HISTORY_SIZE
+        self._alerts = {}
+        self._by_time = []
+        self._by_severity = {}
+        self._by_office = {}
+        self._by_device = {}
+        self._resolved = deque()
+        self._reopened = {}
+        self._seq = 0
+
+    def add(self, alert):
+        self._seq += 1
+        alert['id'] = f'ALERT-{self._seq:05d}'
+        alert['seq'] = self._seq
+        self._alerts[self._seq] = alert
+        self._by_time.append(self._seq)
+        self._by_severity.setdefault(alert['severity'], []).append(self._seq)
+        self._by_office.setdefault(alert['office_id'], []).append(self._seq)
+        self._by_device.setdefault(alert['device_id'], []).append(self._seq)
+        return alert
+
+    def mark_resolved(self, alert):
+        self._resolved.append(alert['seq'])
+        self._prune()
+
+    def mark_reopened(self, alert):
+        self._reopened[alert['seq']] = alert
+
+    def _prune(self):
+        # only resolved alerts are dropped, open ones stay until they clear
+        while len(self._alerts) > self.max_alerts and self._resolved:
+            seq = self._resolved.popleft()
+            alert = self._alerts.get(seq)
+            if not alert or alert['state'] != 'resolved':
+                continue
+            del self._alerts[seq]
+            self._reopened.pop(seq, None)
+
+            for index in (self._by_time, self._by_severity[alert['severity']],
+                          self._by_office[alert['office_id']], self._by_device[alert['device_id']]):
+                dead = 0
+                while dead < len(index) and index[dead] not in self._alerts:
+                    dead += 1
+                if dead:
+                    del index[:dead]
+
+    def get(self, alert_id):
+        try:
+            return self._alerts.get(alert_seq(alert_id))
+        except ValueError:
+            return None
+
+    def query(self, severity=None, office_id=None, device_id=None, since=None,
+              until=None, state=None, limit=50, after=None):
+        """Newest first, every filter optional; after is the last id of the previous page"""
+        candidates = [self._by_time]
+        if severity:
+            candidates.append(self._by_severity.get(severity, []))
+        if office_id:
+            candidates.append(self._by_office.get(office_id, []))
+        if device_id:
+            candidates.append(self._by_device.get(device_id, []))
+        index = min(candidates, key=len)
+        # keyset seek: everything before this position opened before the cursor
+        end = bisect.bisect_left(index, alert_seq(after)) if after else len(index)
+
+        def matches(alert):
+            return not ((until and alert['opened_at'] > until)
+                        or (severity and alert['severity'] != severity)
+                        or (office_id and alert['office_id'] != office_id)
+                        or (device_id and alert['device_id'] != device_id)
+                        or (state and alert['state'] != state))
+
+        results = []
+        for position in range(end - 1, -1, -1):
+            alert = self._alerts.get(index[position])
+            if alert is None:
+                continue
+            if since and alert['opened_at'] < since:
+                # indexes are ordered by open time, so older alerts only
+                # match if they reopened since; those are tracked apart
+                reopened = sorted(
+                    (a for a in self._reopened.values()
+                     if a['seq'] <= alert['seq'] and a['reopened_at'] >= since and matches(a)),
+                    key=lambda a: a['seq'], reverse=True
+                )
+                results.extend(reopened[:limit - len(results)] if limit else reopened)
+                break
+            if not matches(alert):
+                continue
+            results.append(alert)
+            if limit and len(results) >= limit:
+                break
+        return results
+
+    def __len__(self):
+        return len(self._alerts)
+
+
+class AlertEngine:
+    """
+    Evaluates compiled threshold rules against each sample as it arrives.
+
+    Per device and rule it tracks consecutive breaching and clearing
+    samples: an alert opens after `for_samples` breaches and resolves
+    after `clear_samples` readings past the clear threshold, which sits
+    below the firing threshold (hysteresis). While open, further breaches
+    only update the existing alert. An alert that fires again within the
+    flap window of resolving is reopened and marked flapping instead of
+    producing a new one.
+    """
+
+    def __init__(self, rules=None, inventory_store=None, store=None, flap_window=None):
+        self.rules = compile_rules(Config.ALERT_RULES if rules is None else rules)
+        self.inventory = inventory_store or inventory
+        self.store = store or AlertStore()
+        self.flap_window = Config.ALERT_FLAP_WINDOW if flap_window is None else flap_window
+
+        self._lock = threading.Lock()
+        # (device_id, rule name) -> [breach streak, clear streak, open alert, last resolved alert]
+        self._state = {}
+        self._listeners = []
+        # kept up to date on open/resolve so summaries never walk _state
+        self._open_counts = dict.fromkeys(SEVERITIES, 0)
+        self.samples_evaluated = 0
+        self.alerts_opened = 0
+        self.alerts_resolved = 0
+        self.alerts_reopened = 0
+
+    def on_sample(self, device_id, sample, previous=None):
+        """LatestMetricsStore listener"""
+        self.evaluate(device_id, sample)
+
+    def evaluate(self, device_id, sample, now=None):
+        """Run the rules for one sample, returns the alerts that changed state"""
+        now = now or sample.get('ts') or time.time()
+        changed = []
+
+        with self._lock:
+            self.samples_evaluated += 1
+            for metric, rules in self.rules.items():
+                value = sample_value(sample, metric)
+                if value is None:
+                    continue
+                for rule in rules:
+                    alert = self._apply(device_id, rule, value, now)
+                    if alert is not None:
+                        changed.append(alert)
+            # snapshot while still holding the lock, listeners run outside it
+            payloads = [to_dict(a) for a in changed] if self._listeners else []
+            listeners = list(self._listeners)
+
+        for payload in payloads:
+            for listener in listeners:
+                try:
+                    listener(payload)
+                except Exception as e:
+                    print(f"❌ Alert listener error: {e}")
+
+        return changed
+
+    def subscribe(self, listener):
+        """Register listener(alert) for every alert that opens, reopens or resolves"""
+        with self._lock:
+            if listener not in self._listeners:
+                self._listeners.append(listener)
+
+    def unsubscribe(self, listener):
+        with self._lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+    def _apply(self, device_id, rule, value, now):
+        key = (device_id, rule.name)
+        state = self._state.get(key)
+        if state is None:
+            state = self._state[key] = [0, 0, None, None]
+
+        open_alert = state[2]
+        if rule.breached(value):
+            state[0] += 1
+            state[1] = 0
+            if open_alert is not None:
+                open_alert['last_seen'] = now
+                open_alert['value'] = value
+                open_alert['peak_value'] = rule.worse(open_alert['peak_value'], value)
+                open_alert['count'] += 1
+                return None
+            if state[0] >= rule.for_samples:
+                state[2] = self._open(device_id, rule, value, now, state[3])
+                return state[2]
+        elif open_alert is not None and rule.cleared(value):
+            state[1] += 1
+            state[0] = 0
+            if state[1] >= rule.clear_samples:
+                open_alert['state'] = 'resolved'
+                open_alert['resolved_at'] = now
+                open_alert['value'] = value
+                state[2] = None
+                state[3] = open_alert
+                self._open_counts[open_alert['severity']] -= 1
+                self.alerts_resolved += 1
+                self.store.mark_resolved(open_alert)
+                return open_alert
+        else:
+            # in the hysteresis band or plainly fine, either way no streak
+            state[0] = 0
+            state[1] = 0
+
+        return None
+
+    def _open(self, device_id, rule, value, now, last_resolved):
+        if (last_resolved is not None and now - last_resolved['resolved_at'] <= self.flap_window
+                and self.store.get(last_resolved['id']) is last_resolved):
+            last_resolved['state'] = 'open'
+            last_resolved['reopened_at'] = now
+            last_resolved['resolved_at'] = None
+            last_resolved['flapping'] = True
+            last_resolved['flap_count'] += 1
+            last_resolved['last_seen'] = now
+            last_resolved['value'] = value
+            last_resolved['count'] += 1
+            self.store.mark_reopened(last_resolved)
+            self._open_counts[rule.severity] += 1
+            self.alerts_reopened += 1
+            return last_resolved
+
+        device = self.inventory.get_device_record(device_id) or {}
+        office = self.inventory.get_office_record(device.get('office_id')) or {}
+        device_name = device.get('name', device_id)
+        office_name = office.get('name', '')
+
+        alert = {
+            'rule': rule.name,
+            'type': rule.type,
+            'severity': rule.severity,
+            'state': 'open',
+            'device_id': device_id,
+            'device_name': device_name,
+            'office_id': office.get('id', device.get('office_id')),
+            'office_name': office_name,
+            'country': office.get('country', ''),
+            'region': office.get('region', ''),
+            'metric': rule.metric,
+            'threshold': rule.threshold,
+            'value': value,
+            'peak_value': value,
+            'message': f"{rule.type} on {device_name}" + (f" at {office_name}" if office_name else ''),
+            'opened_at': now,
+            'reopened_at': None,
+            'last_seen': now,
+            'resolved_at': None,
+            'count': 1,
+            'flapping': False,
+            'flap_count': 0,
+            'acknowledged': False
+        }
+        self.alerts_opened += 1
+        self._open_counts[rule.severity] += 1
+        return self.store.add(alert)
+
+    # Reading
+
+    def query(self, severity=None, office_id=None, device_id=None, since=None,
+              until=None, state=None, limit=50, after=None, fields=None):
+        """API dicts, only the listed fields when fields is given"""
+        with self._lock:
+            alerts = self.store.query(severity, office_id, device_id, since, until, state, limit, after)
+            return [to_dict(a, fields) for a in alerts]
+
+    def counts(self):
+        """Open alerts per severity"""
+        with self._lock:
+            return dict(self._open_counts)
+
+    def stats(self):
+        return {
+            'rules': sum(len(rules) for rules in self.rules.values()),
+            'samples_evaluated': self.samples_evaluated,
+            'alerts_stored': len(self.store),
+            'alerts_open': sum(self.counts().values()),
+            'alerts_opened': self.alerts_opened,
+            'alerts_resolved': self.alerts_resolved,
+            'alerts_reopened': self.alerts_reopened
+        }
+
+
+# API field -> the epoch field it is formatted from
+TIMESTAMP_FIELDS = {
+    'timestamp': 'opened_at',
+    'opened_at': 'opened_at',
+    'reopened_at': 'reopened_at',
+    'last_seen': 'last_seen',
+    'resolved_at': 'resolved_at'
+}
+
+
+def to_dict(alert, fields=None):
+    """API shape of an alert, epoch timestamps as ISO strings; only `fields` are built"""
+    result = {}
+    for name in fields or ALERT_FIELDS:
+        if name in TIMESTAMP_FIELDS:
+            ts = alert[TIMESTAMP_FIELDS[name]]
+            result[name] = datetime.fromtimestamp(ts).isoformat() if ts else None
+        elif name == 'resolved':
+            result[name] = alert['state'] == 'resolved'
+        else:
+            result[name] = alert[name]
+    return result
+
+
+alert_engine = AlertEngine()
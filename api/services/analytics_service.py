@@ -1,62 +1,61 @@
-from datetime import datetime, timedelta
-import json
-import random
-from collections import defaultdict
+from api.services.inventory_service import inventory
+from api.services.rollup_service import rollup_service
+from api.services.alert_service import alert_engine
+from api.services.fleet_frame import fleet_frame, health_scores, group_mean, nan_round
+from api.models import records
+from api.json_provider import format_timestamps
+from datetime import datetime
+import numpy as np
+import time
 
 class AnalyticsService:
     
-    def __init__(self):
-        self.load_data()
+    def __init__(self, inventory_store=None, rollups=None, frame=None, alerts=None):
+        self.inventory = inventory_store or inventory
+        self.rollups = rollups or rollup_service
+        self.frame = frame or fleet_frame
+        self.alerts = alerts or alert_engine
     
-    def load_data(self):
-        try:
-            with open('data/seed_data.json', 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
-            self.offices = data.get('offices', [])
-            self.devices = data.get('devices', [])
-            
-            print(f"✅ Loaded {len(self.offices)} offices and {len(self.devices)} devices")
-            
-        except FileNotFoundError:
-            print("⚠️ seed_data.json not found, using empty data")
-            self.offices = []
-            self.devices = []
-        except Exception as e:
-            print(f"❌ Error loading data: {e}")
-            self.offices = []
-            self.devices = []
+    @property
+    def offices(self):
+        return self.inventory.get_office_records()
+    
+    @property
+    def devices(self):
+        return self.inventory.get_device_records()
     
     def get_global_summary(self):
-        total_devices = len(self.devices)
-        online_rate = random.uniform(0.90, 0.98)
-        online_devices = int(total_devices * online_rate)
-        
-        total_offices = len(self.offices)
-        active_rate = random.uniform(0.95, 1.0)
-        active_offices = int(total_offices * active_rate)
-        
-        regions = defaultdict(lambda: {'offices': 0, 'devices': 0})
-        
-        for office in self.offices:
-            region = office.get('region', 'Unknown')
-            regions[region]['offices'] += 1
-        
-        for device in self.devices:
-            office_id = device.get('office_id')
-            office = next((o for o in self.offices if o['id'] == office_id), None)
-            if office:
-                region = office.get('region', 'Unknown')
-                regions[region]['devices'] += 1
-        
-        critical_alerts = random.randint(0, 5)
-        warning_alerts = random.randint(5, 20)
-        info_alerts = random.randint(10, 50)
-        
-        avg_uptime = round(random.uniform(98.0, 99.9), 2)
-        avg_response_time = round(random.uniform(20, 80), 1)
-        avg_cpu = round(random.uniform(30, 60), 1)
-        avg_memory = round(random.uniform(40, 70), 1)
+        state = self.frame.state()
+        
+        total_devices = len(state.device_ids)
+        online_devices = int(state.online.sum())
+        
+        # an office is active if it is marked active and has a device online (or no devices at all)
+        office_count = len(state.office_ids)
+        known = state.device_office >= 0
+        online_per_office = np.bincount(state.device_office[known], weights=state.online[known], minlength=office_count)
+        devices_per_office = np.bincount(state.device_office[known], minlength=office_count)
+        active = state.office_active & ((online_per_office > 0) | (devices_per_office == 0))
+        
+        total_offices = office_count
+        active_offices = int(active.sum())
+        
+        region_count = len(state.regions)
+        offices_per_region = np.bincount(state.office_region, minlength=region_count)
+        devices_per_region = np.bincount(state.device_region[state.device_region >= 0], minlength=region_count)
+        region_health = group_mean(health_scores(state), state.device_region, region_count)
+        
+        open_alerts = self.alerts.counts()
+        critical_alerts = open_alerts['critical']
+        warning_alerts = open_alerts['warning']
+        info_alerts = open_alerts['info']
+        
+        metrics = state.metrics
+        polled = state.polled
+        avg_uptime = nan_round(state.availability.mean() * 100, 2) if total_devices else 0
+        avg_response_time = nan_round(np.nanmean(metrics['latency'][polled]) if polled.any() else np.nan)
+        avg_cpu = nan_round(np.nanmean(metrics['cpu_usage'][polled]) if polled.any() else np.nan)
+        avg_memory = nan_round(np.nanmean(metrics['memory_usage'][polled]) if polled.any() else np.nan)
         
         return {
             'timestamp': datetime.now().isoformat(),
@@ -83,39 +82,48 @@ class AnalyticsService:
             'regional_breakdown': [
                 {
                     'region': region,
-                    'offices': stats['offices'],
-                    'devices': stats['devices'],
-                    'health_score': round(random.uniform(85, 98), 1)
+                    'offices': int(offices_per_region[i]),
+                    'devices': int(devices_per_region[i]),
+                    'health_score': nan_round(region_health[i])
                 }
-                for region, stats in regions.items()
+                for i, region in enumerate(state.regions)
             ]
         }
     
     def get_region_analytics(self, region):
-      
-        region_offices = [o for o in self.offices if o.get('region') == region]
+        state = self.frame.state()
         
-        if not region_offices:
+        if region not in state.regions:
             return None
         
-        office_ids = [o['id'] for o in region_offices]
-        region_devices = [d for d in self.devices if d.get('office_id') in office_ids]
+        region_code = state.regions.index(region)
+        office_rows = np.flatnonzero(state.office_region == region_code)
+        device_mask = state.device_region == region_code
+        
+        office_count = len(state.office_ids)
+        scores = health_scores(state)
+        office_health = group_mean(scores, state.device_office, office_count)
+        devices_per_office = np.bincount(state.device_office[state.device_office >= 0], minlength=office_count)
         
-        online_rate = random.uniform(0.90, 0.98)
-        online_devices = int(len(region_devices) * online_rate)
+        total_devices = int(device_mask.sum())
+        metrics = state.metrics
+        polled = device_mask & state.polled
+        
+        def region_mean(name):
+            return np.nanmean(metrics[name][polled]) if polled.any() else np.nan
         
         return {
             'region': region,
             'summary': {
-                'total_offices': len(region_offices),
-                'total_devices': len(region_devices),
-                'online_devices': online_devices,
-                'avg_devices_per_office': round(len(region_devices) / len(region_offices), 1) if len(region_offices) > 0 else 0
+                'total_offices': len(office_rows),
+                'total_devices': total_devices,
+                'online_devices': int(state.online[device_mask].sum()),
+                'avg_devices_per_office': round(total_devices / len(office_rows), 1) if len(office_rows) > 0 else 0
             },
             'performance': {
-                'average_uptime_pct': round(random.uniform(95, 99.5), 2),
-                'average_latency_ms': round(random.uniform(30, 100), 1),
-                'packet_loss_pct': round(random.uniform(0.1, 2), 2)
+                'average_uptime_pct': nan_round(state.availability[device_mask].mean() * 100, 2) if total_devices else 0,
+                'average_latency_ms': nan_round(region_mean('latency')),
+                'packet_loss_pct': nan_round(region_mean('packet_loss'), 2)
             },
             'offices': [
                 {
@@ -123,133 +131,82 @@ class AnalyticsService:
                     'name': o['name'],
                     'country': o['country'],
                     'city': o['city'],
-                    'status': 'active',
-                    'health_score': round(random.uniform(85, 99), 1),
-                    'devices_count': len([d for d in region_devices if d.get('office_id') == o['id']])
+                    'status': o.get('status', 'active'),
+                    'health_score': nan_round(office_health[row]),
+                    'devices_count': int(devices_per_office[row])
                 }
-                for o in region_offices
+                for row in office_rows
+                for o in (state.office_records[row],)
             ]
         }
     
-    def get_alerts(self, severity=None, limit=50):
-        """mock data"""
-        alert_types = [
-            'High CPU Usage',
-            'Memory Threshold Exceeded',
-            'Device Offline',
-            'High Temperature',
-            'Packet Loss Detected',
-            'Interface Down',
-            'Configuration Changed',
-            'Security Event',
-            'Backup Failed',
-            'License Expiring',
-            'Disk Space Low',
-            'Fan Speed Warning'
-        ]
-        
-        severities = ['critical', 'warning', 'info']
-        alerts = []
-        
-        num_alerts = min(limit, random.randint(20, 100))
-        
-        for i in range(num_alerts):
-            if severity:
-                alert_severity = severity
-            else:
-                alert_severity = random.choices(
-                    severities,
-                    weights=[0.1, 0.3, 0.6],  # 10% critical, 30% warning, 60% info
-                    k=1
-                )[0]
-            
-            if not self.devices:
-                break
-                
-            device = random.choice(self.devices)
-            
-            office = next((o for o in self.offices if o['id'] == device.get('office_id')), None)
-            
-            if not office:
-                continue
-            
-            hours_ago = random.randint(0, 72)
-            minutes_ago = random.randint(0, 59)
-            alert_time = datetime.now() - timedelta(hours=hours_ago, minutes=minutes_ago)
-            
-            alert_type = random.choice(alert_types)
-            
-            alerts.append({
-                'id': f'ALERT-{i+1:05d}',
-                'timestamp': alert_time.isoformat(),
-                'severity': alert_severity,
-                'type': alert_type,
-                'device_id': device['id'],
-                'device_name': device['name'],
-                'office_id': office['id'],
-                'office_name': office['name'],
-                'country': office['country'],
-                'message': f"{alert_type} detected on {device['name']} at {office['name']}",
-                'acknowledged': random.choice([True, False, False, False]),  # 25% 已确认
-                'resolved': random.choice([True, False, False, False])  # 25% 已解决
-            })
-        
-        alerts.sort(key=lambda x: x['timestamp'], reverse=True)
-        
+    def get_alerts(self, severity=None, limit=50, office_id=None, since=None, state=None, after=None,
+                   fields=None):
+        # the cursor and counts need id and severity even when they weren't asked for
+        extra = [name for name in ('id', 'severity') if fields is not None and name not in fields]
+        # one extra row tells us whether there is another page
+        alerts = self.alerts.query(severity=severity, office_id=office_id, since=since,
+                                   state=state, limit=limit + 1, after=after,
+                                   fields=list(fields) + extra if fields is not None else None)
+        has_more = len(alerts) > limit
         alerts = alerts[:limit]
+        open_counts = self.alerts.counts()
         
-        return {
+        result = {
             'total': len(alerts),
+            'next_cursor': alerts[-1]['id'] if has_more else None,
             'severity_filter': severity,
             'critical_count': len([a for a in alerts if a['severity'] == 'critical']),
             'warning_count': len([a for a in alerts if a['severity'] == 'warning']),
             'info_count': len([a for a in alerts if a['severity'] == 'info']),
+            'open_counts': open_counts,
             'alerts': alerts
         }
+        for alert in alerts:
+            for name in extra:
+                del alert[name]
+        return result
     
-    def get_performance_trends(self, days=7):
-        
-        trends = []
-        
-        total_hours = days * 24
-        
-        for i in range(total_hours):
-            timestamp = datetime.now() - timedelta(hours=total_hours - i)
-            
-            hour_of_day = timestamp.hour
-            
-            base_cpu = 45
-            if 8 <= hour_of_day <= 18:
-                base_cpu = 60
-            cpu_usage = base_cpu + random.uniform(-10, 10)
-            
-            base_memory = 50 + (i / total_hours) * 10
-            memory_usage = base_memory + random.uniform(-5, 5)
-            
-            base_bandwidth = 20
-            if 8 <= hour_of_day <= 18:
-                base_bandwidth = 40
-            bandwidth = base_bandwidth + random.uniform(-10, 10)
-            
-            latency = random.uniform(20, 80)
-            
-            packet_loss = random.uniform(0, 0.5) if random.random() > 0.9 else random.uniform(0, 2)
-            
-            total_devices = len(self.devices)
-            devices_online = total_devices - random.randint(0, int(total_devices * 0.05))
-            
-            trends.append({
-                'timestamp': timestamp.isoformat(),
-                'avg_cpu_usage': round(cpu_usage, 2),
-                'avg_memory_usage': round(memory_usage, 2),
-                'avg_bandwidth_mbps': round(bandwidth, 2),
-                'avg_latency_ms': round(latency, 2),
-                'packet_loss_pct': round(packet_loss, 3),
-                'devices_online': devices_online
-            })
+    def get_performance_trends(self, days=7, scope='global', scope_id=''):
+        
+        end = time.time()
+        resolution, buckets = self.rollups.query(scope, scope_id, end - days * 86400, end)
+        
+        if scope == 'global':
+            device_count = len(self.devices)
+        elif scope == 'region':
+            device_count = len(self.inventory.get_region_devices(scope_id))
+        elif scope == 'office':
+            device_count = len(self.inventory.get_office_devices(scope_id))
+        else:
+            device_count = 1
+        
+        def avg(metrics, name):
+            return round(metrics[name]['avg'], 2) if name in metrics else 0
+        
+        def p95(metrics, name):
+            return round(metrics[name]['p95'], 2) if name in metrics else 0
+        
+        trends = [
+            {
+                'timestamp': timestamp,
+                'avg_cpu_usage': avg(metrics, 'cpu_usage'),
+                'p95_cpu_usage': p95(metrics, 'cpu_usage'),
+                'avg_memory_usage': avg(metrics, 'memory_usage'),
+                'avg_bandwidth_mbps': avg(metrics, 'bandwidth'),
+                'avg_latency_ms': avg(metrics, 'latency'),
+                'p95_latency_ms': p95(metrics, 'latency'),
+                'packet_loss_pct': round(metrics['packet_loss']['avg'], 3) if 'packet_loss' in metrics else 0,
+                'devices_online': round(metrics['online']['avg'] * device_count) if 'online' in metrics else 0
+            }
+            for timestamp, metrics in zip(format_timestamps(list(buckets)), buckets.values())
+        ]
         
         return {
             'period_days': days,
+            'scope': scope,
+            'scope_id': scope_id or None,
+            'resolution_seconds': resolution,
             'data_points': len(trends),
             'start_time': trends[0]['timestamp'] if trends else None,
             'end_time': trends[-1]['timestamp'] if trends else None,
@@ -257,63 +214,63 @@ class AnalyticsService:
         }
     
     def get_top_performers(self, limit=10):
-        if not self.devices:
+        state = self.frame.state()
+        
+        candidates = np.flatnonzero(state.device_office >= 0)
+        if not len(candidates):
             return []
         
-        performers = []
+        uptime = state.availability[candidates] * 100
+        reliability = health_scores(state)[candidates]
+        combined = (uptime + reliability) / 2
+        
+        # argpartition finds the top k in O(n), only those k get sorted
+        k = min(limit, len(candidates))
+        top = np.argpartition(-combined, k - 1)[:k]
+        top = top[np.argsort(-combined[top], kind='stable')]
         
-        eval_count = min(limit * 2, len(self.devices))
-        eval_devices = random.sample(self.devices, eval_count)
-        
-        for device in eval_devices:
-            office = next((o for o in self.offices if o['id'] == device.get('office_id')), None)
-            
-            if not office:
-                continue
-            
-            uptime = round(random.uniform(99, 99.99), 2)
-            response_time = round(random.uniform(5, 30), 2)
-            reliability = round(random.uniform(95, 100), 1)
-            
+        latency = state.metrics['latency']
+        performers = []
+        for position in top:
+            row = candidates[position]
+            device = state.device_records[row]
+            office = state.office_records[state.device_office[row]]
             performers.append({
                 'device_id': device['id'],
                 'device_name': device['name'],
-                'device_type': device.get('device_type', 'unknown'),
+                'device_type': records.device_type(device),
                 'office_name': office['name'],
                 'country': office['country'],
-                'region': office.get('region', 'Unknown'),
-                'uptime_pct': uptime,
-                'avg_response_time_ms': response_time,
-                'reliability_score': reliability,
-                'combined_score': round((uptime + reliability) / 2, 2)
+                'region': records.office_region(office),
+                'uptime_pct': round(float(uptime[position]), 2),
+                'avg_response_time_ms': nan_round(latency[row], 2),
+                'reliability_score': round(float(reliability[position]), 1),
+                'combined_score': round(float(combined[position]), 2)
             })
         
-        performers.sort(key=lambda x: x['combined_score'], reverse=True)
-        
-        return performers[:limit]
+        return performers
     
     def get_device_type_distribution(self):
         """获取设备类型分布统计"""
-        if not self.devices:
+        state = self.frame.state()
+        total = len(state.device_ids)
+        
+        if not total:
             return {
                 'total_devices': 0,
                 'distribution': []
             }
         
-        type_counts = defaultdict(int)
-        for device in self.devices:
-            device_type = device.get('device_type', 'unknown')
-            type_counts[device_type] += 1
-        
-        total = sum(type_counts.values())
+        counts = np.bincount(state.device_type, minlength=len(state.types))
+        order = np.argsort(-counts, kind='stable')
         
         distribution = [
             {
-                'type': device_type.capitalize(),
-                'count': count,
-                'percentage': round(count / total * 100, 1) if total > 0 else 0
+                'type': str(state.types[i]).capitalize(),
+                'count': int(counts[i]),
+                'percentage': round(counts[i] / total * 100, 1)
             }
-            for device_type, count in sorted(type_counts.items(), key=lambda x: x[1], reverse=True)
+            for i in order
         ]
         
         return {
@@ -322,9 +279,10 @@ class AnalyticsService:
             'distribution': distribution
         }
     
-    def calculate_health_score(self):
+    def calculate_health_score(self, summary=None):
         """计算整体健康评分"""
-        summary = self.get_global_summary()
+        if summary is None:
+            summary = self.get_global_summary()
         
         device_health = summary['global_health']['device_health']
         office_health = summary['global_health']['office_health']
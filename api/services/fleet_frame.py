@@ -0,0 +1,153 @@
+"""Columnar, NumPy-backed view of the fleet and its latest metrics"""
+from api.services.inventory_service import inventory
+from api.services.metrics_store import latest_metrics
+from api.models import records
+import numpy as np
+import threading
+
+FRAME_METRICS = [
+    'cpu_usage', 'memory_usage', 'bandwidth_in', 'bandwidth_out',
+    'latency', 'packet_loss', 'temperature', 'uptime'
+]
+
+# weight of the newest sample in the per-device availability average
+AVAILABILITY_ALPHA = 0.05
+
+
+class FrameState:
+    """One consistent set of columns for a given inventory version"""
+
+    def __init__(self, version, office_records, device_records):
+        self.version = version
+
+        self.office_ids = [o['id'] for o in office_records]
+        self.office_index = {office_id: i for i, office_id in enumerate(self.office_ids)}
+        self.office_records = office_records
+
+        self.regions = sorted({records.office_region(o) for o in office_records})
+        region_index = {region: i for i, region in enumerate(self.regions)}
+        self.office_region = np.array(
+            [region_index[records.office_region(o)] for o in office_records], dtype=np.int32
+        )
+        self.office_active = np.array(
+            [records.office_status(o) == 'active' for o in office_records], dtype=bool
+        )
+
+        self.device_ids = [d['id'] for d in device_records]
+        self.device_index = {device_id: i for i, device_id in enumerate(self.device_ids)}
+        self.device_records = device_records
+
+        self.types = sorted({records.device_type(d) for d in device_records})
+        type_index = {device_type: i for i, device_type in enumerate(self.types)}
+        self.device_type = np.array(
+            [type_index[records.device_type(d)] for d in device_records], dtype=np.int32
+        )
+
+        # devices whose office is unknown get -1 and drop out of group-bys
+        self.device_office = np.array(
+            [self.office_index.get(d.get('office_id'), -1) for d in device_records], dtype=np.int32
+        )
+        known = self.device_office >= 0
+        self.device_region = np.full(len(device_records), -1, dtype=np.int32)
+        self.device_region[known] = self.office_region[self.device_office[known]]
+
+        size = len(device_records)
+        self.metrics = {name: np.full(size, np.nan) for name in FRAME_METRICS}
+        # until a device is polled, trust the inventory status
+        self.online = np.array([d.get('status', 'online') != 'offline' for d in device_records], dtype=bool)
+        self.availability = self.online.astype(np.float64)
+        self.polled = np.zeros(size, dtype=bool)
+        self.last_ts = np.zeros(size)
+
+    def apply(self, device_id, sample):
+        row = self.device_index.get(device_id)
+        if row is None:
+            return
+
+        online = sample.get('status') != 'offline'
+        for name in FRAME_METRICS:
+            value = sample.get(name)
+            self.metrics[name][row] = np.nan if value is None else value
+
+        if self.polled[row]:
+            self.availability[row] += AVAILABILITY_ALPHA * (online - self.availability[row])
+        else:
+            self.availability[row] = float(online)
+
+        self.online[row] = online
+        self.polled[row] = True
+        self.last_ts[row] = sample.get('ts') or 0
+
+
+class FleetFrame:
+    """
+    Holds devices and their latest metrics as NumPy columns.
+
+    Office, region and type are integer-coded so group-bys are a single
+    bincount. Incoming samples update one row in place; the whole frame
+    is rebuilt only when the inventory version changes.
+    """
+
+    def __init__(self, inventory_store=None, store=None):
+        self.inventory = inventory_store or inventory
+        self.store = latest_metrics if store is None else store
+        self._state = None
+        self._lock = threading.Lock()
+
+    def state(self):
+        version = self.inventory.get_version()
+        state = self._state
+        if state is None or state.version != version:
+            with self._lock:
+                state = self._state
+                if state is None or state.version != version:
+                    state = FrameState(
+                        version,
+                        self.inventory.get_office_records(),
+                        self.inventory.get_device_records()
+                    )
+                    for device_id, sample in self.store.get_all().items():
+                        state.apply(device_id, sample)
+                    self._state = state
+        return state
+
+    def on_sample(self, device_id, sample, previous=None):
+        """LatestMetricsStore listener"""
+        state = self._state
+        if state is not None:
+            state.apply(device_id, sample)
+
+
+def health_scores(state):
+    """
+    Per-device health on a 0-100 scale.
+
+    Offline devices score 0; online ones lose points for high CPU and
+    memory, latency above 50 ms and packet loss. Missing metrics cost
+    nothing.
+    """
+    metrics = state.metrics
+    penalty = (
+        0.5 * np.clip(np.nan_to_num(metrics['cpu_usage']) - 60, 0, None)
+        + 0.5 * np.clip(np.nan_to_num(metrics['memory_usage']) - 70, 0, None)
+        + 0.2 * np.clip(np.nan_to_num(metrics['latency']) - 50, 0, None)
+        + 5.0 * np.nan_to_num(metrics['packet_loss'])
+        + 1.0 * np.clip(np.nan_to_num(metrics['temperature']) - 60, 0, None)
+    )
+    return np.where(state.online, np.clip(100 - penalty, 0, 100), 0.0)
+
+
+def group_mean(values, codes, size):
+    """Mean of values per integer code, NaN-aware; empty groups are NaN"""
+    mask = (codes >= 0) & ~np.isnan(values)
+    sums = np.bincount(codes[mask], weights=values[mask], minlength=size)
+    counts = np.bincount(codes[mask], minlength=size)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(counts > 0, sums / np.maximum(counts, 1), np.nan)
+
+
+def nan_round(value, digits=1, default=0):
+    return default if value is None or np.isnan(value) else round(float(value), digits)
+
+
+fleet_frame = FleetFrame()
@@ -1,31 +1,26 @@
 import requests
-import json
-import os
-from datetime import datetime, timedelta
+from api.services.http_gateway import gateway
+from api.services.tiered_cache import cache
+from api.services.spatial_index import point_distance
+from datetime import datetime
 
 class GeoService:
     
     IPAPI_BASE = 'http://ip-api.com/json'
     COUNTRIES_BASE = 'https://restcountries.com/v3.1'
-    CACHE_DIR = 'data/cache/geo'
-    CACHE_TTL = 86400  #
     
-    def __init__(self):
-        os.makedirs(self.CACHE_DIR, exist_ok=True)
+    def __init__(self, http=None, store=None):
+        self.http = http or gateway
+        self.cache = store or cache
     
     def get_ip_location(self, ip_address):
-        cache_path = os.path.join(self.CACHE_DIR, f'ip_{ip_address}.json')
-        
-        if self._is_cache_valid(cache_path):
-            with open(cache_path, 'r') as f:
-                return json.load(f)
+        cached = self.cache.get('ip', ip_address)
+        if cached is not None:
+            return cached
         
         try:
             url = f'{self.IPAPI_BASE}/{ip_address}'
-            response = requests.get(url, timeout=5)
-            response.raise_for_status()
-            
-            data = response.json()
+            data = self.http.get_json('ip-api', url)
             
             if data['status'] == 'success':
                 location_data = {
@@ -41,8 +36,7 @@ class GeoService:
                     'timestamp': datetime.now().isoformat()
                 }
                 
-                with open(cache_path, 'w') as f:
-                    json.dump(location_data, f)
+                self.cache.set('ip', ip_address, location_data)
                 
                 return location_data
             
@@ -52,18 +46,13 @@ class GeoService:
         return None
     
     def get_country_info(self, country_code):
-        cache_path = os.path.join(self.CACHE_DIR, f'country_{country_code}.json')
-        
-        if self._is_cache_valid(cache_path):
-            with open(cache_path, 'r') as f:
-                return json.load(f)
+        cached = self.cache.get('country', country_code)
+        if cached is not None:
+            return cached
         
         try:
             url = f'{self.COUNTRIES_BASE}/alpha/{country_code}'
-            response = requests.get(url, timeout=5)
-            response.raise_for_status()
-            
-            data = response.json()[0]
+            data = self.http.get_json('restcountries', url)[0]
             
             country_info = {
                 'name': data['name']['common'],
@@ -79,8 +68,7 @@ class GeoService:
                 'timestamp': datetime.now().isoformat()
             }
             
-            with open(cache_path, 'w') as f:
-                json.dump(country_info, f)
+            self.cache.set('country', country_code, country_info)
             
             return country_info
             
@@ -89,23 +77,5 @@ class GeoService:
         
         return None
     
-    def _is_cache_valid(self, cache_path):
-        if not os.path.exists(cache_path):
-            return False
-        
-        mod_time = datetime.fromtimestamp(os.path.getmtime(cache_path))
-        return (datetime.now() - mod_time).seconds < self.CACHE_TTL
-    
     def get_distance(self, lat1, lon1, lat2, lon2):
-        from math import radians, cos, sin, asin, sqrt
-        
-        # Haversine
-        lon1, lat1, lon2, lat2 = map(radians, [lon1, lat1, lon2, lat2])
-        
-        dlon = lon2 - lon1
-        dlat = lat2 - lat1
-        a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
-        c = 2 * asin(sqrt(a))
-        r = 6371  # earth
-        
-        return round(c * r, 2)
\ No newline at end of file
+        return round(point_distance(lat1, lon1, lat2, lon2), 2)
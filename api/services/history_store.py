@@ -0,0 +1,198 @@
+"""Metrics history backed by SQLite"""
+from api.services.inventory_service import BASE_DIR
+from api.json_provider import Timestamps
+from config import Config
+import threading
+import sqlite3
+import queue
+import time
+import os
+
+METRIC_COLUMNS = [
+    'cpu_usage', 'memory_usage', 'bandwidth_in', 'bandwidth_out',
+    'temperature', 'packet_loss', 'latency', 'uptime'
+]
+
+
+def resolve_path(path):
+    return path if os.path.isabs(path) else os.path.join(BASE_DIR, path)
+
+
+class MetricsHistoryStore:
+    """
+    Append-mostly store of every polled sample.
+
+    Rows are clustered on (device_id, ts) so a device's history is one
+    contiguous range scan. The database runs in WAL mode: a single
+    writer thread commits samples in batches while request threads read
+    through their own connections without waiting on it.
+    """
+
+    def __init__(self, db_path=None, retention_days=None, batch_size=None, flush_interval=None):
+        self.db_path = resolve_path(db_path or Config.DATABASE_PATH)
+        self.retention_days = retention_days or Config.HISTORY_RETENTION_DAYS
+        self.batch_size = batch_size or Config.HISTORY_BATCH_SIZE
+        self.flush_interval = flush_interval or Config.HISTORY_FLUSH_INTERVAL
+
+        self._queue = queue.Queue(maxsize=Config.HISTORY_QUEUE_SIZE)
+        self._local = threading.local()
+        self._thread = None
+        self._stop = threading.Event()
+        self._last_prune = 0.0
+
+        self.rows_written = 0
+        self.rows_dropped = 0
+        self.batches_written = 0
+
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        self._init_schema()
+
+    # Connections
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    def _reader(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    def _init_schema(self):
+        conn = self._connect()
+        columns = ', '.join(f'{name} REAL' for name in METRIC_COLUMNS)
+        with conn:
+            conn.execute(f'''
+                CREATE TABLE IF NOT EXISTS metrics_history (
+                    device_id TEXT NOT NULL,
+                    ts REAL NOT NULL,
+                    online INTEGER NOT NULL DEFAULT 1,
+                    {columns},
+                    PRIMARY KEY (device_id, ts)
+                ) WITHOUT ROWID
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_metrics_history_ts ON metrics_history (ts)')
+        conn.close()
+
+    # Writing
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='history-writer', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def append(self, device_id, sample):
+        """Queue a sample for the writer, never blocks the caller"""
+        row = (
+            device_id,
+            sample.get('ts') or time.time(),
+            0 if sample.get('status') == 'offline' else 1,
+            *[sample.get(name) for name in METRIC_COLUMNS]
+        )
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            self.rows_dropped += 1
+
+    def on_sample(self, device_id, sample, previous=None):
+        """LatestMetricsStore listener"""
+        self.append(device_id, sample)
+
+    def _run(self):
+        conn = self._connect()
+        placeholders = ', '.join('?' * (3 + len(METRIC_COLUMNS)))
+        sql = f'INSERT OR REPLACE INTO metrics_history (device_id, ts, online, {", ".join(METRIC_COLUMNS)}) VALUES ({placeholders})'
+
+        while not self._stop.is_set() or not self._queue.empty():
+            batch = []
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+
+            if batch:
+                try:
+                    with conn:
+                        conn.executemany(sql, batch)
+                    self.rows_written += len(batch)
+                    self.batches_written += 1
+                except sqlite3.Error as e:
+                    print(f"❌ History write error: {e}")
+                finally:
+                    for _ in batch:
+                        self._queue.task_done()
+
+            if time.time() - self._last_prune > Config.HISTORY_PRUNE_INTERVAL:
+                self.prune(conn)
+
+        conn.close()
+
+    def flush(self):
+        """Block until everything queued so far is committed"""
+        self._queue.join()
+
+    def prune(self, conn=None):
+        cutoff = time.time() - self.retention_days * 86400
+        conn = conn or self._reader()
+        try:
+            with conn:
+                deleted = conn.execute('DELETE FROM metrics_history WHERE ts < ?', (cutoff,)).rowcount
+        except sqlite3.Error as e:
+            print(f"❌ History prune error: {e}")
+            return 0
+        self._last_prune = time.time()
+        return deleted
+
+    # Reading
+
+    def query(self, device_id, start, end=None, metrics=None):
+        """
+        Samples for one device between start and end (epoch seconds).
+
+        Returns columnar arrays: {'timestamps': [...], '<metric>': [...]}.
+        The timestamps stay epoch seconds until the response is encoded.
+        Unknown metric names raise ValueError.
+        """
+        metrics = list(metrics or METRIC_COLUMNS)
+        unknown = [m for m in metrics if m not in METRIC_COLUMNS]
+        if unknown:
+            raise ValueError(f"Unknown metrics: {', '.join(unknown)} (valid: {', '.join(METRIC_COLUMNS)})")
+        end = end or time.time()
+
+        rows = self._reader().execute(
+            f'SELECT ts, {", ".join(metrics)} FROM metrics_history '
+            f'WHERE device_id = ? AND ts >= ? AND ts <= ? ORDER BY ts',
+            (device_id, start, end)
+        ).fetchall()
+
+        columns = list(zip(*rows)) if rows else [()] * (len(metrics) + 1)
+        result = {'timestamps': Timestamps(columns[0])}
+        for name, values in zip(metrics, columns[1:]):
+            result[name] = list(values)
+        return result
+
+    def stats(self):
+        return {
+            'rows_written': self.rows_written,
+            'rows_dropped': self.rows_dropped,
+            'batches_written': self.batches_written,
+            'queue_depth': self._queue.qsize()
+        }
+
+
+history_store = MetricsHistoryStore()
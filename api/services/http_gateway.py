@@ -0,0 +1,274 @@
+"""Shared outbound HTTP gateway for external providers"""
+from api.services.perf_stats import perf
+from requests.adapters import HTTPAdapter
+from collections import deque
+from config import Config
+import threading
+import requests
+import time
+
+
+class UpstreamThrottled(requests.exceptions.RequestException):
+    """No request slot or rate-limit token became free in time"""
+
+
+class CircuitOpen(requests.exceptions.RequestException):
+    """The provider is failing and calls are being short-circuited"""
+
+
+def is_upstream_failure(error):
+    """Timeouts, connection errors, 5xx and 429 say the provider is unhealthy; other 4xx don't"""
+    if isinstance(error, requests.exceptions.HTTPError) and error.response is not None:
+        status = error.response.status_code
+        return status >= 500 or status == 429
+    return isinstance(error, requests.exceptions.RequestException)
+
+
+class CircuitBreaker:
+    """
+    Closed, open or half-open, driven by the error rate over a time window.
+
+    Once at least `min_requests` calls in the last `window` seconds have
+    an error rate of `error_rate` or more, the circuit opens and calls fail
+    immediately for `open_seconds`. After that a single probe call is let
+    through (half-open): success closes the circuit, failure reopens it.
+    """
+
+    def __init__(self, window=None, min_requests=None, error_rate=None, open_seconds=None):
+        self.window = window or Config.CIRCUIT_WINDOW
+        self.min_requests = min_requests or Config.CIRCUIT_MIN_REQUESTS
+        self.error_rate = error_rate or Config.CIRCUIT_ERROR_RATE
+        self.open_seconds = open_seconds or Config.CIRCUIT_OPEN_SECONDS
+
+        self.state = 'closed'
+        self._outcomes = deque()
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+        self.opened_count = 0
+
+    def allow(self):
+        with self._lock:
+            if self.state == 'closed':
+                return True
+            if self.state == 'open' and time.monotonic() - self._opened_at >= self.open_seconds:
+                self.state = 'half_open'
+            if self.state == 'half_open' and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record(self, ok):
+        """ok is True, False, or None when the call was never sent"""
+        now = time.monotonic()
+        with self._lock:
+            if ok is None:
+                if self.state == 'half_open':
+                    self._probing = False
+                return
+
+            if self.state == 'half_open':
+                self._probing = False
+                if ok:
+                    self.state = 'closed'
+                    self._outcomes.clear()
+                    self._failures = 0
+                else:
+                    self._open(now)
+                return
+
+            self._outcomes.append((now, ok))
+            if not ok:
+                self._failures += 1
+            while self._outcomes and now - self._outcomes[0][0] > self.window:
+                if not self._outcomes.popleft()[1]:
+                    self._failures -= 1
+
+            total = len(self._outcomes)
+            if (self.state == 'closed' and total >= self.min_requests
+                    and self._failures / total >= self.error_rate):
+                self._open(now)
+
+    def _open(self, now):
+        self.state = 'open'
+        self._opened_at = now
+        self._outcomes.clear()
+        self._failures = 0
+        self.opened_count += 1
+
+
+class TokenBucket:
+    """Allows `rate` requests per second on average with bursts up to `burst`"""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, timeout):
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate
+            if now + wait > deadline:
+                return False
+            time.sleep(wait)
+
+
+class _Flight:
+    """An upstream call in progress that identical requests wait on"""
+
+    __slots__ = ('event', 'value', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class Provider:
+    """One upstream API: its own keep-alive pool, concurrency cap and rate limit"""
+
+    def __init__(self, name, concurrency=4, rate=5.0, burst=10, timeout=5.0, breaker=None):
+        self.name = name
+        self.timeout = timeout
+        self.concurrency = concurrency
+        self.slots = threading.BoundedSemaphore(concurrency)
+        self.bucket = TokenBucket(rate, burst)
+        self.breaker = CircuitBreaker(**(breaker or {}))
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=concurrency)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self.requests = 0
+        self.coalesced = 0
+        self.throttled = 0
+        self.errors = 0
+        self.short_circuited = 0
+
+
+class HTTPGateway:
+    """
+    Every external call goes through here.
+
+    Each provider keeps a requests.Session whose connection pool is
+    reused across calls, so repeated calls skip the TCP and TLS
+    handshakes. Calls are capped per provider by a semaphore and a
+    token bucket, and a circuit breaker fails them fast while the
+    provider is down. Identical GETs that are already in flight are not
+    sent again: later callers wait for the first response and share it.
+    """
+
+    def __init__(self, providers=None):
+        self._providers = {}
+        self._flights = {}
+        self._lock = threading.Lock()
+        for name, settings in (Config.EXTERNAL_PROVIDERS if providers is None else providers).items():
+            self.register(name, **settings)
+
+    def register(self, name, **settings):
+        self._providers[name] = Provider(name, **settings)
+        return self._providers[name]
+
+    def provider(self, name):
+        provider = self._providers.get(name)
+        if provider is None:
+            provider = self.register(name)
+        return provider
+
+    def get_json(self, provider_name, url, params=None, timeout=None):
+        """GET url and decode JSON; raises requests exceptions on failure"""
+        provider = self.provider(provider_name)
+        key = (provider_name, url, tuple(sorted((params or {}).items())))
+
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            else:
+                provider.coalesced += 1
+
+        if not leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = self._send(provider, url, params, timeout or provider.timeout)
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.event.set()
+
+        return flight.value
+
+    def _send(self, provider, url, params, timeout):
+        if not provider.breaker.allow():
+            provider.short_circuited += 1
+            raise CircuitOpen(f'{provider.name}: circuit open')
+
+        # None means the call never reached the provider, so says nothing about its health
+        ok = None
+        # waiting for a slot or token counts against the caller's timeout too
+        started = time.monotonic()
+        try:
+            if not provider.slots.acquire(timeout=timeout):
+                provider.throttled += 1
+                raise UpstreamThrottled(f'{provider.name}: all {provider.concurrency} connections busy')
+            try:
+                if not provider.bucket.acquire(max(0.0, timeout - (time.monotonic() - started))):
+                    provider.throttled += 1
+                    raise UpstreamThrottled(f'{provider.name}: rate limit reached')
+
+                provider.requests += 1
+                remaining = max(0.1, timeout - (time.monotonic() - started))
+                try:
+                    with perf.timer('upstream', provider.name):
+                        response = provider.session.get(url, params=params, timeout=remaining)
+                        response.raise_for_status()
+                        data = response.json()
+                except requests.exceptions.RequestException as e:
+                    provider.errors += 1
+                    ok = not is_upstream_failure(e)
+                    raise
+                ok = True
+                return data
+            finally:
+                provider.slots.release()
+        finally:
+            provider.breaker.record(ok)
+
+    def stats(self):
+        return {
+            name: {
+                'requests': p.requests,
+                'coalesced': p.coalesced,
+                'throttled': p.throttled,
+                'errors': p.errors,
+                'short_circuited': p.short_circuited,
+                'circuit': p.breaker.state,
+                'circuit_opened': p.breaker.opened_count,
+                'concurrency': p.concurrency,
+                'rate_per_second': p.bucket.rate
+            }
+            for name, p in self._providers.items()
+        }
+
+
+gateway = HTTPGateway()
@@ -0,0 +1,249 @@
+"""Shared in-memory inventory of offices and devices"""
+from api.models.office import Office
+from api.models.device import Device
+from api.models.fleet import Fleet
+from api.services.perf_stats import perf
+from collections import defaultdict
+from config import Config
+import threading
+import hashlib
+import json
+import time
+import os
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class InventoryStore:
+    """
+    Loads seed_data.json once and keeps dict indexes over it.
+
+    The file is re-read only when its mtime changes, so handlers can call
+    the accessors on every request without touching the disk.
+    """
+
+    def __init__(self, seed_path=None, check_interval=None):
+        seed_path = seed_path or Config.SEED_DATA_PATH
+        if not os.path.isabs(seed_path):
+            seed_path = os.path.join(BASE_DIR, seed_path)
+        self.seed_path = seed_path
+        self.check_interval = Config.INVENTORY_CHECK_INTERVAL if check_interval is None else check_interval
+
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._last_check = 0.0
+        self.version = 0
+        self.content_hash = ''
+        self.load_seconds = 0.0
+        self._reset()
+
+    def _reset(self):
+        self.office_records = []
+        self.device_records = []
+        self.offices_by_id = {}
+        self.devices_by_id = {}
+        self.office_records_by_id = {}
+        self.device_records_by_id = {}
+        self.offices_by_region = {}
+        self.devices_by_type = {}
+        self.devices_by_status = {}
+        self.devices_by_office = {}
+        self.devices_by_region = {}
+        self.devices_by_ip = {}
+        self.fleet = Fleet([])
+
+    def _ensure_fresh(self):
+        now = time.monotonic()
+        if self._last_check and now - self._last_check < self.check_interval:
+            return
+
+        with self._lock:
+            if self._last_check and now - self._last_check < self.check_interval:
+                return
+            self._last_check = now
+
+            try:
+                mtime = os.stat(self.seed_path).st_mtime
+            except OSError:
+                if self._mtime is None or self._mtime != -1:
+                    print(f"⚠️ seed_data.json not found at {self.seed_path}")
+                    self._reset()
+                    self._mtime = -1
+                    self.version += 1
+                    self.content_hash = ''
+                return
+
+            if mtime != self._mtime:
+                self._load(mtime)
+
+    def _load(self, mtime):
+        started = time.perf_counter()
+        try:
+            with open(self.seed_path, 'rb') as f:
+                raw = f.read()
+            data = json.loads(raw)
+        except Exception as e:
+            print(f"❌ Error loading inventory: {e}")
+            # keep serving the previous snapshot; _mtime is left alone so a
+            # half-written file is read again on the next check
+            return
+
+        office_records = data.get('offices', [])
+        device_records = data.get('devices', [])
+
+        offices_by_id = {}
+        office_records_by_id = {}
+        offices_by_region = defaultdict(list)
+        for record in office_records:
+            office = Office.from_dict(record)
+            offices_by_id[office.id] = office
+            office_records_by_id[office.id] = record
+            offices_by_region[office.region].append(office)
+
+        devices_by_id = {}
+        device_records_by_id = {}
+        devices_by_type = defaultdict(list)
+        devices_by_status = defaultdict(list)
+        devices_by_office = defaultdict(list)
+        devices_by_region = defaultdict(list)
+        devices_by_ip = {}
+        loaded_at = time.time()
+        # id order, so every index list can be paged with a keyset cursor
+        for record in sorted(device_records, key=lambda r: r['id']):
+            device = Device(last_seen=loaded_at, **record)
+            devices_by_id[device.id] = device
+            device_records_by_id[device.id] = record
+            devices_by_type[device.device_type].append(device)
+            devices_by_status[device.status].append(device)
+            devices_by_office[device.office_id].append(device)
+            devices_by_ip[device.ip_address] = device
+
+            office = offices_by_id.get(device.office_id)
+            if office:
+                devices_by_region[office.region].append(device)
+
+        # swap in the new snapshot in one go so readers never see a half-built index
+        self.office_records = office_records
+        self.device_records = device_records
+        self.offices_by_id = offices_by_id
+        self.devices_by_id = devices_by_id
+        self.office_records_by_id = office_records_by_id
+        self.device_records_by_id = device_records_by_id
+        self.offices_by_region = dict(offices_by_region)
+        self.devices_by_type = dict(devices_by_type)
+        self.devices_by_status = dict(devices_by_status)
+        self.devices_by_office = dict(devices_by_office)
+        self.devices_by_region = dict(devices_by_region)
+        self.devices_by_ip = devices_by_ip
+        self.fleet = Fleet(devices_by_id.values())
+
+        self._mtime = mtime
+        self.version += 1
+        # identifies the content itself, so it is the same across restarts and workers
+        self.content_hash = hashlib.blake2b(raw, digest_size=8).hexdigest()
+        self.load_seconds = time.perf_counter() - started
+        perf.observe('load', 'inventory', self.load_seconds)
+
+        print(f"✅ Loaded {len(office_records)} offices and {len(device_records)} devices")
+
+    def reload(self):
+        """Force a reload on the next access"""
+        with self._lock:
+            self._mtime = None
+            self._last_check = 0.0
+
+    # Offices
+
+    def get_offices(self, region=None, status=None):
+        self._ensure_fresh()
+        # copies, so callers can't mutate the shared indexes
+        if region:
+            offices = list(self.offices_by_region.get(region, ()))
+        else:
+            offices = list(self.offices_by_id.values())
+
+        if status:
+            offices = [o for o in offices if o.status == status]
+
+        return offices
+
+    def get_office(self, office_id):
+        self._ensure_fresh()
+        return self.offices_by_id.get(office_id)
+
+    def get_office_record(self, office_id):
+        self._ensure_fresh()
+        return self.office_records_by_id.get(office_id)
+
+    def get_office_records(self):
+        self._ensure_fresh()
+        return self.office_records
+
+    def get_regions(self):
+        self._ensure_fresh()
+        return list(self.offices_by_region.keys())
+
+    # Devices
+
+    def get_devices(self, device_type=None, status=None, office_id=None):
+        self._ensure_fresh()
+
+        # start from the narrowest index that applies, then filter the rest
+        candidates = []
+        if office_id:
+            candidates.append(self.devices_by_office.get(office_id, []))
+        if device_type:
+            candidates.append(self.devices_by_type.get(device_type, []))
+        if status:
+            candidates.append(self.devices_by_status.get(status, []))
+
+        if not candidates:
+            return list(self.devices_by_id.values())
+
+        devices = min(candidates, key=len)
+        return [
+            d for d in devices
+            if (not office_id or d.office_id == office_id)
+            and (not device_type or d.device_type == device_type)
+            and (not status or d.status == status)
+        ]
+
+    def get_fleet(self):
+        """Every device as columns, for whole-fleet listing and serialization"""
+        self._ensure_fresh()
+        return self.fleet
+
+    def get_device(self, device_id):
+        self._ensure_fresh()
+        return self.devices_by_id.get(device_id)
+
+    def get_device_record(self, device_id):
+        self._ensure_fresh()
+        return self.device_records_by_id.get(device_id)
+
+    def get_device_records(self):
+        self._ensure_fresh()
+        return self.device_records
+
+    def get_device_by_ip(self, ip_address):
+        self._ensure_fresh()
+        return self.devices_by_ip.get(ip_address)
+
+    def get_office_devices(self, office_id):
+        self._ensure_fresh()
+        return list(self.devices_by_office.get(office_id, ()))
+
+    def get_region_devices(self, region):
+        self._ensure_fresh()
+        return list(self.devices_by_region.get(region, ()))
+
+    def get_version(self):
+        self._ensure_fresh()
+        return self.version
+
+    def get_content_hash(self):
+        self._ensure_fresh()
+        return self.content_hash
+
+
+inventory = InventoryStore()
@@ -0,0 +1,145 @@
+"""Prometheus / OpenMetrics exposition of the latest fleet metrics"""
+from api.services.fleet_frame import fleet_frame, group_mean
+from api.models import records
+from config import Config
+import numpy as np
+import threading
+import time
+
+OPENMETRICS_TYPE = 'application/openmetrics-text; version=1.0.0; charset=utf-8'
+PROMETHEUS_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# (frame column, metric name, unit, help)
+GAUGES = [
+    ('cpu_usage', 'cpu_usage', 'percent', 'CPU utilisation'),
+    ('memory_usage', 'memory_usage', 'percent', 'Memory utilisation'),
+    ('bandwidth_in', 'bandwidth_in', 'megabits_per_second', 'Inbound traffic'),
+    ('bandwidth_out', 'bandwidth_out', 'megabits_per_second', 'Outbound traffic'),
+    ('latency', 'latency', 'milliseconds', 'Round-trip latency'),
+    ('packet_loss', 'packet_loss', 'percent', 'Packet loss'),
+    ('temperature', 'temperature', 'celsius', 'Chassis temperature'),
+]
+
+# series written per chunk of text
+RENDER_BATCH = 5000
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def label_set(**labels):
+    return '{' + ','.join(f'{name}="{escape_label(value)}"' for name, value in labels.items()) + '}'
+
+
+class LabelSets:
+    """Every device, office and region label set, encoded once per inventory version"""
+
+    def __init__(self, state):
+        self.version = state.version
+        office_region = [state.regions[code] for code in state.office_region.tolist()]
+        self.regions = [label_set(region=region) for region in state.regions]
+        self.offices = [label_set(office_id=office_id, region=region)
+                        for office_id, region in zip(state.office_ids, office_region)]
+
+        self.devices = []
+        for record, office in zip(state.device_records, state.device_office.tolist()):
+            self.devices.append(label_set(
+                device_id=record['id'],
+                office_id=record.get('office_id') or '',
+                region=office_region[office] if office >= 0 else 'Unknown',
+                type=records.device_type(record)
+            ))
+
+
+class MetricsExporter:
+    """
+    Renders the fleet frame as OpenMetrics text.
+
+    Values come straight from the frame's NumPy columns, which the
+    poller keeps current, and label sets are reused until the inventory
+    changes, so a scrape is a pass over arrays joined onto cached
+    strings. Devices that have not reported a metric are left out.
+    """
+
+    def __init__(self, frame=None, namespace=None):
+        self.frame = frame or fleet_frame
+        self.namespace = namespace or Config.METRICS_NAMESPACE
+        self._labels = None
+        self._lock = threading.Lock()
+
+        self.scrapes = 0
+        self.last_series = 0
+        self.last_render_seconds = 0.0
+
+    def labels(self, state):
+        labels = self._labels
+        if labels is None or labels.version != state.version:
+            with self._lock:
+                labels = self._labels
+                if labels is None or labels.version != state.version:
+                    labels = self._labels = LabelSets(state)
+        return labels
+
+    def render(self, openmetrics=True):
+        """Exposition text as a series of chunks"""
+        started = time.perf_counter()
+        state = self.frame.state()
+        labels = self.labels(state)
+        ns = self.namespace
+        series = 0
+
+        def family(name, help_text, label_sets, values, unit=None):
+            """Header plus one line per non-NaN value, in chunks; returns the series count"""
+            header = f'# HELP {name} {help_text}\n# TYPE {name} gauge\n'
+            if unit and openmetrics:
+                header += f'# UNIT {name} {unit}\n'
+            yield header
+
+            values = np.asarray(values, dtype=np.float64)
+            rows = np.flatnonzero(~np.isnan(values))
+            for start in range(0, len(rows), RENDER_BATCH):
+                chunk = rows[start:start + RENDER_BATCH]
+                yield ''.join([f'{name}{label_sets[row]} {value}\n'
+                               for row, value in zip(chunk.tolist(), values[chunk].tolist())])
+            return len(rows)
+
+        # devices never polled have no up value yet, not a 0
+        series += yield from family(f'{ns}_device_up', 'Device answered its last poll',
+                                    labels.devices, np.where(state.polled, state.online, np.nan))
+        series += yield from family(f'{ns}_device_last_poll_timestamp_seconds', 'Time of the last poll',
+                                    labels.devices, np.where(state.polled, state.last_ts, np.nan), 'seconds')
+        for column, metric, unit, help_text in GAUGES:
+            series += yield from family(f'{ns}_device_{metric}_{unit}', help_text,
+                                        labels.devices, state.metrics[column], unit)
+
+        for scope, codes, size, label_sets in (
+            ('office', state.device_office, len(state.office_ids), labels.offices),
+            ('region', state.device_region, len(state.regions), labels.regions)
+        ):
+            known = codes >= 0
+            total = np.bincount(codes[known], minlength=size)
+            online = np.bincount(codes[known & state.online], minlength=size)
+            series += yield from family(f'{ns}_{scope}_devices', f'Devices per {scope}', label_sets, total)
+            series += yield from family(f'{ns}_{scope}_devices_online', f'Online devices per {scope}',
+                                        label_sets, online)
+            for column, metric, unit, help_text in GAUGES:
+                series += yield from family(f'{ns}_{scope}_{metric}_{unit}', f'{help_text}, {scope} mean',
+                                            label_sets, group_mean(state.metrics[column], codes, size), unit)
+
+        if openmetrics:
+            yield '# EOF\n'
+
+        self.scrapes += 1
+        self.last_series = series
+        self.last_render_seconds = time.perf_counter() - started
+
+    def stats(self):
+        return {
+            'scrapes': self.scrapes,
+            'last_series': self.last_series,
+            'last_render_ms': round(self.last_render_seconds * 1000, 2)
+        }
+
+
+metrics_exporter = MetricsExporter()
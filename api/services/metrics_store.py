@@ -0,0 +1,55 @@
+"""Latest-value store for device metrics"""
+import threading
+
+
+class LatestMetricsStore:
+    """
+    Holds the most recent metrics sample for every device.
+
+    The background poller writes here; API handlers read with a plain
+    dict lookup and never wait on the network. Other components can
+    subscribe to be called with every new sample.
+    """
+
+    def __init__(self):
+        self._samples = {}
+        self._lock = threading.Lock()
+        self._listeners = []
+        self.version = 0
+
+    def put(self, device_id, sample):
+        with self._lock:
+            previous = self._samples.get(device_id)
+            self._samples[device_id] = sample
+            self.version += 1
+            listeners = list(self._listeners)
+
+        for listener in listeners:
+            try:
+                listener(device_id, sample, previous)
+            except Exception as e:
+                print(f"❌ Metrics listener error: {e}")
+
+    def get(self, device_id):
+        return self._samples.get(device_id)
+
+    def get_all(self):
+        with self._lock:
+            return dict(self._samples)
+
+    def subscribe(self, listener):
+        """Register listener(device_id, sample, previous_sample)"""
+        with self._lock:
+            if listener not in self._listeners:
+                self._listeners.append(listener)
+
+    def unsubscribe(self, listener):
+        with self._lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+    def __len__(self):
+        return len(self._samples)
+
+
+latest_metrics = LatestMetricsStore()
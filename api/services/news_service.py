@@ -1,4 +1,5 @@
 import requests
+from api.services.http_gateway import gateway
 from datetime import datetime
 from config import Config
 import random
@@ -6,8 +7,9 @@ import random
 class NewsService:
     BASE_URL = "https://api.thenewsapi.com/v1/news/headlines"
 
-    def __init__(self, api_key=None):
+    def __init__(self, api_key=None, http=None):
         self.api_key = api_key or Config.NEWS_API_KEY
+        self.http = http or gateway
         print(f"🧩 Loaded News API Key: {self.api_key[:6]}..." if self.api_key else "⚠️ No NEWS_API_KEY found")
 
     def get_latest_news(self, language="en", max_items=5):
@@ -23,9 +25,7 @@ class NewsService:
                 "headlines_per_category": max_items,
                 "include_similar": False
             }
-            response = requests.get(self.BASE_URL, params=params, timeout=10)
-            response.raise_for_status()
-            data = response.json()
+            data = self.http.get_json("thenewsapi", self.BASE_URL, params=params)
 
             if "data" not in data:
                 print(f"⚠️ Unexpected API response: {data}")
@@ -0,0 +1,136 @@
+"""Latency histograms for requests, upstream calls and data loads"""
+from collections import deque
+from config import Config
+import threading
+import bisect
+import time
+
+# upper bounds in seconds, roughly 2.5x apart, the last bucket is open-ended
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class LatencyHistogram:
+    """
+    Fixed-bucket histogram of durations.
+
+    Recording is a bisect and a few additions, so it stays cheap on
+    every request; percentiles are interpolated within their bucket.
+    """
+
+    __slots__ = ('counts', 'count', 'total', 'errors', 'min', 'max')
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.errors = 0
+        self.min = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds, ok=True):
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if not ok:
+            self.errors += 1
+        if seconds > self.max:
+            self.max = seconds
+        if seconds < self.min or self.count == 1:
+            self.min = seconds
+
+    def percentile(self, q):
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, bucket_count in enumerate(self.counts):
+            if bucket_count and seen + bucket_count >= rank:
+                # the observed extremes narrow the first and last buckets
+                lower = max(self.min, LATENCY_BUCKETS[i - 1] if i > 0 else 0.0)
+                upper = min(self.max, LATENCY_BUCKETS[i] if i < len(LATENCY_BUCKETS) else self.max)
+                return lower + (upper - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+        return self.max
+
+    def to_dict(self):
+        def ms(seconds):
+            return round(seconds * 1000, 3)
+
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'min_ms': ms(self.min),
+            'mean_ms': ms(self.total / self.count) if self.count else 0.0,
+            'p50_ms': ms(self.percentile(0.5)),
+            'p95_ms': ms(self.percentile(0.95)),
+            'p99_ms': ms(self.percentile(0.99)),
+            'max_ms': ms(self.max),
+            # counts[i] falls at or under bounds[i], the last count is above every bound
+            'buckets': {
+                'bounds_ms': [ms(bound) for bound in LATENCY_BUCKETS],
+                'counts': list(self.counts)
+            }
+        }
+
+
+class PerfRecorder:
+    """
+    Histograms grouped by kind: 'endpoint', 'upstream' and 'load'.
+
+    Services record their own timings here (the HTTP gateway and SNMP
+    engine per upstream call, the inventory per seed load), the request
+    middleware records every endpoint, and /debug/perf reads it all.
+    """
+
+    def __init__(self, slow_history=None):
+        self._groups = {}
+        self._lock = threading.Lock()
+        self.slow_requests = deque(maxlen=slow_history or Config.SLOW_REQUEST_HISTORY)
+        self.started = time.time()
+
+    def observe(self, group, name, seconds, ok=True):
+        with self._lock:
+            histograms = self._groups.setdefault(group, {})
+            histogram = histograms.get(name)
+            if histogram is None:
+                histogram = histograms[name] = LatencyHistogram()
+            histogram.observe(seconds, ok)
+
+    def timer(self, group, name):
+        return _Timer(self, group, name)
+
+    def record_slow(self, entry):
+        self.slow_requests.append(entry)
+
+    def snapshot(self, group):
+        with self._lock:
+            return {name: h.to_dict() for name, h in sorted(self._groups.get(group, {}).items())}
+
+    def reset(self):
+        with self._lock:
+            self._groups.clear()
+            self.slow_requests.clear()
+            self.started = time.time()
+
+
+class _Timer:
+    """with perf.timer('upstream', 'snmp'): ... records the block, failed if it raises"""
+
+    __slots__ = ('recorder', 'group', 'name', 'started')
+
+    def __init__(self, recorder, group, name):
+        self.recorder = recorder
+        self.group = group
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.recorder.observe(self.group, self.name, time.perf_counter() - self.started, exc_type is None)
+        return False
+
+
+perf = PerfRecorder()
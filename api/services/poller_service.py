@@ -0,0 +1,321 @@
+"""Background fleet poller"""
+from api.services.inventory_service import inventory
+from api.services.metrics_store import latest_metrics
+from datetime import datetime
+from collections import deque
+from config import Config
+import threading
+import random
+import heapq
+import time
+
+
+class FleetPoller:
+    """
+    Polls every device in the inventory on its own schedule.
+
+    Devices are phase-shifted evenly across the poll interval so a sweep
+    is a steady trickle rather than a burst, and each reschedule adds a
+    little jitter. At most `concurrency` polls run at once; anything due
+    beyond that waits in the queue and shows up as queue depth and lag.
+
+    SNMP polls are coroutines on the shared asyncio SNMP engine, so
+    thousands can wait on the network without a thread each. Finished
+    polls are handed back to the scheduler thread, which does all the
+    bookkeeping and writes the samples to the store.
+
+    The store lives in this process. With several workers only the one
+    running the poller has live metrics, alerts and /metrics; the others
+    serve empty data, so run a single worker or route those endpoints to
+    the polling one.
+    """
+
+    def __init__(self, inventory_store=None, store=None, interval=None,
+                 concurrency=None, jitter=None, simulate=None):
+        self.inventory = inventory_store or inventory
+        self.store = latest_metrics if store is None else store
+        self.interval = interval or Config.UPDATE_INTERVAL
+        self.concurrency = concurrency or Config.POLLER_CONCURRENCY
+        self.jitter = Config.POLLER_JITTER if jitter is None else jitter
+        self.simulate = Config.SIMULATE_DEVICES if simulate is None else simulate
+
+        self._schedule = []
+        self._scheduled_version = None
+        self._seq = 0
+        self._in_flight = set()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._completed = deque()
+        self._snmp = None
+        self._counters = {}
+
+        self._polls = 0
+        self._errors = 0
+        self._lags = deque(maxlen=1000)
+        self._durations = deque(maxlen=1000)
+        self._started_at = None
+
+    # Lifecycle
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='fleet-poller', daemon=True)
+        self._started_at = time.time()
+        self._thread.start()
+        print(f"✅ Fleet poller started (interval {self.interval}s, concurrency {self.concurrency})")
+
+    def stop(self):
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    @property
+    def running(self):
+        return bool(self._thread and self._thread.is_alive())
+
+    # Scheduling
+
+    def _device_interval(self, device_id):
+        record = self.inventory.get_device_record(device_id) or {}
+        return record.get('poll_interval') or self.interval
+
+    def _next_due(self, due, interval):
+        spread = interval * self.jitter
+        return due + interval + random.uniform(-spread, spread)
+
+    def _sync_schedule(self, now):
+        """Rebuild the schedule when the inventory changes"""
+        version = self.inventory.get_version()
+        if version == self._scheduled_version:
+            return
+
+        device_ids = sorted(self.inventory.devices_by_id)
+        existing = {device_id: due for due, _, device_id in self._schedule}
+
+        schedule = []
+        count = len(device_ids) or 1
+        for position, device_id in enumerate(device_ids):
+            if device_id in self._in_flight:
+                # rescheduled when its poll finishes
+                continue
+            due = existing.get(device_id)
+            if due is None:
+                # spread new devices evenly over one interval
+                due = now + self._device_interval(device_id) * position / count
+            self._seq += 1
+            schedule.append((due, self._seq, device_id))
+
+        heapq.heapify(schedule)
+        self._schedule = schedule
+        self._scheduled_version = version
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wakeup.clear()
+            self._drain_completed()
+
+            now = time.time()
+            batch = []
+            with self._lock:
+                self._sync_schedule(now)
+
+                while self._schedule and self._schedule[0][0] <= now and len(self._in_flight) < self.concurrency:
+                    due, _, device_id = heapq.heappop(self._schedule)
+                    self._in_flight.add(device_id)
+                    self._lags.append(now - due)
+                    batch.append((device_id, due))
+
+                if self._schedule and len(self._in_flight) < self.concurrency:
+                    wait = max(0.0, self._schedule[0][0] - now)
+                else:
+                    wait = 1.0
+
+            for device_id, due in batch:
+                self._dispatch(device_id, due)
+
+            if not batch:
+                self._wakeup.wait(min(wait, 1.0))
+
+    def _dispatch(self, device_id, due):
+        """Start one poll; SNMP results come back through _completed"""
+        started = time.time()
+        device = self.inventory.get_device(device_id)
+        if device is None or self.simulate:
+            # nothing to wait for, finish it right here
+            sample = self._simulated_sample(device) if device else None
+            self._finish(device_id, due, started, time.time(), sample)
+            return
+
+        snmp = self._snmp_service()
+        record = self.inventory.get_device_record(device_id) or {}
+        future = snmp.engine.submit(snmp.get_all_metrics_async(
+            device.ip_address,
+            record.get('snmp_community', Config.SNMP_COMMUNITY),
+            record.get('snmp_port', Config.SNMP_PORT)
+        ))
+
+        def done(f):
+            # runs on the engine loop: just queue the result for the scheduler thread
+            finished = time.time()
+            try:
+                result, error = f.result(), None
+            except Exception as e:
+                result, error = None, e
+            self._completed.append((device_id, due, started, finished, result, error))
+            self._wakeup.set()
+
+        future.add_done_callback(done)
+
+    def _drain_completed(self):
+        """Store finished polls and reschedule them, on the scheduler thread only"""
+        while self._completed:
+            device_id, due, started, finished, result, error = self._completed.popleft()
+            if error is not None:
+                self._errors += 1
+                print(f"❌ Poll failed for {device_id}: {error}")
+                self._finish(device_id, due, started, finished, None)
+                continue
+            device = self.inventory.get_device(device_id)
+            sample = self._snmp_sample(device, result, started, finished) if device else None
+            self._finish(device_id, due, started, finished, sample)
+
+    def _finish(self, device_id, due, started, finished, sample):
+        if sample is not None:
+            sample['device_id'] = device_id
+            try:
+                self.store.put(device_id, sample)
+            except Exception as e:
+                self._errors += 1
+                print(f"❌ Storing poll result failed for {device_id}: {e}")
+        self._durations.append(finished - started)
+
+        with self._lock:
+            self._in_flight.discard(device_id)
+            self._polls += 1
+
+            if device_id in self.inventory.devices_by_id:
+                interval = self._device_interval(device_id)
+                next_due = self._next_due(due, interval)
+                if next_due < finished:
+                    # fell more than a whole interval behind, don't try to catch up
+                    next_due = finished + interval * random.random()
+                self._seq += 1
+                heapq.heappush(self._schedule, (next_due, self._seq, device_id))
+
+    # Polling
+
+    def poll_device(self, device_id):
+        """Poll one device now and wait for it, outside the schedule"""
+        device = self.inventory.get_device(device_id)
+        if not device:
+            return None
+
+        if self.simulate:
+            sample = self._simulated_sample(device)
+        else:
+            record = self.inventory.get_device_record(device_id) or {}
+            started = time.time()
+            result = self._snmp_service().get_all_metrics(
+                device.ip_address,
+                record.get('snmp_community', Config.SNMP_COMMUNITY),
+                record.get('snmp_port', Config.SNMP_PORT)
+            )
+            sample = self._snmp_sample(device, result, started, time.time())
+
+        sample['device_id'] = device_id
+        self.store.put(device_id, sample)
+        return sample
+
+    def _simulated_sample(self, device):
+        sample = device.get_metrics() if device.status != 'offline' else {}
+        sample['ts'] = time.time()
+        sample['timestamp'] = datetime.fromtimestamp(sample['ts']).isoformat()
+        sample['status'] = device.status
+        return sample
+
+    def _snmp_service(self):
+        if self._snmp is None:
+            from api.services.snmp_service import SNMPService
+            self._snmp = SNMPService()
+        return self._snmp
+
+    def _snmp_sample(self, device, result, started, now):
+        """Turn a get_all_metrics result into a store sample"""
+        sample = {'ts': now, 'timestamp': datetime.fromtimestamp(now).isoformat()}
+        if not result:
+            sample['status'] = 'offline'
+            return sample
+
+        sample['status'] = 'online'
+        sample['latency'] = round((now - started) * 1000, 2)
+        sample['snmp'] = result
+
+        cpu = result.get('cpu', {})
+        if 'cpu_1min' in cpu or 'cpu_5sec' in cpu:
+            sample['cpu_usage'] = cpu.get('cpu_1min', cpu.get('cpu_5sec'))
+
+        memory = result.get('memory', {})
+        if 'memory_percent' in memory:
+            sample['memory_usage'] = memory['memory_percent']
+
+        info = result.get('device_info', {})
+        if 'uptime_seconds' in info:
+            sample['uptime'] = int(info['uptime_seconds'])
+
+        interface = result.get('interface', {})
+        if 'bytes_in' in interface and 'bytes_out' in interface:
+            previous = self._counters.get(device.id)
+            self._counters[device.id] = (now, interface['bytes_in'], interface['bytes_out'])
+            if previous and now > previous[0]:
+                elapsed = now - previous[0]
+                # 32-bit counters wrap, a negative delta means a wrap or reset
+                delta_in = (interface['bytes_in'] - previous[1]) % 2 ** 32
+                delta_out = (interface['bytes_out'] - previous[2]) % 2 ** 32
+                sample['bandwidth_in'] = round(delta_in * 8 / elapsed / 1e6, 2)
+                sample['bandwidth_out'] = round(delta_out * 8 / elapsed / 1e6, 2)
+
+        return sample
+
+    # Introspection
+
+    def stats(self):
+        now = time.time()
+        with self._lock:
+            queue_depth = sum(1 for due, _, _ in self._schedule if due <= now)
+            in_flight = len(self._in_flight)
+            scheduled = len(self._schedule) + in_flight
+            lags = list(self._lags)
+            durations = list(self._durations)
+            next_due = self._schedule[0][0] if self._schedule else None
+
+        last_lag = lags[-1] if lags else 0
+        lags.sort()
+        return {
+            'running': self.running,
+            'mode': 'simulated' if self.simulate else 'snmp',
+            'interval_seconds': self.interval,
+            'concurrency': self.concurrency,
+            'devices_scheduled': scheduled,
+            'devices_with_data': len(self.store),
+            'in_flight': in_flight,
+            'queue_depth': queue_depth,
+            'polls_total': self._polls,
+            'errors_total': self._errors,
+            'lag_seconds': {
+                'last': round(last_lag, 3),
+                'avg': round(sum(lags) / len(lags), 3) if lags else 0,
+                'p95': round(lags[int(len(lags) * 0.95)], 3) if lags else 0,
+                'max': round(lags[-1], 3) if lags else 0
+            },
+            'avg_poll_seconds': round(sum(durations) / len(durations), 4) if durations else 0,
+            'next_due_in_seconds': round(max(0.0, next_due - now), 3) if next_due else None,
+            'uptime_seconds': round(now - self._started_at, 1) if self._started_at else 0
+        }
+
+
+fleet_poller = FleetPoller()
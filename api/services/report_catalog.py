@@ -0,0 +1,295 @@
+"""SQLite index of generated reports"""
+from api.services.history_store import resolve_path
+from config import Config
+import threading
+import sqlite3
+import base64
+import gzip
+import json
+import time
+import csv
+import os
+
+# ?sort= value -> column; ties (and the default) fall back to id, which embeds the timestamp
+SORT_COLUMNS = {'generated_at': 'id', 'type': 'type', 'generated_by': 'generated_by'}
+
+
+def report_path(report_id, fmt='json', reports_dir=None):
+    return os.path.join(reports_dir or Config.REPORTS_DIR, f'report_{report_id}.{fmt}.gz')
+
+
+def legacy_path(report_id, reports_dir=None):
+    """Uncompressed, indented reports written before the job queue existed"""
+    return os.path.join(reports_dir or Config.REPORTS_DIR, f'report_{report_id}.json')
+
+
+def stored_reports(reports_dir=None):
+    """{report_id: [formats]} for every finished report on disk"""
+    reports = {}
+    reports_dir = reports_dir or Config.REPORTS_DIR
+    if not os.path.isdir(reports_dir):
+        return reports
+    for filename in os.listdir(reports_dir):
+        if not filename.startswith('report_'):
+            continue
+        for suffix, fmt in (('.json', 'json'), ('.json.gz', 'json'), ('.csv.gz', 'csv')):
+            if filename.endswith(suffix):
+                reports.setdefault(filename[len('report_'):-len(suffix)], []).append(fmt)
+                break
+    return reports
+
+
+def read_header(report_id, formats, reports_dir=None):
+    """id, type, generated_at and generated_by of a stored report"""
+    if 'json' in formats:
+        path = report_path(report_id, 'json', reports_dir)
+        if os.path.exists(path):
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                return json.load(f)
+        with open(legacy_path(report_id, reports_dir), 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    header = {}
+    with gzip.open(report_path(report_id, 'csv', reports_dir), 'rt', encoding='utf-8', newline='') as f:
+        rows = csv.reader(f)
+        next(rows, None)
+        for section, key, value in rows:
+            if section != 'report':
+                break
+            header[key] = value
+    return header
+
+
+def encode_cursor(value, report_id):
+    return base64.urlsafe_b64encode(json.dumps([value, report_id]).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        value, report_id = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor')
+    return value, report_id
+
+
+class ReportCatalog:
+    """
+    One row of metadata per stored report.
+
+    Listing, filtering and paging run against indexed columns and never
+    open a report file, so a page costs the same however many reports
+    exist. Rows are written when a report file is renamed into place;
+    sync() indexes files that predate the catalog. Retention deletes
+    the oldest reports past a maximum age or count.
+    """
+
+    def __init__(self, db_path=None, reports_dir=None, retention_days=None, max_reports=None):
+        self.db_path = resolve_path(db_path or Config.REPORT_CATALOG_PATH)
+        self.reports_dir = reports_dir
+        self.retention_days = retention_days or Config.REPORT_RETENTION_DAYS
+        self.max_reports = max_reports or Config.REPORT_MAX_COUNT
+        self._local = threading.local()
+        self._last_prune = 0.0
+
+        self.removed = 0
+
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        self._init_schema()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    def _init_schema(self):
+        conn = self._connect()
+        with conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS report_catalog (
+                    id TEXT PRIMARY KEY,
+                    type TEXT NOT NULL,
+                    generated_by TEXT NOT NULL,
+                    generated_at TEXT,
+                    formats TEXT NOT NULL,
+                    size INTEGER NOT NULL DEFAULT 0,
+                    created REAL NOT NULL
+                ) WITHOUT ROWID
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_report_catalog_type ON report_catalog (type, id)')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_report_catalog_user ON report_catalog (generated_by, id)')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_report_catalog_created ON report_catalog (created)')
+        conn.close()
+
+    # Writing
+
+    def add(self, report_id, header, fmt, size, created=None):
+        """Record a report file; a second format of the same report is merged in"""
+        conn = self._conn()
+        with conn:
+            row = conn.execute('SELECT formats, size FROM report_catalog WHERE id = ?', (report_id,)).fetchone()
+            if row is not None:
+                formats = sorted(set(row[0].split(',')) | {fmt})
+                conn.execute('UPDATE report_catalog SET formats = ?, size = ? WHERE id = ?',
+                             (','.join(formats), row[1] + size, report_id))
+                return
+            conn.execute(
+                'INSERT INTO report_catalog VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (report_id, str(header.get('type', 'unknown')), str(header.get('generated_by', 'unknown')),
+                 header.get('generated_at'), fmt, size, created or time.time())
+            )
+
+    def remove(self, report_ids):
+        """Delete reports, files first so a row never points at nothing"""
+        for report_id in report_ids:
+            for path in (report_path(report_id, 'json', self.reports_dir),
+                         report_path(report_id, 'csv', self.reports_dir),
+                         legacy_path(report_id, self.reports_dir)):
+                if os.path.exists(path):
+                    os.remove(path)
+        conn = self._conn()
+        with conn:
+            conn.executemany('DELETE FROM report_catalog WHERE id = ?', [(r,) for r in report_ids])
+        self.removed += len(report_ids)
+        return len(report_ids)
+
+    def prune(self, now=None):
+        """Apply retention: drop reports older than retention_days, then beyond max_reports"""
+        now = now or time.time()
+        conn = self._conn()
+        expired = [r for (r,) in conn.execute(
+            'SELECT id FROM report_catalog WHERE created < ?', (now - self.retention_days * 86400,)
+        )]
+        excess = [r for (r,) in conn.execute(
+            'SELECT id FROM report_catalog WHERE created >= ? ORDER BY id DESC LIMIT -1 OFFSET ?',
+            (now - self.retention_days * 86400, self.max_reports)
+        )]
+        self._last_prune = now
+        return self.remove(expired + excess)
+
+    def maybe_prune(self):
+        if time.time() - self._last_prune >= Config.REPORT_PRUNE_INTERVAL:
+            self.prune()
+
+    def sync(self):
+        """Index report files the catalog doesn't know and forget rows whose files are gone"""
+        on_disk = stored_reports(self.reports_dir)
+        known = {r: set(f.split(',')) for r, f in self._conn().execute('SELECT id, formats FROM report_catalog')}
+
+        added = 0
+        for report_id, formats in on_disk.items():
+            for fmt in set(formats) - known.get(report_id, set()):
+                path = report_path(report_id, fmt, self.reports_dir)
+                if not os.path.exists(path):
+                    path = legacy_path(report_id, self.reports_dir)
+                try:
+                    header = read_header(report_id, [fmt], self.reports_dir)
+                    if not isinstance(header, dict):
+                        raise ValueError('not a JSON object')
+                    self.add(report_id, header, fmt, os.path.getsize(path), created=os.path.getmtime(path))
+                except (OSError, EOFError, ValueError) as e:
+                    # truncated or foreign files stay on disk but out of the catalog
+                    print(f"⚠️ Skipping unreadable report {os.path.basename(path)}: {e}")
+                    continue
+                added += 1
+
+        missing = [r for r in known if r not in on_disk]
+        if missing:
+            conn = self._conn()
+            with conn:
+                conn.executemany('DELETE FROM report_catalog WHERE id = ?', [(r,) for r in missing])
+        return added, len(missing)
+
+    def clear(self):
+        ids = [r for (r,) in self._conn().execute('SELECT id FROM report_catalog')]
+        return self.remove(ids)
+
+    # Reading
+
+    def get(self, report_id):
+        row = self._conn().execute(
+            'SELECT id, type, generated_by, generated_at, formats, size FROM report_catalog WHERE id = ?',
+            (report_id,)
+        ).fetchone()
+        return self._record(row) if row else None
+
+    def query(self, limit=None, after=None, sort='generated_at', descending=True,
+              report_type=None, generated_by=None, since=None, until=None):
+        """
+        (records, next_cursor, total) for one page of reports.
+
+        The cursor carries the sort value and id of the last record, so
+        the next page starts with an index seek instead of an OFFSET.
+        """
+        column = SORT_COLUMNS.get(sort)
+        if column is None:
+            raise ValueError(f"sort must be one of: {', '.join(SORT_COLUMNS)}")
+
+        where, params = [], []
+        for clause, value in (('type = ?', report_type), ('generated_by = ?', generated_by),
+                              ('generated_at >= ?', since), ('generated_at < ?', until)):
+            if value is not None:
+                where.append(clause)
+                params.append(value)
+
+        conn = self._conn()
+        filters = ' WHERE ' + ' AND '.join(where) if where else ''
+        total = conn.execute(f'SELECT COUNT(*) FROM report_catalog{filters}', params).fetchone()[0]
+
+        op, direction = ('<', 'DESC') if descending else ('>', 'ASC')
+        if after:
+            value, report_id = decode_cursor(after)
+            if column == 'id':
+                where.append(f'id {op} ?')
+                params.append(report_id)
+            else:
+                where.append(f'({column}, id) {op} (?, ?)')
+                params.extend([value, report_id])
+
+        order = f'id {direction}' if column == 'id' else f'{column} {direction}, id {direction}'
+        sql = ('SELECT id, type, generated_by, generated_at, formats, size FROM report_catalog'
+               + (' WHERE ' + ' AND '.join(where) if where else '') + f' ORDER BY {order}')
+        if limit:
+            sql += ' LIMIT ?'
+            params.append(limit + 1)
+
+        records = [self._record(row) for row in conn.execute(sql, params)]
+        next_cursor = None
+        if limit and len(records) > limit:
+            records = records[:limit]
+            last = records[-1]
+            next_cursor = encode_cursor(last['id'] if column == 'id' else last[sort], last['id'])
+        return records, next_cursor, total
+
+    def _record(self, row):
+        report_id, report_type, generated_by, generated_at, formats, size = row
+        return {
+            'id': report_id,
+            'type': report_type,
+            'generated_at': generated_at,
+            'generated_by': generated_by,
+            'formats': formats.split(','),
+            'size_bytes': size,
+            'url': f"{Config.API_PREFIX}/analytics/reports/{report_id}"
+        }
+
+    def stats(self):
+        count, size = self._conn().execute(
+            'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM report_catalog'
+        ).fetchone()
+        return {
+            'reports': count,
+            'bytes': size,
+            'retention_days': self.retention_days,
+            'max_reports': self.max_reports,
+            'removed': self.removed
+        }
+
+
+report_catalog = ReportCatalog()
@@ -0,0 +1,238 @@
+"""Background report generation: job queue, worker pool and streamed writers"""
+from api.services.report_catalog import report_catalog, report_path
+from api.json_provider import dumps, to_builtin
+from collections import OrderedDict
+from datetime import datetime
+from uuid import uuid4
+from config import Config
+import threading
+import queue
+import gzip
+import time
+import csv
+import os
+
+REPORT_FORMATS = ('json', 'csv')
+JOB_STATES = ('queued', 'running', 'done', 'failed')
+
+
+def flatten(value, prefix=''):
+    """(dotted.key, scalar) pairs for nested dicts and lists"""
+    if isinstance(value, dict):
+        for key, item in value.items():
+            yield from flatten(item, f'{prefix}.{key}' if prefix else str(key))
+    elif isinstance(value, (list, tuple)):
+        for i, item in enumerate(value):
+            yield from flatten(item, f'{prefix}.{i}' if prefix else str(i))
+    elif value is None or isinstance(value, (str, int, float)):
+        yield prefix, value
+    else:
+        yield from flatten(to_builtin(value), prefix)
+
+
+class JsonReportWriter:
+    """
+    Writes {header..., section: value, ...} into a gzip file one section at a time.
+
+    Only the section being written is held in memory, and the output is
+    compact rather than indented.
+    """
+
+    def __init__(self, handle, header):
+        self.handle = handle
+        self.first = True
+        handle.write('{')
+        for key, value in header.items():
+            self.section(key, value)
+
+    def section(self, name, value):
+        self.handle.write(('' if self.first else ', ') + dumps(name) + ': ')
+        self.handle.write(dumps(value))
+        self.first = False
+
+    def close(self):
+        self.handle.write('}')
+
+
+class CsvReportWriter:
+    """One section,key,value row per scalar in the report"""
+
+    def __init__(self, handle, header):
+        self.writer = csv.writer(handle)
+        self.writer.writerow(['section', 'key', 'value'])
+        for key, value in header.items():
+            self.writer.writerow(['report', key, value])
+
+    def section(self, name, value):
+        self.writer.writerows([name, key, item] for key, item in flatten(value))
+
+    def close(self):
+        pass
+
+
+WRITERS = {'json': JsonReportWriter, 'csv': CsvReportWriter}
+
+
+class ReportJob:
+    """One requested report and how far it has got"""
+
+    __slots__ = ('id', 'format', 'header', 'sections', 'state', 'step', 'completed',
+                 'total', 'error', 'created', 'started', 'finished', 'path')
+
+    def __init__(self, report_id, fmt, header, sections):
+        self.id = report_id
+        self.format = fmt
+        self.header = header
+        self.sections = sections
+        self.state = 'queued'
+        self.step = None
+        self.completed = 0
+        self.total = len(sections)
+        self.error = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.path = None
+
+    def to_dict(self):
+        def iso(ts):
+            return datetime.fromtimestamp(ts).isoformat() if ts else None
+
+        download_url = f"{Config.API_PREFIX}/analytics/reports/{self.id}?format={self.format}"
+
+        return {
+            'job_id': self.id,
+            'report_id': self.id,
+            'format': self.format,
+            'status': self.state,
+            'step': self.step,
+            'progress': round(self.completed / self.total, 3) if self.total else 1.0,
+            'error': self.error,
+            'created_at': iso(self.created),
+            'started_at': iso(self.started),
+            'finished_at': iso(self.finished),
+            'download_url': download_url if self.state == 'done' else None
+        }
+
+
+class ReportQueue:
+    """
+    Report jobs run by a small pool of worker threads.
+
+    Submitting only enqueues, so the request returns at once with the job
+    id. Each job computes its sections in order and streams them into a
+    gzip file next to the final path, which is renamed into place once
+    complete; a download never sees a half-written report.
+
+    Job state lives in the process that accepted the job. Under several
+    workers another process only learns of the report once it is in the
+    catalog, so a queued or running job looks unknown there until then.
+    """
+
+    def __init__(self, workers=None, max_queued=None, history=None, catalog=None):
+        self.workers = workers or Config.REPORT_WORKERS
+        self.history = history or Config.REPORT_JOB_HISTORY
+        self.catalog = catalog or report_catalog
+        self.reports_dir = self.catalog.reports_dir
+        self._queue = queue.Queue(maxsize=max_queued or Config.REPORT_QUEUE_SIZE)
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._threads = []
+        self._seq = 0
+
+        self.completed = 0
+        self.failed = 0
+
+    def start(self):
+        with self._lock:
+            self._threads = [t for t in self._threads if t.is_alive()]
+            while len(self._threads) < self.workers:
+                thread = threading.Thread(target=self._run, name=f'report-worker-{len(self._threads)}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, header, sections, fmt='json'):
+        """
+        Queue a report built from [(name, compute), ...]; raises queue.Full.
+
+        header holds the static fields (type, generated_by, ...), each
+        compute() is called on a worker thread.
+        """
+        if fmt not in WRITERS:
+            raise ValueError(f"format must be one of: {', '.join(REPORT_FORMATS)}")
+        self.start()
+
+        with self._lock:
+            self._seq = (self._seq + 1) % 10000
+            # timestamp first so ids still sort in generation order; the random
+            # suffix keeps workers submitting in the same second apart
+            report_id = f'RPT-{datetime.now().strftime("%Y%m%d%H%M%S")}-{self._seq:04d}-{uuid4().hex[:6]}'
+            job = ReportJob(report_id, fmt, {'id': report_id, **header}, sections)
+            self._queue.put_nowait(job)
+            self._jobs[report_id] = job
+            while len(self._jobs) > self.history:
+                self._jobs.popitem(last=False)
+        return job
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            try:
+                self._build(job)
+                self.completed += 1
+            except Exception as e:
+                job.state = 'failed'
+                job.error = str(e)
+                self.failed += 1
+                print(f"❌ Report {job.id} failed: {e}")
+            finally:
+                job.finished = time.time()
+                job.sections = None
+                self._queue.task_done()
+
+    def _build(self, job):
+        job.state = 'running'
+        job.started = time.time()
+        job.header['generated_at'] = datetime.now().isoformat()
+
+        path = report_path(job.id, job.format, self.reports_dir)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        partial = f'{path}.{os.getpid()}.part'
+        try:
+            with gzip.open(partial, 'wt', encoding='utf-8', newline='', compresslevel=Config.GZIP_LEVEL) as handle:
+                writer = WRITERS[job.format](handle, job.header)
+                for name, compute in job.sections:
+                    job.step = name
+                    writer.section(name, compute())
+                    job.completed += 1
+                writer.close()
+            os.replace(partial, path)
+        except BaseException:
+            if os.path.exists(partial):
+                os.remove(partial)
+            raise
+
+        self.catalog.add(job.id, job.header, job.format, os.path.getsize(path))
+        self.catalog.maybe_prune()
+
+        job.path = path
+        job.step = None
+        job.state = 'done'
+
+    def stats(self):
+        states = {state: 0 for state in JOB_STATES}
+        for job in list(self._jobs.values()):
+            states[job.state] += 1
+        return {
+            'workers': self.workers,
+            'queued': self._queue.qsize(),
+            'jobs': states,
+            'completed': self.completed,
+            'failed': self.failed
+        }
+
+
+report_queue = ReportQueue()
@@ -0,0 +1,157 @@
+"""In-process response cache for computed API payloads"""
+from api.services.inventory_service import inventory
+from api.services.metrics_store import latest_metrics
+from collections import OrderedDict
+from config import Config
+import threading
+import time
+
+
+def cache_key(path, args=None):
+    """
+    Route plus normalized parameters.
+
+    Pass only the parameters the view reads, never the raw query string,
+    or any unused `?x=` would mint a new entry. Values are stripped, empty
+    ones dropped and everything sorted, so `?b=2&a=1` and `?a=1&b=2&c=`
+    share an entry. Names stay case-sensitive, like Flask's args.
+    """
+    items = []
+    if args:
+        for name in args:
+            values = args.getlist(name) if hasattr(args, 'getlist') else [args[name]]
+            values = sorted(str(v).strip() for v in values if v is not None and str(v).strip())
+            if values:
+                items.append((name, tuple(values)))
+    return (path, tuple(sorted(items)))
+
+
+class _Flight:
+    """A computation in progress that later callers wait on"""
+
+    __slots__ = ('event', 'value', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class ResponseCache:
+    """
+    LRU cache with a TTL and version-based invalidation.
+
+    An entry is dropped as soon as the inventory version moves on. A new
+    metrics version also invalidates it, but only once the entry is at
+    least `min_age` seconds old: samples arrive continuously, so this
+    bounds staleness without recomputing on every request. Concurrent
+    misses for the same key are collapsed into one computation.
+    """
+
+    def __init__(self, max_entries=None, ttl=None, min_age=None,
+                 inventory_store=None, store=None):
+        self.max_entries = max_entries or Config.ANALYTICS_CACHE_SIZE
+        self.ttl = Config.CACHE_TTL if ttl is None else ttl
+        self.min_age = Config.ANALYTICS_CACHE_MIN_AGE if min_age is None else min_age
+        self.inventory = inventory_store or inventory
+        self.store = latest_metrics if store is None else store
+
+        self._entries = OrderedDict()
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def _stale_reason(self, entry, inventory_version, metrics_version, now):
+        value, entry_inventory, entry_metrics, created, expires = entry
+        if now >= expires:
+            return 'expired'
+        if entry_inventory != inventory_version:
+            return 'invalidated'
+        if entry_metrics != metrics_version and now - created >= self.min_age:
+            return 'invalidated'
+        return None
+
+    def get_or_compute(self, key, compute):
+        inventory_version = self.inventory.get_version()
+        metrics_version = self.store.version
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stale = self._stale_reason(entry, inventory_version, metrics_version, now)
+                if stale is None:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[0]
+                del self._entries[key]
+                if stale == 'expired':
+                    self.expirations += 1
+                else:
+                    self.invalidations += 1
+
+            flight = self._in_flight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._in_flight[key] = _Flight()
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = compute()
+        except Exception as e:
+            flight.error = e
+            raise
+        else:
+            with self._lock:
+                # tagged with the versions seen before computing, so a change
+                # mid-computation still invalidates it
+                self._entries[key] = (flight.value, inventory_version, metrics_version, now, now + self.ttl)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+            flight.event.set()
+
+        return flight.value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'ttl_seconds': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'coalesced': self.coalesced,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'invalidations': self.invalidations,
+            'hit_ratio': round((self.hits + self.coalesced) / lookups, 4) if lookups else 0
+        }
+
+
+analytics_cache = ResponseCache()
@@ -0,0 +1,471 @@
+"""Multi-resolution metric rollups"""
+from api.services.inventory_service import inventory
+from api.services.history_store import resolve_path
+from config import Config
+import threading
+import sqlite3
+import json
+import queue
+import math
+import time
+import os
+
+RESOLUTIONS = [60, 300, 3600, 86400]
+
+ROLLUP_METRICS = [
+    'cpu_usage', 'memory_usage', 'bandwidth', 'latency',
+    'packet_loss', 'temperature', 'online'
+]
+
+AGG_FIELDS = ['count', 'sum', 'min', 'max', 'p95']
+
+SKETCH_GAMMA = 1.02
+SKETCH_LOG_GAMMA = math.log(SKETCH_GAMMA)
+ZERO_BIN = -(10 ** 9)
+
+
+class Aggregate:
+    """
+    min/max/sum/count plus a log-bucketed sketch for percentiles.
+
+    The sketch keeps counts per bucket of width 2% (relative), so p95 is
+    within ~1% of the true value and two aggregates merge by adding
+    bucket counts.
+    """
+
+    __slots__ = ('count', 'total', 'min', 'max', 'bins')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self.bins = {}
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+        key = math.ceil(math.log(value) / SKETCH_LOG_GAMMA) if value > 0 else ZERO_BIN
+        self.bins[key] = self.bins.get(key, 0) + 1
+
+    @classmethod
+    def from_row(cls, count, total, low, high, p95, bins=None):
+        """Rebuild a persisted aggregate; rows without a sketch put every sample at p95"""
+        agg = cls()
+        agg.count, agg.total, agg.min, agg.max = count, total, low, high
+        if bins:
+            agg.bins = {int(key): value for key, value in bins.items()}
+        else:
+            agg.bins = {math.ceil(math.log(p95) / SKETCH_LOG_GAMMA) if p95 > 0 else ZERO_BIN: count}
+        return agg
+
+    def merge(self, other):
+        if not other.count:
+            return
+        self.count += other.count
+        self.total += other.total
+        self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = other.max if self.max is None else max(self.max, other.max)
+        for key, count in other.bins.items():
+            self.bins[key] = self.bins.get(key, 0) + count
+
+    def quantile(self, q):
+        if not self.count:
+            return None
+        # nearest-rank definition
+        rank = max(1, math.ceil(q * self.count))
+        seen = 0
+        for key in sorted(self.bins):
+            seen += self.bins[key]
+            if seen >= rank:
+                if key == ZERO_BIN:
+                    return 0.0
+                estimate = 2 * SKETCH_GAMMA ** key / (1 + SKETCH_GAMMA)
+                return min(max(estimate, self.min), self.max)
+        return self.max
+
+    @property
+    def avg(self):
+        return self.total / self.count if self.count else None
+
+
+def sample_values(sample):
+    """Metric values carried by one poll sample"""
+    values = {
+        'online': 0.0 if sample.get('status') == 'offline' else 1.0
+    }
+    for name in ('cpu_usage', 'memory_usage', 'latency', 'packet_loss', 'temperature'):
+        value = sample.get(name)
+        if value is not None:
+            values[name] = float(value)
+
+    if sample.get('bandwidth_in') is not None or sample.get('bandwidth_out') is not None:
+        values['bandwidth'] = float(sample.get('bandwidth_in') or 0) + float(sample.get('bandwidth_out') or 0)
+
+    return values
+
+
+class RollupService:
+    """
+    Incremental 1m/5m/1h/1d aggregates per device, office, region and
+    globally.
+
+    Samples only touch the open 1-minute bucket of each scope. When a
+    bucket closes it is persisted and folded into its 5-minute parent,
+    and so on up to a day, so coarse resolutions never rescan raw
+    samples. Trend queries read the coarsest table that still gives
+    enough points for the requested range.
+
+    Rows carry their percentile sketch, so on start() the coarse buckets
+    that were still open when the process stopped are rebuilt from their
+    persisted children instead of being restarted empty and overwritten.
+    """
+
+    def __init__(self, db_path=None, inventory_store=None, grace_seconds=None):
+        self.db_path = resolve_path(db_path or Config.DATABASE_PATH)
+        self.inventory = inventory_store or inventory
+        self.grace_seconds = Config.ROLLUP_GRACE_SECONDS if grace_seconds is None else grace_seconds
+
+        # {resolution: {(scope, scope_id, bucket): {metric: Aggregate}}}
+        self._open = {resolution: {} for resolution in RESOLUTIONS}
+        self._lock = threading.Lock()
+        self._next_close = 0.0
+        self._closed_until = 0
+        self._local = threading.local()
+
+        self._queue = queue.Queue()
+        self._thread = None
+        self._stop = threading.Event()
+        self._last_prune = 0.0
+
+        self.samples_ingested = 0
+        self.samples_late = 0
+        self.rows_written = 0
+
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        self._init_schema()
+
+    # Storage
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    def _reader(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    def _init_schema(self):
+        columns = ', '.join(
+            f'{metric}_{field} {"INTEGER" if field == "count" else "REAL"}'
+            for metric in ROLLUP_METRICS for field in AGG_FIELDS
+        )
+        conn = self._connect()
+        with conn:
+            conn.execute(f'''
+                CREATE TABLE IF NOT EXISTS metric_rollups (
+                    scope TEXT NOT NULL,
+                    scope_id TEXT NOT NULL,
+                    resolution INTEGER NOT NULL,
+                    bucket INTEGER NOT NULL,
+                    {columns},
+                    sketch TEXT,
+                    PRIMARY KEY (scope, scope_id, resolution, bucket)
+                ) WITHOUT ROWID
+            ''')
+            existing = {row[1] for row in conn.execute('PRAGMA table_info(metric_rollups)')}
+            if 'sketch' not in existing:
+                conn.execute('ALTER TABLE metric_rollups ADD COLUMN sketch TEXT')
+            # recent buckets by resolution, for restoring open buckets and pruning
+            conn.execute('CREATE INDEX IF NOT EXISTS metric_rollups_recent ON metric_rollups (resolution, bucket)')
+        conn.close()
+
+    def _row(self, scope, scope_id, resolution, bucket, aggregates):
+        row = [scope, scope_id, resolution, bucket]
+        sketch = {}
+        for metric in ROLLUP_METRICS:
+            agg = aggregates.get(metric)
+            if agg and agg.count:
+                row.extend([agg.count, agg.total, agg.min, agg.max, agg.quantile(0.95)])
+                sketch[metric] = agg.bins
+            else:
+                row.extend([0, None, None, None, None])
+        row.append(json.dumps(sketch, separators=(',', ':')))
+        return row
+
+    def _aggregates(self, row):
+        """{metric: Aggregate} from a stored row"""
+        sketch = json.loads(row[-1]) if row[-1] else {}
+        aggregates = {}
+        for position, metric in enumerate(ROLLUP_METRICS):
+            count, total, low, high, p95 = row[4 + position * 5: 9 + position * 5]
+            if count:
+                aggregates[metric] = Aggregate.from_row(count, total, low, high, p95, sketch.get(metric))
+        return aggregates
+
+    def restore_open(self, now=None):
+        """
+        Rebuild the open coarse buckets from persisted rows.
+
+        A bucket at one resolution is exactly the merge of the closed
+        children below it, so any recent child whose parent row is not
+        on disk yet belongs to a parent that was open at shutdown.
+        """
+        now = time.time() if now is None else now
+        conn = self._reader()
+        restored = 0
+        with self._lock:
+            for level in range(1, len(RESOLUTIONS)):
+                child, resolution = RESOLUTIONS[level - 1], RESOLUTIONS[level]
+                rows = conn.execute(
+                    'SELECT * FROM metric_rollups AS c WHERE c.resolution = ? AND c.bucket >= ? '
+                    'AND NOT EXISTS (SELECT 1 FROM metric_rollups AS p WHERE p.scope = c.scope '
+                    'AND p.scope_id = c.scope_id AND p.resolution = ? AND p.bucket = c.bucket - c.bucket % ?)',
+                    (child, now - 2 * resolution - self.grace_seconds, resolution, resolution)
+                ).fetchall()
+                open_buckets = self._open[resolution]
+                # a bucket already open here has these children folded in
+                existing = set(open_buckets)
+                for row in rows:
+                    key = (row[0], row[1], row[3] // resolution * resolution)
+                    if key in existing:
+                        continue
+                    parent = open_buckets.setdefault(key, {})
+                    for metric, agg in self._aggregates(row).items():
+                        parent.setdefault(metric, Aggregate()).merge(agg)
+                restored += len(rows)
+
+            # minutes already on disk only take late samples as late
+            finest = RESOLUTIONS[0]
+            last = conn.execute(
+                'SELECT MAX(bucket) FROM metric_rollups WHERE resolution = ? AND bucket >= ?',
+                (finest, now - 2 * RESOLUTIONS[-1])
+            ).fetchone()[0]
+            if last is not None:
+                self._closed_until = max(self._closed_until, int(last) + finest)
+
+        if restored:
+            print(f"✅ Restored open rollup buckets from {restored} persisted rows")
+        return restored
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self.restore_open()
+        self._thread = threading.Thread(target=self._run, name='rollup-writer', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def _run(self):
+        conn = self._connect()
+        width = 5 + len(ROLLUP_METRICS) * len(AGG_FIELDS)
+        sql = f'INSERT OR REPLACE INTO metric_rollups VALUES ({", ".join("?" * width)})'
+
+        while not self._stop.is_set() or not self._queue.empty():
+            try:
+                rows = self._queue.get(timeout=1.0)
+            except queue.Empty:
+                rows = None
+
+            if rows:
+                try:
+                    with conn:
+                        conn.executemany(sql, rows)
+                    self.rows_written += len(rows)
+                except sqlite3.Error as e:
+                    print(f"❌ Rollup write error: {e}")
+            if rows is not None:
+                self._queue.task_done()
+
+            if time.time() - self._last_prune > Config.HISTORY_PRUNE_INTERVAL:
+                self.prune(conn)
+
+        conn.close()
+
+    def flush(self):
+        """Close every finished bucket and wait until it is on disk"""
+        self.close_buckets(time.time())
+        self._queue.join()
+
+    def prune(self, conn=None):
+        conn = conn or self._reader()
+        now = time.time()
+        try:
+            with conn:
+                for resolution, days in Config.ROLLUP_RETENTION_DAYS.items():
+                    conn.execute(
+                        'DELETE FROM metric_rollups WHERE resolution = ? AND bucket < ?',
+                        (resolution, now - days * 86400)
+                    )
+        except sqlite3.Error as e:
+            print(f"❌ Rollup prune error: {e}")
+        self._last_prune = now
+
+    # Ingest
+
+    def _scopes(self, device_id):
+        scopes = [('device', device_id), ('global', '')]
+        device = self.inventory.get_device(device_id)
+        if device:
+            scopes.append(('office', device.office_id))
+            office = self.inventory.get_office(device.office_id)
+            if office:
+                scopes.append(('region', office.region))
+        return scopes
+
+    def on_sample(self, device_id, sample, previous=None):
+        """LatestMetricsStore listener"""
+        self.ingest(device_id, sample.get('ts') or time.time(), sample_values(sample))
+
+    def ingest(self, device_id, ts, values, now=None):
+        finest = RESOLUTIONS[0]
+        bucket = int(ts // finest * finest)
+
+        with self._lock:
+            if bucket < self._closed_until:
+                # its minute is already closed and folded upward
+                self.samples_late += 1
+                return
+
+            open_buckets = self._open[finest]
+            for scope, scope_id in self._scopes(device_id):
+                key = (scope, scope_id, bucket)
+                aggregates = open_buckets.get(key)
+                if aggregates is None:
+                    aggregates = open_buckets[key] = {}
+                for metric, value in values.items():
+                    agg = aggregates.get(metric)
+                    if agg is None:
+                        agg = aggregates[metric] = Aggregate()
+                    agg.add(value)
+
+            self.samples_ingested += 1
+
+        now = time.time() if now is None else now
+        if now >= self._next_close:
+            self.close_buckets(now)
+
+    def close_buckets(self, now):
+        """Persist finished buckets and fold them into the next resolution"""
+        rows = []
+        with self._lock:
+            for level, resolution in enumerate(RESOLUTIONS):
+                open_buckets = self._open[resolution]
+                cutoff = now - self.grace_seconds
+                parent_resolution = RESOLUTIONS[level + 1] if level + 1 < len(RESOLUTIONS) else None
+
+                for key in [k for k in open_buckets if k[2] + resolution <= cutoff]:
+                    scope, scope_id, bucket = key
+                    aggregates = open_buckets.pop(key)
+                    rows.append(self._row(scope, scope_id, resolution, bucket, aggregates))
+
+                    if parent_resolution:
+                        parent_key = (scope, scope_id, bucket // parent_resolution * parent_resolution)
+                        parent = self._open[parent_resolution].setdefault(parent_key, {})
+                        for metric, agg in aggregates.items():
+                            parent.setdefault(metric, Aggregate()).merge(agg)
+
+            finest = RESOLUTIONS[0]
+            cutoff = now - self.grace_seconds
+            self._closed_until = max(self._closed_until, int(cutoff // finest * finest))
+            self._next_close = (now // finest + 1) * finest + self.grace_seconds
+
+        if rows:
+            self._queue.put(rows)
+
+    # Queries
+
+    def pick_resolution(self, seconds, max_points=None):
+        """Finest resolution that keeps the range within max_points"""
+        max_points = max_points or Config.TREND_MAX_POINTS
+        for resolution in RESOLUTIONS:
+            if seconds / resolution <= max_points:
+                return resolution
+        return RESOLUTIONS[-1]
+
+    def query(self, scope, scope_id, start, end=None, resolution=None):
+        """
+        Buckets for one scope between start and end.
+
+        Returns {bucket: {metric: {count, avg, min, max, p95}}}, merging
+        persisted rows with buckets still open in memory.
+        """
+        end = end or time.time()
+        resolution = resolution or self.pick_resolution(end - start)
+        start_bucket = int(start // resolution * resolution)
+
+        buckets = {}
+        rows = self._reader().execute(
+            'SELECT * FROM metric_rollups WHERE scope = ? AND scope_id = ? AND resolution = ? '
+            'AND bucket >= ? AND bucket <= ? ORDER BY bucket',
+            (scope, scope_id, resolution, start_bucket, end)
+        ).fetchall()
+
+        for row in rows:
+            metrics = {}
+            for position, metric in enumerate(ROLLUP_METRICS):
+                count, total, low, high, p95 = row[4 + position * 5: 9 + position * 5]
+                if count:
+                    metrics[metric] = {'count': count, 'avg': total / count, 'min': low, 'max': high, 'p95': p95}
+            buckets[row[3]] = metrics
+
+        # fold in everything not yet persisted at this resolution
+        live = {}
+        with self._lock:
+            for level_resolution in RESOLUTIONS:
+                if level_resolution > resolution:
+                    break
+                for (key_scope, key_id, bucket), aggregates in self._open[level_resolution].items():
+                    if key_scope != scope or key_id != scope_id or bucket + level_resolution <= start_bucket or bucket > end:
+                        continue
+                    target = live.setdefault(bucket // resolution * resolution, {})
+                    for metric, agg in aggregates.items():
+                        target.setdefault(metric, Aggregate()).merge(agg)
+
+        for bucket, aggregates in live.items():
+            metrics = buckets.setdefault(bucket, {})
+            for metric, agg in aggregates.items():
+                stored = metrics.get(metric)
+                if stored:
+                    # combine persisted children with the still-open ones
+                    merged_count = stored['count'] + agg.count
+                    metrics[metric] = {
+                        'count': merged_count,
+                        'avg': (stored['avg'] * stored['count'] + agg.total) / merged_count,
+                        'min': min(stored['min'], agg.min),
+                        'max': max(stored['max'], agg.max),
+                        'p95': max(stored['p95'], agg.quantile(0.95))
+                    }
+                else:
+                    metrics[metric] = {
+                        'count': agg.count, 'avg': agg.avg, 'min': agg.min,
+                        'max': agg.max, 'p95': agg.quantile(0.95)
+                    }
+
+        return resolution, dict(sorted(buckets.items()))
+
+    def stats(self):
+        with self._lock:
+            open_buckets = {str(resolution): len(buckets) for resolution, buckets in self._open.items()}
+        return {
+            'samples_ingested': self.samples_ingested,
+            'samples_late': self.samples_late,
+            'rows_written': self.rows_written,
+            'open_buckets': open_buckets
+        }
+
+
+rollup_service = RollupService()
@@ -0,0 +1,318 @@
+"""Asynchronous SNMP polling engine"""
+from api.services.perf_stats import perf
+from config import Config
+from pyasn1.type import univ
+import threading
+import asyncio
+import time
+
+try:
+    # pysnmp >= 6
+    from pysnmp.hlapi.v3arch.asyncio import (
+        SnmpEngine, CommunityData, UdpTransportTarget, ContextData,
+        ObjectType, ObjectIdentity, get_cmd, bulk_cmd
+    )
+except ImportError:
+    from pysnmp.hlapi.asyncio import (
+        SnmpEngine, CommunityData, UdpTransportTarget, ContextData,
+        ObjectType, ObjectIdentity, getCmd as get_cmd, bulkCmd as bulk_cmd
+    )
+
+from pysnmp.proto.rfc1905 import NoSuchObject, NoSuchInstance, EndOfMibView
+
+MISSING_VALUES = (NoSuchObject, NoSuchInstance, EndOfMibView)
+
+
+def to_python(value):
+    """Convert a pysnmp value into a plain int or str"""
+    if isinstance(value, univ.Integer):
+        return int(value)
+    if isinstance(value, univ.OctetString):
+        try:
+            return value.asOctets().decode('utf-8')
+        except UnicodeDecodeError:
+            return value.prettyPrint()
+    return value.prettyPrint()
+
+
+class SNMPPollingEngine:
+    """
+    Long-lived SNMP engine running on its own asyncio loop.
+
+    All scalar OIDs for a host go out in a single GET PDU, and the
+    SnmpEngine, auth data and transport targets are created once and
+    reused. Many hosts can be polled at once; each host gets its own
+    timeout/retry budget so one dead device never stalls the sweep.
+    """
+
+    def __init__(self, timeout=None, retries=None, max_concurrency=None, max_repetitions=None):
+        self.timeout = Config.SNMP_TIMEOUT if timeout is None else timeout
+        self.retries = Config.SNMP_RETRIES if retries is None else retries
+        self.max_concurrency = max_concurrency or Config.SNMP_MAX_CONCURRENCY
+        self.max_repetitions = max_repetitions or Config.SNMP_MAX_REPETITIONS
+
+        self._loop = None
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+        # only touched from the loop thread
+        self._engine = None
+        self._context = None
+        self._semaphore = None
+        self._auth = {}
+        self._targets = {}
+
+    # Loop management
+
+    def _ensure_loop(self):
+        if self._loop is not None:
+            return self._loop
+
+        with self._start_lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                ready = threading.Event()
+
+                def run():
+                    asyncio.set_event_loop(loop)
+                    self._engine = SnmpEngine()
+                    self._context = ContextData()
+                    self._semaphore = asyncio.Semaphore(self.max_concurrency)
+                    ready.set()
+                    loop.run_forever()
+
+                self._thread = threading.Thread(target=run, name='snmp-engine', daemon=True)
+                self._thread.start()
+                ready.wait()
+                self._loop = loop
+
+        return self._loop
+
+    def submit(self, coro):
+        """Schedule a coroutine on the engine loop and return a concurrent.futures.Future"""
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_loop())
+
+    def run(self, coro, timeout=None):
+        """Run a coroutine on the engine loop from any thread and wait for it"""
+        return self.submit(coro).result(timeout)
+
+    def close(self):
+        if self._loop is None:
+            return
+        loop = self._loop
+        self._loop = None
+
+        def shutdown():
+            try:
+                self._engine.close_dispatcher()
+            except Exception:
+                pass
+            loop.stop()
+
+        loop.call_soon_threadsafe(shutdown)
+        self._thread.join(timeout=2)
+
+    # Cached protocol objects
+
+    def _get_auth(self, community):
+        auth = self._auth.get(community)
+        if auth is None:
+            auth = self._auth[community] = CommunityData(community)
+        return auth
+
+    async def _get_target(self, host, port, timeout, retries):
+        key = (host, port, timeout, retries)
+        target = self._targets.get(key)
+        if target is None:
+            if hasattr(UdpTransportTarget, 'create'):
+                target = await UdpTransportTarget.create((host, port), timeout=timeout, retries=retries)
+            else:
+                target = UdpTransportTarget((host, port), timeout=timeout, retries=retries)
+            self._targets[key] = target
+        return target
+
+    def host_budget(self, timeout=None, retries=None):
+        """Wall-clock ceiling for a single host, including all retries"""
+        timeout = self.timeout if timeout is None else timeout
+        retries = self.retries if retries is None else retries
+        return timeout * (retries + 1) + 0.5
+
+    # Polling
+
+    async def get(self, host, oids, community='public', port=161, timeout=None, retries=None):
+        """
+        Fetch many scalar OIDs from one host in a single GET PDU.
+
+        Returns {oid: value} for every OID the agent answered, or None if
+        the host could not be reached within its budget.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        retries = self.retries if retries is None else retries
+
+        async with self._semaphore:
+            # timed from here, so waiting for a concurrency slot doesn't count
+            started = time.perf_counter()
+            ok = False
+            try:
+                target = await self._get_target(host, port, timeout, retries)
+                errorIndication, errorStatus, errorIndex, varBinds = await asyncio.wait_for(
+                    get_cmd(self._engine,
+                            self._get_auth(community),
+                            target,
+                            self._context,
+                            *[ObjectType(ObjectIdentity(oid)) for oid in oids],
+                            lookupMib=False),
+                    self.host_budget(timeout, retries)
+                )
+                ok = not (errorIndication or errorStatus)
+            except asyncio.TimeoutError:
+                return None
+            except Exception as e:
+                print(f"SNMP Error polling {host}: {e}")
+                return None
+            finally:
+                perf.observe('upstream', 'snmp.get', time.perf_counter() - started, ok)
+
+        if errorIndication or errorStatus:
+            return None
+
+        values = {}
+        for oid, varBind in zip(oids, varBinds):
+            value = varBind[1]
+            if isinstance(value, MISSING_VALUES):
+                continue
+            values[oid] = to_python(value)
+
+        return values
+
+    async def walk(self, host, oids, community='public', port=161,
+                   max_repetitions=None, max_rows=None, timeout=None, retries=None):
+        """
+        Walk one or more table columns with GETBULK.
+
+        Every still-active column rides in the same PDU, so a whole table
+        comes back in roughly rows / max_repetitions round trips instead of
+        one per row. Returns {root_oid: [(oid, value), ...]} or None if the
+        host did not answer at all.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        retries = self.retries if retries is None else retries
+        max_repetitions = max_repetitions or self.max_repetitions
+
+        prefixes = {root: tuple(int(part) for part in root.strip('.').split('.')) for root in oids}
+        cursors = {root: root for root in oids}
+        last_seen = {root: prefixes[root] for root in oids}
+        results = {root: [] for root in oids}
+        answered = False
+
+        async with self._semaphore:
+            while cursors:
+                roots = list(cursors)
+                started = time.perf_counter()
+                try:
+                    # cached after the first round; resolving the host can fail like any request
+                    target = await self._get_target(host, port, timeout, retries)
+                    errorIndication, errorStatus, errorIndex, varBinds = await asyncio.wait_for(
+                        bulk_cmd(self._engine,
+                                 self._get_auth(community),
+                                 target,
+                                 self._context,
+                                 0, max_repetitions,
+                                 *[ObjectType(ObjectIdentity(cursors[root])) for root in roots],
+                                 lookupMib=False),
+                        self.host_budget(timeout, retries)
+                    )
+                except asyncio.TimeoutError:
+                    perf.observe('upstream', 'snmp.walk', time.perf_counter() - started, False)
+                    break
+                except Exception as e:
+                    perf.observe('upstream', 'snmp.walk', time.perf_counter() - started, False)
+                    print(f"SNMP Walk error on {host}: {e}")
+                    break
+
+                perf.observe('upstream', 'snmp.walk', time.perf_counter() - started,
+                             not (errorIndication or errorStatus))
+                if errorIndication or errorStatus:
+                    break
+                answered = True
+
+                # older pysnmp returns a table of rows, newer a flat row-major list
+                flat = []
+                for item in varBinds:
+                    if isinstance(item[0], (tuple, list, ObjectType)):
+                        flat.extend(item)
+                    else:
+                        flat.append(item)
+
+                finished = set()
+                for position, varBind in enumerate(flat):
+                    root = roots[position % len(roots)]
+                    if root in finished:
+                        continue
+
+                    oid, value = varBind[0], varBind[1]
+                    oid_tuple = tuple(oid)
+                    prefix = prefixes[root]
+                    if isinstance(value, MISSING_VALUES) or oid_tuple[:len(prefix)] != prefix:
+                        finished.add(root)
+                        continue
+
+                    if oid_tuple <= last_seen[root]:
+                        # agent is not increasing, stop before looping forever
+                        finished.add(root)
+                        continue
+
+                    oid_str = '.'.join(str(part) for part in oid_tuple)
+                    rows = results[root]
+                    rows.append((oid_str, to_python(value)))
+                    cursors[root] = oid_str
+                    last_seen[root] = oid_tuple
+                    if max_rows and len(rows) >= max_rows:
+                        finished.add(root)
+
+                if not flat:
+                    break
+
+                for root in finished:
+                    cursors.pop(root, None)
+
+        return results if answered else None
+
+    def walk_sync(self, host, oids, community='public', port=161, max_repetitions=None, max_rows=None):
+        return self.run(self.walk(host, oids, community, port, max_repetitions, max_rows))
+
+    async def get_many(self, requests):
+        """
+        Poll many hosts concurrently.
+
+        `requests` is a list of dicts with host, oids and optional
+        community/port/timeout/retries. Returns {host: values}.
+        """
+        results = await asyncio.gather(*[
+            self.get(req['host'], req['oids'],
+                     req.get('community', Config.SNMP_COMMUNITY),
+                     req.get('port', Config.SNMP_PORT),
+                     req.get('timeout'), req.get('retries'))
+            for req in requests
+        ])
+        return {req['host']: result for req, result in zip(requests, results)}
+
+    def get_sync(self, host, oids, community='public', port=161, timeout=None, retries=None):
+        return self.run(self.get(host, oids, community, port, timeout, retries))
+
+    def get_many_sync(self, requests, deadline=None):
+        return self.run(self.get_many(requests), deadline)
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    """Process-wide polling engine"""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = SNMPPollingEngine()
+    return _engine
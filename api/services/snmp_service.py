@@ -1,7 +1,6 @@
 """SNMP Monitor"""
-from pysnmp.hlapi import *
+from api.services.snmp_engine import get_engine
 from datetime import datetime
-import time
 
 class SNMPService:
     
@@ -21,254 +20,251 @@ class SNMPService:
     OID_IF_IN_OCTETS = '1.3.6.1.2.1.2.2.1.10'   
     OID_IF_OUT_OCTETS = '1.3.6.1.2.1.2.2.1.16'  
     OID_IF_OPER_STATUS = '1.3.6.1.2.1.2.2.1.8' 
+    OID_IF_DESCR = '1.3.6.1.2.1.2.2.1.2'
     
-    def __init__(self):
-        pass
+    # ifXTable 64-bit counters
+    OID_IF_HC_IN_OCTETS = '1.3.6.1.2.1.31.1.1.1.6'
+    OID_IF_HC_OUT_OCTETS = '1.3.6.1.2.1.31.1.1.1.10'
+    
+    INTERFACE_TABLE_COLUMNS = {
+        'descr': OID_IF_DESCR,
+        'oper_status': OID_IF_OPER_STATUS,
+        'hc_in_octets': OID_IF_HC_IN_OCTETS,
+        'hc_out_octets': OID_IF_HC_OUT_OCTETS
+    }
+    
+    IF_STATUS_MAP = {1: 'up', 2: 'down', 3: 'testing', 4: 'unknown', 5: 'dormant'}
+    
+    DEVICE_INFO_OIDS = [OID_SYSTEM_DESCRIPTION, OID_SYSTEM_NAME, OID_SYSTEM_UPTIME]
+    CPU_OIDS = [OID_CPU_5SEC, OID_CPU_1MIN]
+    MEMORY_OIDS = [OID_MEMORY_USED, OID_MEMORY_FREE]
+    
+    def __init__(self, engine=None):
+        self.engine = engine or get_engine()
+    
+    def _interface_oids(self, interface_index):
+        return [
+            f"{self.OID_IF_IN_OCTETS}.{interface_index}",
+            f"{self.OID_IF_OUT_OCTETS}.{interface_index}",
+            f"{self.OID_IF_OPER_STATUS}.{interface_index}"
+        ]
+    
+    def _all_metric_oids(self, interface_index=1):
+        return self.DEVICE_INFO_OIDS + self.CPU_OIDS + self.MEMORY_OIDS + self._interface_oids(interface_index)
+    
+    # Parsers turn one GET response into the public result shapes
+    
+    def _parse_device_info(self, host, values):
+        if self.OID_SYSTEM_DESCRIPTION not in values:
+            return None
+        
+        info = {'description': str(values[self.OID_SYSTEM_DESCRIPTION])}
+        
+        if self.OID_SYSTEM_NAME in values:
+            info['hostname'] = str(values[self.OID_SYSTEM_NAME])
+        
+        if self.OID_SYSTEM_UPTIME in values:
+            uptime_seconds = int(values[self.OID_SYSTEM_UPTIME]) / 100
+            info['uptime_seconds'] = uptime_seconds
+            info['uptime_days'] = round(uptime_seconds / 86400, 2)
+        
+        info['timestamp'] = datetime.now().isoformat()
+        info['host'] = host
+        
+        return info
+    
+    def _parse_cpu(self, values):
+        cpu_data = {}
+        
+        if self.OID_CPU_5SEC in values:
+            cpu_data['cpu_5sec'] = int(values[self.OID_CPU_5SEC])
+        
+        if self.OID_CPU_1MIN in values:
+            cpu_data['cpu_1min'] = int(values[self.OID_CPU_1MIN])
+        
+        if not cpu_data:
+            return None
+        
+        cpu_data['timestamp'] = datetime.now().isoformat()
+        return cpu_data
+    
+    def _parse_memory(self, values):
+        if self.OID_MEMORY_USED not in values:
+            return None
+        
+        memory_used = int(values[self.OID_MEMORY_USED])
+        memory_data = {'memory_used': memory_used}
+        
+        if self.OID_MEMORY_FREE in values:
+            memory_free = int(values[self.OID_MEMORY_FREE])
+            memory_data['memory_free'] = memory_free
+            
+            memory_total = memory_used + memory_free
+            memory_data['memory_total'] = memory_total
+            if memory_total:
+                memory_data['memory_percent'] = round((memory_used / memory_total) * 100, 2)
+        
+        memory_data['timestamp'] = datetime.now().isoformat()
+        return memory_data
+    
+    def _parse_interface(self, values, interface_index):
+        oid_in, oid_out, oid_status = self._interface_oids(interface_index)
+        stats = {}
+        
+        if oid_in in values:
+            stats['bytes_in'] = int(values[oid_in])
+        
+        if oid_out in values:
+            stats['bytes_out'] = int(values[oid_out])
+        
+        if oid_status in values:
+            # 1=up, 2=down, 3=testing, 4=unknown, 5=dormant
+            stats['status'] = self.IF_STATUS_MAP.get(int(values[oid_status]), 'unknown')
+        
+        if not stats:
+            return None
+        
+        stats['interface_index'] = interface_index
+        stats['timestamp'] = datetime.now().isoformat()
+        return stats
+    
+    def _parse_all_metrics(self, host, values, interface_index=1):
+        metrics = {
+            'host': host,
+            'timestamp': datetime.now().isoformat()
+        }
+        
+        device_info = self._parse_device_info(host, values)
+        if device_info:
+            metrics['device_info'] = device_info
+        
+        cpu_usage = self._parse_cpu(values)
+        if cpu_usage:
+            metrics['cpu'] = cpu_usage
+        
+        memory_usage = self._parse_memory(values)
+        if memory_usage:
+            metrics['memory'] = memory_usage
+        
+        interface_stats = self._parse_interface(values, interface_index)
+        if interface_stats:
+            metrics['interface'] = interface_stats
+        
+        return metrics
     
     def get_device_info(self, host, community='public', port=161):
-     
-        try:
-            info = {}
-            
-            errorIndication, errorStatus, errorIndex, varBinds = next(
-                getCmd(SnmpEngine(),
-                       CommunityData(community),
-                       UdpTransportTarget((host, port)),
-                       ContextData(),
-                       ObjectType(ObjectIdentity(self.OID_SYSTEM_DESCRIPTION)))
-            )
-            
-            if errorIndication or errorStatus:
-                return None
-            
-            info['description'] = str(varBinds[0][1])
-            
-            errorIndication, errorStatus, errorIndex, varBinds = next(
-                getCmd(SnmpEngine(),
-                       CommunityData(community),
-                       UdpTransportTarget((host, port)),
-                       ContextData(),
-                       ObjectType(ObjectIdentity(self.OID_SYSTEM_NAME)))
-            )
-            
-            if not errorIndication and not errorStatus:
-                info['hostname'] = str(varBinds[0][1])
-            
-            errorIndication, errorStatus, errorIndex, varBinds = next(
-                getCmd(SnmpEngine(),
-                       CommunityData(community),
-                       UdpTransportTarget((host, port)),
-                       ContextData(),
-                       ObjectType(ObjectIdentity(self.OID_SYSTEM_UPTIME)))
-            )
-            
-            if not errorIndication and not errorStatus:
-                uptime_ticks = int(varBinds[0][1])
-                uptime_seconds = uptime_ticks / 100
-                info['uptime_seconds'] = uptime_seconds
-                info['uptime_days'] = round(uptime_seconds / 86400, 2)
-            
-            info['timestamp'] = datetime.now().isoformat()
-            info['host'] = host
-            
-            return info
-            
-        except Exception as e:
-            print(f"SNMP Error getting device info from {host}: {e}")
+        values = self.engine.get_sync(host, self.DEVICE_INFO_OIDS, community, port)
+        if not values:
             return None
+        return self._parse_device_info(host, values)
     
     def get_cpu_usage(self, host, community='public', port=161):
-       
-        try:
-            cpu_data = {}
-            
-            errorIndication, errorStatus, errorIndex, varBinds = next(
-                getCmd(SnmpEngine(),
-                       CommunityData(community),
-                       UdpTransportTarget((host, port)),
-                       ContextData(),
-                       ObjectType(ObjectIdentity(self.OID_CPU_5SEC)))
-            )
-            
-            if not errorIndication and not errorStatus:
-                cpu_data['cpu_5sec'] = int(varBinds[0][1])
-            
-            errorIndication, errorStatus, errorIndex, varBinds = next(
-                getCmd(SnmpEngine(),
-                       CommunityData(community),
-                       UdpTransportTarget((host, port)),
-                       ContextData(),
-                       ObjectType(ObjectIdentity(self.OID_CPU_1MIN)))
-            )
-            
-            if not errorIndication and not errorStatus:
-                cpu_data['cpu_1min'] = int(varBinds[0][1])
-            
-            cpu_data['timestamp'] = datetime.now().isoformat()
-            
-            return cpu_data if cpu_data else None
-            
-        except Exception as e:
-            print(f"SNMP Error getting CPU from {host}: {e}")
+        values = self.engine.get_sync(host, self.CPU_OIDS, community, port)
+        if not values:
             return None
+        return self._parse_cpu(values)
     
     def get_memory_usage(self, host, community='public', port=161):
-       
-        try:
-            memory_data = {}
-            
-            errorIndication, errorStatus, errorIndex, varBinds = next(
-                getCmd(SnmpEngine(),
-                       CommunityData(community),
-                       UdpTransportTarget((host, port)),
-                       ContextData(),
-                       ObjectType(ObjectIdentity(self.OID_MEMORY_USED)))
-            )
-            
-            if not errorIndication and not errorStatus:
-                memory_used = int(varBinds[0][1])
-                memory_data['memory_used'] = memory_used
-            else:
-                return None
-            
-            errorIndication, errorStatus, errorIndex, varBinds = next(
-                getCmd(SnmpEngine(),
-                       CommunityData(community),
-                       UdpTransportTarget((host, port)),
-                       ContextData(),
-                       ObjectType(ObjectIdentity(self.OID_MEMORY_FREE)))
-            )
-            
-            if not errorIndication and not errorStatus:
-                memory_free = int(varBinds[0][1])
-                memory_data['memory_free'] = memory_free
-            
-                memory_total = memory_used + memory_free
-                memory_data['memory_total'] = memory_total
-                memory_data['memory_percent'] = round((memory_used / memory_total) * 100, 2)
-            
-            memory_data['timestamp'] = datetime.now().isoformat()
-            
-            return memory_data
-            
-        except Exception as e:
-            print(f"SNMP Error getting memory from {host}: {e}")
+        values = self.engine.get_sync(host, self.MEMORY_OIDS, community, port)
+        if not values:
             return None
+        return self._parse_memory(values)
     
     def get_interface_stats(self, host, interface_index=1, community='public', port=161):
-
-        try:
-            stats = {}
-            
-            oid_in = f"{self.OID_IF_IN_OCTETS}.{interface_index}"
-            errorIndication, errorStatus, errorIndex, varBinds = next(
-                getCmd(SnmpEngine(),
-                       CommunityData(community),
-                       UdpTransportTarget((host, port)),
-                       ContextData(),
-                       ObjectType(ObjectIdentity(oid_in)))
-            )
-            
-            if not errorIndication and not errorStatus:
-                stats['bytes_in'] = int(varBinds[0][1])
-            
-
-            oid_out = f"{self.OID_IF_OUT_OCTETS}.{interface_index}"
-            errorIndication, errorStatus, errorIndex, varBinds = next(
-                getCmd(SnmpEngine(),
-                       CommunityData(community),
-                       UdpTransportTarget((host, port)),
-                       ContextData(),
-                       ObjectType(ObjectIdentity(oid_out)))
-            )
-            
-            if not errorIndication and not errorStatus:
-                stats['bytes_out'] = int(varBinds[0][1])
-            
-            oid_status = f"{self.OID_IF_OPER_STATUS}.{interface_index}"
-            errorIndication, errorStatus, errorIndex, varBinds = next(
-                getCmd(SnmpEngine(),
-                       CommunityData(community),
-                       UdpTransportTarget((host, port)),
-                       ContextData(),
-                       ObjectType(ObjectIdentity(oid_status)))
-            )
-            
-            if not errorIndication and not errorStatus:
-                # 1=up, 2=down, 3=testing, 4=unknown, 5=dormant
-                status_code = int(varBinds[0][1])
-                status_map = {1: 'up', 2: 'down', 3: 'testing', 4: 'unknown', 5: 'dormant'}
-                stats['status'] = status_map.get(status_code, 'unknown')
-            
-            stats['interface_index'] = interface_index
-            stats['timestamp'] = datetime.now().isoformat()
-            
-            return stats if stats else None
-            
-        except Exception as e:
-            print(f"SNMP Error getting interface stats from {host}: {e}")
+        values = self.engine.get_sync(host, self._interface_oids(interface_index), community, port)
+        if not values:
             return None
+        return self._parse_interface(values, interface_index)
     
     def get_all_metrics(self, host, community='public', port=161):
-      
-        try:
-            metrics = {
-                'host': host,
-                'timestamp': datetime.now().isoformat()
-            }
-            
-            device_info = self.get_device_info(host, community, port)
-            if device_info:
-                metrics['device_info'] = device_info
-            
-            cpu_usage = self.get_cpu_usage(host, community, port)
-            if cpu_usage:
-                metrics['cpu'] = cpu_usage
-            
-            memory_usage = self.get_memory_usage(host, community, port)
-            if memory_usage:
-                metrics['memory'] = memory_usage
-            
-            interface_stats = self.get_interface_stats(host, 1, community, port)
-            if interface_stats:
-                metrics['interface'] = interface_stats
-            
-            return metrics
-            
-        except Exception as e:
-            print(f"Error getting all metrics from {host}: {e}")
+        """All scalar metrics for a device in one GET round trip"""
+        values = self.engine.get_sync(host, self._all_metric_oids(), community, port)
+        if values is None:
             return None
+        return self._parse_all_metrics(host, values)
     
-    def walk_oid(self, host, oid, community='public', port=161, max_results=10):
-       
-        try:
-            results = []
-            
-            for (errorIndication,
-                 errorStatus,
-                 errorIndex,
-                 varBinds) in nextCmd(SnmpEngine(),
-                                     CommunityData(community),
-                                     UdpTransportTarget((host, port)),
-                                     ContextData(),
-                                     ObjectType(ObjectIdentity(oid)),
-                                     lexicographicMode=False,
-                                     maxRows=max_results):
-                
-                if errorIndication or errorStatus:
-                    break
-                
-                for varBind in varBinds:
-                    results.append({
-                        'oid': str(varBind[0]),
-                        'value': str(varBind[1])
-                    })
-            
-            return results
-            
-        except Exception as e:
-            print(f"SNMP Walk error on {host}: {e}")
+    async def get_all_metrics_async(self, host, community='public', port=161):
+        """get_all_metrics as a coroutine for the engine loop, see SNMPPollingEngine.submit"""
+        values = await self.engine.get(host, self._all_metric_oids(), community, port)
+        if values is None:
+            return None
+        return self._parse_all_metrics(host, values)
+    
+    def poll_fleet(self, hosts, community='public', port=161, deadline=None):
+        """
+        Poll all scalar metrics from many hosts concurrently.
+        
+        `hosts` is a list of host strings or dicts with host/community/port.
+        Returns {host: metrics or None}.
+        """
+        oids = self._all_metric_oids()
+        requests = []
+        for host in hosts:
+            req = dict(host) if isinstance(host, dict) else {'host': host}
+            req.setdefault('community', community)
+            req.setdefault('port', port)
+            req['oids'] = oids
+            requests.append(req)
+        
+        results = self.engine.get_many_sync(requests, deadline)
+        
+        return {
+            host: self._parse_all_metrics(host, values) if values is not None else None
+            for host, values in results.items()
+        }
+    
+    def walk_oid(self, host, oid, community='public', port=161, max_results=10, max_repetitions=None):
+        """Walk a subtree with GETBULK, up to max_results rows"""
+        table = self.engine.walk_sync(host, [oid], community, port, max_repetitions, max_results)
+        if table is None:
+            return None
+        
+        return [
+            {'oid': row_oid, 'value': str(value)}
+            for row_oid, value in table[oid]
+        ]
+    
+    def get_interface_table(self, host, community='public', port=161, max_repetitions=None):
+        """
+        Fetch the whole ifTable/ifXTable for a device.
+        
+        All four columns are walked together with GETBULK and returned
+        columnar, one list per column aligned on the interface index.
+        """
+        columns = self.INTERFACE_TABLE_COLUMNS
+        table = self.engine.walk_sync(host, list(columns.values()), community, port, max_repetitions)
+        if table is None:
             return None
+        
+        by_column = {}
+        indexes = set()
+        for name, root in columns.items():
+            prefix_len = len(root) + 1
+            values = {}
+            for row_oid, value in table[root]:
+                index = int(row_oid[prefix_len:].split('.')[0])
+                values[index] = value
+            by_column[name] = values
+            indexes.update(values)
+        
+        indexes = sorted(indexes)
+        status_values = by_column['oper_status']
+        
+        return {
+            'host': host,
+            'interface_count': len(indexes),
+            'interfaces': {
+                'index': indexes,
+                'descr': [by_column['descr'].get(i) for i in indexes],
+                'oper_status': [
+                    self.IF_STATUS_MAP.get(status_values[i], 'unknown') if i in status_values else None
+                    for i in indexes
+                ],
+                'hc_in_octets': [by_column['hc_in_octets'].get(i) for i in indexes],
+                'hc_out_octets': [by_column['hc_out_octets'].get(i) for i in indexes]
+            },
+            'timestamp': datetime.now().isoformat()
+        }
 
 
 if __name__ == '__main__':
@@ -0,0 +1,155 @@
+"""Vectorized great-circle distances and spatial queries over office locations"""
+from api.services.inventory_service import inventory
+from config import Config
+import numpy as np
+import threading
+import math
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    """Great-circle distance in km; degrees in, any broadcastable shapes"""
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(v, dtype=np.float64)) for v in (lat1, lon1, lat2, lon2))
+    a = (np.sin((lat2 - lat1) / 2) ** 2
+         + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+def point_distance(lat1, lon1, lat2, lon2):
+    """haversine() for a single pair, in plain floats; NumPy's per-call overhead dominates at this size"""
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = (math.sin((lat2 - lat1) / 2) ** 2
+         + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(max(a, 0.0), 1.0)))
+
+
+def distance_matrix(lats, lons):
+    """NxN distances in km between every pair of points"""
+    lats = np.asarray(lats, dtype=np.float64)
+    lons = np.asarray(lons, dtype=np.float64)
+    return haversine(lats[:, None], lons[:, None], lats[None, :], lons[None, :])
+
+
+class SpatialState:
+    """Office coordinates as arrays plus a lat/lon grid, for one inventory version"""
+
+    def __init__(self, version, office_records, cell_degrees):
+        self.version = version
+        self.office_ids = [o['id'] for o in office_records]
+        self.office_index = {office_id: i for i, office_id in enumerate(self.office_ids)}
+        self.lats = np.array([o['latitude'] for o in office_records], dtype=np.float64)
+        self.lons = np.array([o['longitude'] for o in office_records], dtype=np.float64)
+
+        self.cell = cell_degrees
+        self.lon_cells = int(math.ceil(360 / cell_degrees))
+        grid = {}
+        for i, cell in enumerate(zip(self._row(self.lats), self._col(self.lons))):
+            grid.setdefault(cell, []).append(i)
+        self.grid = {cell: np.array(rows, dtype=np.int64) for cell, rows in grid.items()}
+        self._matrix = None
+
+    def _row(self, lats):
+        return np.floor((np.asarray(lats) + 90) / self.cell).astype(int).tolist()
+
+    def _col(self, lons):
+        return (np.floor((np.asarray(lons) + 180) / self.cell).astype(int) % self.lon_cells).tolist()
+
+    def matrix(self):
+        # built once per inventory version, shared by every caller
+        if self._matrix is None:
+            self._matrix = distance_matrix(self.lats, self.lons)
+        return self._matrix
+
+    def candidates(self, lat, lon, radius_km):
+        """Offices in grid cells that could lie within radius_km of the point"""
+        dlat = radius_km / KM_PER_DEGREE
+        lat_lo, lat_hi = max(-90.0, lat - dlat), min(90.0, lat + dlat)
+        widest = max(abs(lat_lo), abs(lat_hi))
+        if widest >= 89.9:
+            return np.arange(len(self.office_ids))
+        dlon = dlat / math.cos(math.radians(widest))
+        if dlon >= 180:
+            return np.arange(len(self.office_ids))
+
+        row_lo, row_hi = self._row([lat_lo, lat_hi])
+        col_lo = self._col([lon - dlon])[0]
+        span = int(math.ceil(2 * dlon / self.cell)) + 1
+        cols = {(col_lo + step) % self.lon_cells for step in range(min(span, self.lon_cells))}
+
+        found = [self.grid[(row, col)] for row in range(row_lo, row_hi + 1) for col in cols
+                 if (row, col) in self.grid]
+        return np.concatenate(found) if found else np.empty(0, dtype=np.int64)
+
+
+class SpatialIndex:
+    """
+    Distance queries over office coordinates.
+
+    The index is rebuilt lazily when the inventory version changes.
+    Nearest-neighbour queries are one vectorized pass and an
+    argpartition, and radius queries only measure offices in the grid
+    cells the circle can reach.
+    """
+
+    def __init__(self, inventory_store=None, cell_degrees=None):
+        self.inventory = inventory_store or inventory
+        self.cell_degrees = cell_degrees or Config.SPATIAL_CELL_DEGREES
+        self._state = None
+        self._lock = threading.Lock()
+
+    def state(self):
+        version = self.inventory.get_version()
+        state = self._state
+        if state is None or state.version != version:
+            with self._lock:
+                state = self._state
+                if state is None or state.version != version:
+                    state = self._state = SpatialState(
+                        version, self.inventory.get_office_records(), self.cell_degrees
+                    )
+        return state
+
+    def location(self, office_id):
+        """(lat, lon) of an office, or None"""
+        state = self.state()
+        row = state.office_index.get(office_id)
+        if row is None:
+            return None
+        return float(state.lats[row]), float(state.lons[row])
+
+    def matrix(self, office_ids=None):
+        """(ids, NxN km array) for all offices or the given subset, unknown ids skipped"""
+        state = self.state()
+        if office_ids is None:
+            return state.office_ids, state.matrix()
+        rows = [state.office_index[o] for o in office_ids if o in state.office_index]
+        ids = [state.office_ids[row] for row in rows]
+        return ids, state.matrix()[np.ix_(rows, rows)]
+
+    def nearest(self, lat, lon, k=5, exclude=None):
+        """Up to k (office_id, km) pairs, closest first"""
+        state = self.state()
+        distances = haversine(lat, lon, state.lats, state.lons)
+        if exclude is not None and exclude in state.office_index:
+            distances[state.office_index[exclude]] = np.inf
+        k = min(k, int(np.isfinite(distances).sum()))
+        if k <= 0:
+            return []
+        rows = np.argpartition(distances, k - 1)[:k]
+        rows = rows[np.argsort(distances[rows])]
+        return [(state.office_ids[row], float(distances[row])) for row in rows]
+
+    def within(self, lat, lon, radius_km):
+        """(office_id, km) pairs inside the radius, closest first"""
+        state = self.state()
+        rows = state.candidates(lat, lon, radius_km)
+        distances = haversine(lat, lon, state.lats[rows], state.lons[rows])
+        keep = distances <= radius_km
+        rows, distances = rows[keep], distances[keep]
+        order = np.argsort(distances)
+        return [(state.office_ids[rows[i]], float(distances[i])) for i in order]
+
+
+spatial_index = SpatialIndex()
@@ -0,0 +1,220 @@
+"""Server-Sent Events fan-out for live dashboard updates"""
+from api.json_provider import dumps
+from datetime import datetime
+from config import Config
+import threading
+import queue
+import time
+
+
+def format_event(event, data, event_id=None):
+    """One SSE frame, serialized once and shared by every subscriber"""
+    lines = []
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    lines.append(f'event: {event}')
+    for line in dumps(data).splitlines():
+        lines.append(f'data: {line}')
+    return '\n'.join(lines) + '\n\n'
+
+
+def summary_delta(previous, current):
+    """Top-level summary sections that changed, ignoring the timestamp"""
+    if previous is None:
+        return dict(current)
+    delta = {
+        key: value for key, value in current.items()
+        if key != 'timestamp' and previous.get(key) != value
+    }
+    if delta:
+        delta['timestamp'] = current.get('timestamp')
+    return delta
+
+
+class Subscriber:
+    """One connected client and its bounded outbound queue"""
+
+    def __init__(self, max_queue):
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.evicted = False
+        self.connected_at = time.time()
+
+
+class EventBroadcaster:
+    """
+    Computes live updates once and fans them out to every SSE client.
+
+    A single publisher thread recomputes the global summary on a timer and
+    sends only the sections that changed; alert transitions and device
+    status changes are pushed from the engine and store listeners as they
+    happen. Each event is encoded once. Clients get a bounded queue; one
+    that falls a whole queue behind is evicted rather than allowed to
+    hold memory or slow the others down, and its browser reconnects.
+    """
+
+    def __init__(self, summary_fn=None, interval=None, max_queue=None, heartbeat=None):
+        self.summary_fn = summary_fn
+        self.interval = interval or Config.STREAM_SUMMARY_INTERVAL
+        self.max_queue = max_queue or Config.STREAM_QUEUE_SIZE
+        self.heartbeat = heartbeat or Config.STREAM_HEARTBEAT
+
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+        self._wakeup = threading.Event()
+        self._seq = 0
+        self._summary = None
+
+        self.events_published = 0
+        self.clients_evicted = 0
+
+    # Subscribers
+
+    def subscribe(self):
+        subscriber = Subscriber(self.max_queue)
+        with self._lock:
+            self._subscribers.add(subscriber)
+            snapshot = self._summary
+        self._ensure_running()
+
+        if snapshot is not None:
+            subscriber.queue.put_nowait(format_event('summary', snapshot, self._seq))
+        else:
+            # first client, have the publisher compute straight away
+            self._wakeup.set()
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def events(self, subscriber):
+        """Generator of SSE frames for one client, ends when it is evicted"""
+        yield f'retry: {Config.STREAM_RETRY_MS}\n\n'
+        try:
+            while not subscriber.evicted:
+                try:
+                    frame = subscriber.queue.get(timeout=self.heartbeat)
+                except queue.Empty:
+                    # comment line keeps proxies from closing an idle connection
+                    yield ': keepalive\n\n'
+                    continue
+                if frame is None:
+                    break
+                yield frame
+        finally:
+            self.unsubscribe(subscriber)
+
+    # Publishing
+
+    def publish(self, event, data):
+        with self._lock:
+            if not self._subscribers:
+                return
+            self._seq += 1
+            frame = format_event(event, data, self._seq)
+            subscribers = list(self._subscribers)
+        self.events_published += 1
+
+        for subscriber in subscribers:
+            try:
+                subscriber.queue.put_nowait(frame)
+            except queue.Full:
+                self._evict(subscriber)
+
+    def _evict(self, subscriber):
+        with self._lock:
+            if subscriber not in self._subscribers:
+                return
+            self._subscribers.discard(subscriber)
+        subscriber.evicted = True
+        self.clients_evicted += 1
+        # make room for the wake-up so a blocked generator notices right away
+        try:
+            subscriber.queue.get_nowait()
+        except queue.Empty:
+            pass
+        try:
+            subscriber.queue.put_nowait(None)
+        except queue.Full:
+            pass
+
+    def on_alert(self, alert):
+        """AlertEngine listener"""
+        self.publish('alert', alert)
+
+    def on_sample(self, device_id, sample, previous=None):
+        """LatestMetricsStore listener, only status changes are forwarded"""
+        status = sample.get('status')
+        previous_status = previous.get('status') if previous else None
+        # a device's first sample only counts as a change if it comes in offline
+        if status == (previous_status or 'online'):
+            return
+        self.publish('device', {
+            'device_id': device_id,
+            'status': status,
+            'previous_status': previous_status,
+            'timestamp': sample.get('timestamp') or datetime.now().isoformat()
+        })
+
+    # Summary publisher
+
+    def _ensure_running(self):
+        if self._thread and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='stream-publisher', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def _compute_summary(self):
+        if self.summary_fn is None:
+            from api.services.analytics_service import AnalyticsService
+            self.summary_fn = AnalyticsService().get_global_summary
+        return self.summary_fn()
+
+    def _run(self):
+        while not self._stop.is_set():
+            with self._lock:
+                has_subscribers = bool(self._subscribers)
+
+            if has_subscribers:
+                try:
+                    summary = self._compute_summary()
+                    delta = summary_delta(self._summary, summary)
+                    self._summary = summary
+                    if delta:
+                        self.publish('summary', delta)
+                except Exception as e:
+                    print(f"❌ Stream summary error: {e}")
+            else:
+                # nobody listening, drop the snapshot so the next client gets a fresh one
+                self._summary = None
+
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+
+    def stats(self):
+        with self._lock:
+            depths = [s.queue.qsize() for s in self._subscribers]
+        return {
+            'subscribers': len(depths),
+            'max_queue_depth': max(depths) if depths else 0,
+            'queue_size': self.max_queue,
+            'events_published': self.events_published,
+            'clients_evicted': self.clients_evicted,
+            'summary_interval_seconds': self.interval
+        }
+
+
+broadcaster = EventBroadcaster()
+
@@ -0,0 +1,110 @@
+"""Stale-while-revalidate cache for slow upstream lookups"""
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
+from config import Config
+import threading
+import time
+
+
+class StaleWhileRevalidate:
+    """
+    Keeps the last good value per key and refreshes it in the background.
+
+    Within `ttl` a value is served as is. Between `ttl` and `max_stale`
+    it is still served straight away, and one background refresh per key
+    is started. Only a missing or too-old value makes the caller wait on
+    the loader; if that load fails, any value younger than `max_stale`
+    is returned instead of the error. At most `max_entries` keys are kept,
+    least recently used first out.
+    """
+
+    def __init__(self, ttl, max_stale, workers=None, max_entries=None):
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.max_entries = max_entries or Config.SWR_MAX_ENTRIES
+        self._entries = OrderedDict()
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers or Config.SWR_REFRESH_WORKERS, thread_name_prefix='swr-refresh'
+        )
+
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refresh_errors = 0
+        self.evictions = 0
+
+    def get(self, key, loader):
+        """Value for key, loading it with loader() when needed; loader raises on failure"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+
+        if entry is not None:
+            value, fetched_at = entry
+            age = now - fetched_at
+            if age < self.ttl:
+                self.hits += 1
+                return value
+            if age < self.max_stale:
+                self.stale_hits += 1
+                self._refresh(key, loader)
+                return value
+
+        self.misses += 1
+        try:
+            return self._load(key, loader)
+        except Exception:
+            if entry is not None and now - entry[1] < self.max_stale:
+                return entry[0]
+            raise
+
+    def peek(self, key):
+        """(value, fetched_at) or None, without loading"""
+        with self._lock:
+            return self._entries.get(key)
+
+    def _load(self, key, loader):
+        value = loader()
+        with self._lock:
+            self._entries[key] = (value, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return value
+
+    def _refresh(self, key, loader):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def run():
+            try:
+                self._load(key, loader)
+            except Exception as e:
+                self.refresh_errors += 1
+                print(f"⚠️ Background refresh failed for {key}: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        self._executor.submit(run)
+
+    def stats(self):
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'evictions': self.evictions,
+            'hits': self.hits,
+            'stale_hits': self.stale_hits,
+            'misses': self.misses,
+            'hit_ratio': round((self.hits + self.stale_hits) / lookups, 4) if lookups else 0,
+            'refreshing': len(self._refreshing),
+            'refresh_errors': self.refresh_errors
+        }
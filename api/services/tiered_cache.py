@@ -0,0 +1,224 @@
+"""Two-tier key-value cache: in-process LRU in front of SQLite on disk"""
+from api.services.history_store import resolve_path
+from collections import OrderedDict
+from config import Config
+import threading
+import sqlite3
+import json
+import time
+import os
+
+
+class DiskStore:
+    """
+    Cache entries shared by every worker process through one SQLite file.
+
+    Each write is a single INSERT OR REPLACE, so readers in other
+    processes see either the old or the new value, never a partial one.
+    WAL mode lets them keep reading while a write commits. The file is
+    kept under `max_bytes` by dropping expired rows first, then the
+    least recently written.
+    """
+
+    PRUNE_EVERY = 64  # writes between size checks
+
+    def __init__(self, db_path=None, max_bytes=None):
+        self.db_path = resolve_path(db_path or Config.CACHE_DB_PATH)
+        self.max_bytes = max_bytes or Config.CACHE_DISK_MAX_BYTES
+        self._local = threading.local()
+        self._writes = 0
+        self.evictions = 0
+
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        self._init_schema()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    def _init_schema(self):
+        conn = self._connect()
+        with conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS cache_entries (
+                    namespace TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    written REAL NOT NULL,
+                    expires REAL NOT NULL,
+                    PRIMARY KEY (namespace, key)
+                ) WITHOUT ROWID
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_cache_entries_written ON cache_entries (written)')
+        conn.close()
+
+    def get(self, namespace, key, now=None):
+        """(value, expires) or None when missing or expired"""
+        row = self._conn().execute(
+            'SELECT value, expires FROM cache_entries WHERE namespace = ? AND key = ? AND expires > ?',
+            (namespace, key, now or time.time())
+        ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), row[1]
+
+    def set(self, namespace, key, value, expires):
+        encoded = json.dumps(value)
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO cache_entries VALUES (?, ?, ?, ?, ?, ?)',
+                (namespace, key, encoded, len(encoded), time.time(), expires)
+            )
+        self._writes += 1
+        if self._writes % self.PRUNE_EVERY == 0:
+            self.prune()
+
+    def delete(self, namespace, key):
+        conn = self._conn()
+        with conn:
+            conn.execute('DELETE FROM cache_entries WHERE namespace = ? AND key = ?', (namespace, key))
+
+    def clear(self, namespace=None):
+        conn = self._conn()
+        with conn:
+            if namespace is None:
+                cur = conn.execute('DELETE FROM cache_entries')
+            else:
+                cur = conn.execute('DELETE FROM cache_entries WHERE namespace = ?', (namespace,))
+        return cur.rowcount
+
+    def prune(self):
+        """Drop expired rows, then the oldest writes until under max_bytes"""
+        conn = self._conn()
+        with conn:
+            expired = conn.execute('DELETE FROM cache_entries WHERE expires <= ?', (time.time(),)).rowcount
+            total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM cache_entries').fetchone()[0]
+            evicted = 0
+            if total > self.max_bytes:
+                excess = total - self.max_bytes
+                freed = 0
+                doomed = []
+                for namespace, key, size in conn.execute(
+                        'SELECT namespace, key, size FROM cache_entries ORDER BY written'):
+                    if freed >= excess:
+                        break
+                    doomed.append((namespace, key))
+                    freed += size
+                conn.executemany('DELETE FROM cache_entries WHERE namespace = ? AND key = ?', doomed)
+                evicted = len(doomed)
+        self.evictions += expired + evicted
+        return expired + evicted
+
+    def stats(self):
+        count, size = self._conn().execute(
+            'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache_entries'
+        ).fetchone()
+        return {
+            'path': self.db_path,
+            'entries': count,
+            'bytes': size,
+            'max_bytes': self.max_bytes,
+            'evictions': self.evictions
+        }
+
+
+class TieredCache:
+    """
+    Namespaced cache with per-namespace TTLs.
+
+    Lookups try the in-process LRU first and fall back to the shared
+    DiskStore; a disk hit is copied into memory with its original expiry,
+    so every worker expires an entry at the same moment. Values must be
+    JSON-serialisable. A clear or delete from another process reaches
+    this process's memory tier only once those entries expire.
+    """
+
+    def __init__(self, disk=None, max_entries=None, ttls=None):
+        self.disk = disk if disk is not None else DiskStore()
+        self.max_entries = max_entries or Config.CACHE_MEMORY_ENTRIES
+        self.ttls = Config.CACHE_NAMESPACE_TTLS if ttls is None else ttls
+
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def ttl(self, namespace):
+        return self.ttls.get(namespace, Config.CACHE_TTL)
+
+    def get(self, namespace, key):
+        """Cached value or None"""
+        now = time.time()
+        mem_key = (namespace, key)
+
+        with self._lock:
+            entry = self._memory.get(mem_key)
+            if entry is not None:
+                if entry[1] > now:
+                    self._memory.move_to_end(mem_key)
+                    self.memory_hits += 1
+                    return entry[0]
+                del self._memory[mem_key]
+
+        found = self.disk.get(namespace, key, now)
+        if found is None:
+            self.misses += 1
+            return None
+
+        self.disk_hits += 1
+        self._remember(mem_key, *found)
+        return found[0]
+
+    def set(self, namespace, key, value, ttl=None):
+        expires = time.time() + (self.ttl(namespace) if ttl is None else ttl)
+        self.disk.set(namespace, key, value, expires)
+        self._remember((namespace, key), value, expires)
+
+    def delete(self, namespace, key):
+        with self._lock:
+            self._memory.pop((namespace, key), None)
+        self.disk.delete(namespace, key)
+
+    def clear(self, namespace=None):
+        """Empty one namespace or everything; returns rows removed from disk"""
+        with self._lock:
+            if namespace is None:
+                self._memory.clear()
+            else:
+                for mem_key in [k for k in self._memory if k[0] == namespace]:
+                    del self._memory[mem_key]
+        return self.disk.clear(namespace)
+
+    def _remember(self, mem_key, value, expires):
+        with self._lock:
+            self._memory[mem_key] = (value, expires)
+            self._memory.move_to_end(mem_key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def stats(self):
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            'memory_entries': len(self._memory),
+            'max_memory_entries': self.max_entries,
+            'memory_hits': self.memory_hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'hit_ratio': round((self.memory_hits + self.disk_hits) / lookups, 4) if lookups else 0,
+            'disk': self.disk.stats()
+        }
+
+
+cache = TieredCache()
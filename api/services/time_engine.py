@@ -0,0 +1,152 @@
+"""Local timezone engine over precomputed pytz transition tables"""
+from api.services.inventory_service import inventory
+from datetime import datetime, timedelta, timezone as dt_timezone
+import numpy as np
+import threading
+import pytz
+import time
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def format_offset(seconds):
+    """+03:00 style, as worldtimeapi reports it"""
+    sign = '-' if seconds < 0 else '+'
+    minutes = abs(int(seconds)) // 60
+    return f'{sign}{minutes // 60:02d}:{minutes % 60:02d}'
+
+
+class ZoneTable:
+    """
+    One zone's UTC offset history as sorted arrays.
+
+    Finding the offset for an instant is a binary search over the
+    transition times, for a single timestamp or a whole array at once.
+    pytz tables stop at 2037; later instants keep the last rule.
+    """
+
+    __slots__ = ('name', 'tz', 'transitions', 'offsets', 'dst', 'abbreviations')
+
+    def __init__(self, name):
+        self.name = name
+        self.tz = pytz.timezone(name)
+        times = getattr(self.tz, '_utc_transition_times', None)
+        if times:
+            info = self.tz._transition_info
+            self.transitions = np.array([(t - EPOCH).total_seconds() for t in times])
+            self.offsets = np.array([i[0].total_seconds() for i in info], dtype=np.int64)
+            self.dst = np.array([bool(i[1]) for i in info])
+            self.abbreviations = [i[2] for i in info]
+        else:
+            # fixed-offset zones such as UTC or Etc/GMT+3
+            probe = datetime(2000, 1, 1)
+            self.transitions = np.array([-np.inf])
+            self.offsets = np.array([int(self.tz.utcoffset(probe).total_seconds())], dtype=np.int64)
+            self.dst = np.array([False])
+            self.abbreviations = [self.tz.tzname(probe)]
+
+    def index(self, ts):
+        """Row of the rule in force at ts (scalar or array of epoch seconds)"""
+        return np.searchsorted(self.transitions, ts, side='right') - 1
+
+    def offset_at(self, ts):
+        return int(self.offsets[max(0, int(self.index(ts)))])
+
+    def offsets_at(self, ts):
+        return self.offsets[np.maximum(self.index(np.asarray(ts, dtype=np.float64)), 0)]
+
+    def describe(self, ts):
+        """Local time fields at epoch seconds ts, in the worldtimeapi shape"""
+        row = max(0, int(self.index(ts)))
+        offset = int(self.offsets[row])
+        local = datetime.fromtimestamp(ts, dt_timezone(timedelta(seconds=offset)))
+        return {
+            'timezone': self.name,
+            'datetime': local.isoformat(),
+            'utc_offset': format_offset(offset),
+            'abbreviation': self.abbreviations[row],
+            'dst': bool(self.dst[row]),
+            'day_of_week': local.isoweekday() % 7,
+            'day_of_year': local.timetuple().tm_yday,
+            'week_number': local.isocalendar()[1]
+        }
+
+
+class TimeEngine:
+    """
+    Office local times without any network calls.
+
+    Zone tables are built once per zone name and shared. The office to
+    zone mapping is rebuilt lazily after each inventory reload, so a new
+    office's timezone is resolved ahead of its first lookup.
+    """
+
+    def __init__(self, inventory_store=None):
+        self.inventory = inventory_store or inventory
+        self._zones = {}
+        self._offices = {}
+        self._version = None
+        self._lock = threading.Lock()
+
+    def zone(self, name):
+        """ZoneTable for a tz name; raises pytz.UnknownTimeZoneError"""
+        table = self._zones.get(name)
+        if table is None:
+            table = ZoneTable(name)
+            with self._lock:
+                self._zones[name] = table
+        return table
+
+    def _office_zones(self):
+        version = self.inventory.get_version()
+        if version != self._version:
+            offices = {}
+            for record in self.inventory.get_office_records():
+                try:
+                    offices[record['id']] = self.zone(record.get('timezone') or 'UTC')
+                except pytz.UnknownTimeZoneError:
+                    print(f"⚠️ Unknown timezone {record.get('timezone')} for office {record['id']}")
+            self._offices, self._version = offices, version
+        return self._offices
+
+    def warm(self):
+        """Build every office's table now instead of on the first request"""
+        return len(self._office_zones())
+
+    def office_zone(self, office_id):
+        return self._office_zones().get(office_id)
+
+    def local_time(self, name, ts=None):
+        return self.zone(name).describe(time.time() if ts is None else ts)
+
+    def office_times(self, office_ids, ts=None):
+        """{office_id: local time fields}, one clock read for the whole batch"""
+        ts = time.time() if ts is None else ts
+        zones = self._office_zones()
+        return {office_id: zones[office_id].describe(ts) for office_id in office_ids if office_id in zones}
+
+    def convert(self, times, from_tz, to_tz):
+        """
+        ISO timestamps shifted into to_tz.
+
+        Naive inputs are read as from_tz local time. The target offsets
+        for the whole batch come from one vectorized lookup.
+        """
+        source = self.zone(from_tz).tz
+        target = self.zone(to_tz)
+
+        instants = []
+        for value in times:
+            dt = datetime.fromisoformat(value.replace('Z', '+00:00'))
+            if dt.tzinfo is None:
+                dt = source.localize(dt)
+            instants.append(dt.timestamp())
+
+        offsets = target.offsets_at(instants)
+        return [
+            datetime.fromtimestamp(ts, dt_timezone(timedelta(seconds=int(offset)))).isoformat()
+            for ts, offset in zip(instants, offsets)
+        ]
+
+
+time_engine = TimeEngine()
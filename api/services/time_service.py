@@ -1,81 +1,80 @@
 import requests
-from datetime import datetime
+from api.services.http_gateway import gateway
+from api.services.swr_cache import StaleWhileRevalidate
+from api.services.time_engine import time_engine
+from config import Config
 import pytz
 
 class TimeService:
-    
+
     BASE_URL = 'http://worldtimeapi.org/api'
     
-    def get_timezone_time(self, timezone):
+    def __init__(self, http=None, engine=None):
+        self.http = http or gateway
+        self.engine = engine or time_engine
+        # remote offsets are only used to cross-check the local tables
+        self.swr = StaleWhileRevalidate(Config.TIME_CACHE_TTL, Config.TIME_MAX_STALE)
+    
+    def get_timezone_time(self, timezone, verify=False):
         try:
-            url = f'{self.BASE_URL}/timezone/{timezone}'
-            response = requests.get(url, timeout=5)
-            response.raise_for_status()
-            
-            data = response.json()
-            
-            return {
-                'timezone': timezone,
-                'datetime': data['datetime'],
-                'utc_offset': data['utc_offset'],
-                'day_of_week': data['day_of_week'],
-                'day_of_year': data['day_of_year'],
-                'week_number': data['week_number']
-            }
-            
+            time_info = self.engine.local_time(timezone)
+        except pytz.UnknownTimeZoneError:
+            return None
+        
+        if verify:
+            time_info['remote_check'] = self.check_remote(timezone, time_info['utc_offset'])
+        
+        return time_info
+    
+    def get_office_times(self, office_ids):
+        return self.engine.office_times(office_ids)
+    
+    def check_remote(self, timezone, utc_offset):
+        """Compare our offset with worldtimeapi's; never raises"""
+        try:
+            data = self.swr.get(('timezone', timezone), lambda: self._fetch_timezone(timezone))
         except requests.exceptions.RequestException as e:
             print(f'Time API error: {e}')
-            return self._get_local_timezone_time(timezone)
+            return {'available': False}
+        
+        return {
+            'available': True,
+            'utc_offset': data['utc_offset'],
+            'match': data['utc_offset'] == utc_offset
+        }
     
-    def _get_local_timezone_time(self, timezone):
-        try:
-            tz = pytz.timezone(timezone)
-            now = datetime.now(tz)
-            
-            return {
-                'timezone': timezone,
-                'datetime': now.isoformat(),
-                'utc_offset': now.strftime('%z'),
-                'day_of_week': now.weekday(),
-                'source': 'local'
-            }
-        except:
-            return None
+    def _fetch_timezone(self, timezone):
+        url = f'{self.BASE_URL}/timezone/{timezone}'
+        data = self.http.get_json('worldtimeapi', url)
+        return {'utc_offset': data['utc_offset']}
     
     def get_all_timezones(self):
-        try:
-            url = f'{self.BASE_URL}/timezone'
-            response = requests.get(url, timeout=5)
-            response.raise_for_status()
-            
-            return response.json()
-            
-        except requests.exceptions.RequestException:
-            return pytz.all_timezones
+        return list(pytz.all_timezones)
     
     def convert_time(self, time_str, from_tz, to_tz):
+        converted = self.convert_times([time_str], from_tz, to_tz)
+        if converted is None:
+            return None
+        
+        return {
+            'original': {
+                'time': time_str,
+                'timezone': from_tz
+            },
+            'converted': {
+                'time': converted['times'][0],
+                'timezone': to_tz
+            }
+        }
+    
+    def convert_times(self, times, from_tz, to_tz):
         try:
-            from_timezone = pytz.timezone(from_tz)
-            to_timezone = pytz.timezone(to_tz)
-            
-            dt = datetime.fromisoformat(time_str.replace('Z', '+00:00'))
-            
-            if dt.tzinfo is None:
-                dt = from_timezone.localize(dt)
-            
-            converted = dt.astimezone(to_timezone)
-            
             return {
-                'original': {
-                    'time': time_str,
-                    'timezone': from_tz
-                },
-                'converted': {
-                    'time': converted.isoformat(),
-                    'timezone': to_tz
-                }
+                'from': from_tz,
+                'to': to_tz,
+                'times': self.engine.convert(times, from_tz, to_tz)
             }
-            
+        
         except Exception as e:
             print(f'Time conversion error: {e}')
-            return None
\ No newline at end of file
+            return None
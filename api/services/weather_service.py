@@ -1,74 +1,65 @@
 import requests
+from api.services.http_gateway import gateway
+from api.services.swr_cache import StaleWhileRevalidate
+from api.services.tiered_cache import cache
 from config import Config
 from datetime import datetime, timedelta
-import json
-import os
 
 class WeatherService:
     
     BASE_URL = 'https://api.openweathermap.org/data/2.5'
-    CACHE_DIR = 'data/cache/weather'
-    CACHE_TTL = 1800  # 30min
+    CACHE_NAMESPACE = 'weather'
     
-    def __init__(self, api_key=None):
+    def __init__(self, api_key=None, http=None, store=None):
         self.api_key = api_key or Config.OPENWEATHER_API_KEY
-        os.makedirs(self.CACHE_DIR, exist_ok=True)
-    
-    def _get_cache_path(self, lat, lon):
-        return os.path.join(self.CACHE_DIR, f'{lat}_{lon}.json')
-    
-    def _is_cache_valid(self, cache_path):
-        if not os.path.exists(cache_path):
-            return False
-        
-        mod_time = datetime.fromtimestamp(os.path.getmtime(cache_path))
-        return (datetime.now() - mod_time).seconds < self.CACHE_TTL
+        self.http = http or gateway
+        self.cache = store or cache
+        # last good reading per location, served while a refresh runs or the API is down
+        self.swr = StaleWhileRevalidate(self.cache.ttl(self.CACHE_NAMESPACE), Config.WEATHER_MAX_STALE)
     
     def get_weather(self, latitude, longitude):
-        cache_path = self._get_cache_path(latitude, longitude)
-        
-        if self._is_cache_valid(cache_path):
-            with open(cache_path, 'r') as f:
-                return json.load(f)
-        
         if not self.api_key:
             return self._get_mock_weather(latitude, longitude)
         
         try:
-            url = f'{self.BASE_URL}/weather'
-            params = {
-                'lat': latitude,
-                'lon': longitude,
-                'appid': self.api_key,
-                'units': 'metric'  
-            }
-            
-            response = requests.get(url, params=params, timeout=5)
-            response.raise_for_status()
-            
-            data = response.json()
-            
-            weather_data = {
-                'temperature': data['main']['temp'],
-                'feels_like': data['main']['feels_like'],
-                'humidity': data['main']['humidity'],
-                'pressure': data['main']['pressure'],
-                'description': data['weather'][0]['description'],
-                'icon': data['weather'][0]['icon'],
-                'wind_speed': data['wind']['speed'],
-                'clouds': data['clouds']['all'],
-                'timestamp': datetime.now().isoformat()
-            }
-            
-            with open(cache_path, 'w') as f:
-                json.dump(weather_data, f)
-            
-            return weather_data
-            
+            return self.swr.get(('weather', latitude, longitude),
+                                lambda: self._load_weather(latitude, longitude))
         except requests.exceptions.RequestException as e:
             print(f'Weather API error: {e}')
             return self._get_mock_weather(latitude, longitude)
     
+    def _load_weather(self, latitude, longitude):
+        key = f'{latitude},{longitude}'
+        cached = self.cache.get(self.CACHE_NAMESPACE, key)
+        if cached is not None:
+            return cached
+        
+        url = f'{self.BASE_URL}/weather'
+        params = {
+            'lat': latitude,
+            'lon': longitude,
+            'appid': self.api_key,
+            'units': 'metric'  
+        }
+        
+        data = self.http.get_json('openweather', url, params=params)
+        
+        weather_data = {
+            'temperature': data['main']['temp'],
+            'feels_like': data['main']['feels_like'],
+            'humidity': data['main']['humidity'],
+            'pressure': data['main']['pressure'],
+            'description': data['weather'][0]['description'],
+            'icon': data['weather'][0]['icon'],
+            'wind_speed': data['wind']['speed'],
+            'clouds': data['clouds']['all'],
+            'timestamp': datetime.now().isoformat()
+        }
+        
+        self.cache.set(self.CACHE_NAMESPACE, key, weather_data)
+        
+        return weather_data
+    
     def _get_mock_weather(self, latitude, longitude):
         import random
         
@@ -10,7 +10,24 @@ class Config:
     DEBUG = os.getenv('DEBUG', 'True') == 'True'
     
     # Database
-    DATABASE_PATH = 'data/db/undp_ict.db'
+    DATABASE_PATH = os.getenv('DATABASE_PATH', 'data/db/undp_ict.db')
+    
+    # Metrics history
+    HISTORY_ENABLED = os.getenv('HISTORY_ENABLED', 'True') == 'True'
+    HISTORY_RETENTION_DAYS = int(os.getenv('HISTORY_RETENTION_DAYS', 30))
+    HISTORY_BATCH_SIZE = 1000       # rows per transaction
+    HISTORY_FLUSH_INTERVAL = 1.0    # max seconds a sample waits before commit
+    HISTORY_QUEUE_SIZE = 100000     # pending rows before new samples are dropped
+    HISTORY_PRUNE_INTERVAL = 3600   # seconds between retention sweeps
+    
+    # Rollups
+    ROLLUP_GRACE_SECONDS = 60       # wait this long for late samples before closing a bucket
+    ROLLUP_RETENTION_DAYS = {60: 2, 300: 14, 3600: 90, 86400: 1825}
+    TREND_MAX_POINTS = 1000         # finest resolution that stays under this is used
+    
+    # Inventory
+    SEED_DATA_PATH = 'data/seed_data.json'
+    INVENTORY_CHECK_INTERVAL = 1.0  # seconds between mtime checks
     
     # API Key
     OPENWEATHER_API_KEY = os.getenv('OPENWEATHER_API_KEY', '')
@@ -21,9 +38,126 @@ class Config:
     API_PREFIX = f'/api/{API_VERSION}'
     
     # Cache Configuration
-    CACHE_DIR = 'data/cache'
+    CACHE_DIR = os.getenv('CACHE_DIR', 'data/cache')
+    REPORTS_DIR = os.getenv('REPORTS_DIR', 'data/cache/reports')
     CACHE_TTL = 300  # 5分钟
+    CACHE_DB_PATH = os.getenv('CACHE_DB_PATH', 'data/cache/cache.db')   # disk tier shared by all workers
+    CACHE_MEMORY_ENTRIES = 2048             # per-process LRU in front of it
+    CACHE_DISK_MAX_BYTES = 64 * 1024 * 1024
+    CACHE_NAMESPACE_TTLS = {                # seconds; other namespaces use CACHE_TTL
+        'weather': 1800,
+        'ip': 86400,
+        'country': 86400,
+    }
+    
+    # SNMP polling
+    SNMP_COMMUNITY = os.getenv('SNMP_COMMUNITY', 'public')
+    SNMP_PORT = 161
+    SNMP_TIMEOUT = float(os.getenv('SNMP_TIMEOUT', 1.0))  # seconds per attempt
+    SNMP_RETRIES = int(os.getenv('SNMP_RETRIES', 1))
+    SNMP_MAX_CONCURRENCY = int(os.getenv('SNMP_MAX_CONCURRENCY', 256))  # hosts in flight
+    SNMP_MAX_REPETITIONS = int(os.getenv('SNMP_MAX_REPETITIONS', 25))  # rows per GETBULK
     
     # Mock data
     SIMULATE_DEVICES = True  
-    UPDATE_INTERVAL = 60     # 60s
\ No newline at end of file
+    UPDATE_INTERVAL = 60     # 60s
+    
+    # Background poller
+    POLLER_ENABLED = os.getenv('POLLER_ENABLED', 'True') == 'True'
+    POLLER_CONCURRENCY = int(os.getenv('POLLER_CONCURRENCY', 256))  # polls in flight on the SNMP engine
+    POLLER_JITTER = 0.1  # +/- fraction of the interval added on reschedule
+    
+    # Alerting
+    # same thresholds as the device status check; clear is the hysteresis floor
+    ALERT_RULES = [
+        {'name': 'high_cpu', 'metric': 'cpu_usage', 'op': '>', 'threshold': 80, 'clear': 75,
+         'severity': 'warning', 'type': 'High CPU Usage', 'for_samples': 2},
+        {'name': 'high_memory', 'metric': 'memory_usage', 'op': '>', 'threshold': 85, 'clear': 80,
+         'severity': 'warning', 'type': 'Memory Threshold Exceeded', 'for_samples': 2},
+        {'name': 'high_temperature', 'metric': 'temperature', 'op': '>', 'threshold': 60, 'clear': 55,
+         'severity': 'warning', 'type': 'High Temperature', 'for_samples': 2},
+        {'name': 'packet_loss', 'metric': 'packet_loss', 'op': '>', 'threshold': 1, 'clear': 0.5,
+         'severity': 'warning', 'type': 'Packet Loss Detected', 'for_samples': 2},
+        {'name': 'device_offline', 'metric': 'online', 'op': '<', 'threshold': 1,
+         'severity': 'critical', 'type': 'Device Offline'},
+    ]
+    ALERT_FLAP_WINDOW = 600      # seconds; refiring within this reopens the last alert
+    ALERT_HISTORY_SIZE = 10000   # resolved alerts beyond this are dropped, oldest first
+    
+    # Live stream (SSE)
+    STREAM_SUMMARY_INTERVAL = 5   # seconds between shared summary recomputes
+    STREAM_QUEUE_SIZE = 256       # frames buffered per client before it is evicted
+    STREAM_HEARTBEAT = 15         # seconds of silence before a keepalive comment
+    STREAM_RETRY_MS = 5000        # browser reconnect delay after an eviction
+    
+    # Analytics response cache (entries live for CACHE_TTL)
+    ANALYTICS_CACHE_SIZE = 256      # entries before least recently used are evicted
+    ANALYTICS_CACHE_MIN_AGE = 5     # seconds an entry survives new metrics samples
+    
+    # HTTP caching and compression
+    COMPRESS_MIN_SIZE = 1024        # bytes; smaller bodies go out uncompressed
+    GZIP_LEVEL = 6
+    BROTLI_QUALITY = 5              # 0-11, higher is smaller but slower
+    INVENTORY_MAX_AGE = 3600        # Cache-Control max-age for /offices
+    REPORT_MAX_AGE = 86400          # generated reports never change
+    
+    # List endpoints
+    PAGE_MAX_LIMIT = 1000           # largest page a client can ask for with ?limit=
+    STREAM_LIST_THRESHOLD = 1000    # unpaged results bigger than this are streamed
+    STREAM_CHUNK_SIZE = 500         # records encoded per streamed chunk
+    
+    # JSON encoding
+    JSON_BACKEND = os.getenv('JSON_BACKEND', 'auto')   # auto (orjson when installed) or json
+    
+    # Prometheus exporter
+    METRICS_NAMESPACE = 'ict'       # prefix of every exported metric name
+    
+    # Instrumentation
+    PERF_DEBUG_ENABLED = os.getenv('PERF_DEBUG_ENABLED', 'False') == 'True'  # /debug/perf and profiling, opt-in
+    SLOW_REQUEST_MS = float(os.getenv('SLOW_REQUEST_MS', 500))  # requests slower than this are logged
+    SLOW_REQUEST_LOG = os.getenv('SLOW_REQUEST_LOG', 'data/logs/slow_requests.log')   # one JSON object per line
+    SLOW_REQUEST_HISTORY = 100      # most recent slow requests kept for /debug/perf
+    PROFILE_TOP_FUNCTIONS = 40      # rows in a cProfile report
+    
+    # Outbound HTTP gateway, one entry per external provider
+    # concurrency: connections in flight, rate/burst: token bucket (requests per second)
+    EXTERNAL_PROVIDERS = {
+        'openweather': {'concurrency': 8, 'rate': 1.0, 'burst': 10, 'timeout': 5.0},
+        'worldtimeapi': {'concurrency': 4, 'rate': 2.0, 'burst': 5, 'timeout': 5.0},
+        'ip-api': {'concurrency': 4, 'rate': 0.75, 'burst': 5, 'timeout': 5.0},
+        'restcountries': {'concurrency': 4, 'rate': 5.0, 'burst': 10, 'timeout': 5.0},
+        'thenewsapi': {'concurrency': 2, 'rate': 0.5, 'burst': 2, 'timeout': 10.0},
+    }
+    
+    # Circuit breakers (per provider) and stale-while-revalidate
+    CIRCUIT_WINDOW = 60             # seconds of outcomes the error rate is taken over
+    CIRCUIT_MIN_REQUESTS = 5        # calls in the window before the circuit can open
+    CIRCUIT_ERROR_RATE = 0.5        # failure ratio that opens the circuit
+    CIRCUIT_OPEN_SECONDS = 30       # fail fast for this long before a half-open probe
+    SWR_REFRESH_WORKERS = 4         # background refreshes running at once
+    SWR_MAX_ENTRIES = 10000         # keys kept per provider, least recently used evicted
+    WEATHER_MAX_STALE = 21600       # serve cached weather up to 6h old while refreshing
+    TIME_CACHE_TTL = 3600           # remote offset cross-checks are refreshed hourly
+    TIME_MAX_STALE = 86400
+    
+    # Batch endpoints
+    BATCH_MAX_ITEMS = 200           # ids per ?office_ids= / ?ids= list
+    BATCH_MAX_REQUESTS = 50         # sub-requests per POST /batch
+    BATCH_WORKERS = 16              # lookups run at once per pool
+    
+    # Spatial queries
+    SPATIAL_CELL_DEGREES = 5.0      # grid cell size for radius lookups
+    SPATIAL_MAX_K = 50              # largest ?k= for nearest-office queries
+    
+    # Local time engine
+    TIME_CONVERT_MAX = 10000        # timestamps per POST /external/time/convert
+    
+    # Report jobs
+    REPORT_WORKERS = 2              # reports built at once
+    REPORT_QUEUE_SIZE = 100         # waiting jobs before submissions get a 503
+    REPORT_JOB_HISTORY = 500        # finished jobs whose status stays queryable
+    REPORT_STREAM_CHUNK = 64 * 1024 # bytes per chunk when decompressing for a client
+    REPORT_CATALOG_PATH = os.getenv('REPORT_CATALOG_PATH', 'data/db/report_catalog.db')
+    REPORT_RETENTION_DAYS = 90      # reports older than this are deleted
+    REPORT_MAX_COUNT = 10000        # newest reports kept beyond which the oldest go
+    REPORT_PRUNE_INTERVAL = 3600    # seconds between retention sweeps
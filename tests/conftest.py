@@ -0,0 +1,23 @@
+"""
+Runtime files go to a scratch directory during tests.
+
+The service singletons create their databases and logs when they are
+imported, so the paths are set here, before any test module imports
+config.
+"""
+import tempfile
+import shutil
+import os
+
+SCRATCH_DIR = tempfile.mkdtemp(prefix='ict-tests-')
+
+os.environ['CACHE_DIR'] = os.path.join(SCRATCH_DIR, 'cache')
+os.environ['REPORTS_DIR'] = os.path.join(SCRATCH_DIR, 'cache', 'reports')
+os.environ['CACHE_DB_PATH'] = os.path.join(SCRATCH_DIR, 'cache', 'cache.db')
+os.environ['DATABASE_PATH'] = os.path.join(SCRATCH_DIR, 'db', 'undp_ict.db')
+os.environ['REPORT_CATALOG_PATH'] = os.path.join(SCRATCH_DIR, 'db', 'report_catalog.db')
+os.environ['SLOW_REQUEST_LOG'] = os.path.join(SCRATCH_DIR, 'logs', 'slow_requests.log')
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(SCRATCH_DIR, ignore_errors=True)
@@ -0,0 +1,299 @@
+"""
+In-process load generator for the API.
+
+Builds synthetic inventories (1k, 10k and 100k devices by default), feeds
+every device a metrics sample, then drives each endpoint through the
+Flask test client from a pool of threads. No server, network or poller
+is involved, so the numbers measure the app itself.
+
+    python tests/loadgen.py                          # run and print the table
+    python tests/loadgen.py --save                   # also write the baseline
+    python tests/loadgen.py --compare --tolerance 0.25
+    python tests/loadgen.py --sizes 1000 --requests 50 --concurrency 4
+"""
+import sys
+import os
+import json
+import time
+import random
+import argparse
+import platform
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+DEFAULT_SIZES = (1000, 10000, 100000)
+BASELINE_PATH = os.path.join(ROOT, 'tests', 'baselines', 'loadgen.json')
+
+DEVICE_TYPES = ('router', 'switch', 'firewall', 'access_point', 'server')
+STATUSES = ('online',) * 8 + ('warning', 'offline')
+DEVICES_PER_OFFICE = 50
+
+# real seed offices, reused as templates for the synthetic ones
+OFFICE_TEMPLATES = [
+    ('AF', 'Kenya', 'Africa', 'Nairobi', -1.2921, 36.8219, 'Africa/Nairobi'),
+    ('AS', 'Thailand', 'Asia-Pacific', 'Bangkok', 13.7563, 100.5018, 'Asia/Bangkok'),
+    ('EU', 'Turkey', 'Europe-CIS', 'Istanbul', 41.0082, 28.9784, 'Europe/Istanbul'),
+    ('LA', 'Brazil', 'Latin America', 'Brasilia', -15.7939, -47.8828, 'America/Sao_Paulo'),
+    ('AS', 'Fiji', 'Asia-Pacific', 'Suva', -18.1416, 178.4419, 'Pacific/Fiji'),
+]
+
+
+def synthetic_inventory(device_count, seed=0):
+    """{'offices': [...], 'devices': [...]} in the seed_data.json shape"""
+    rng = random.Random(seed)
+    office_count = max(len(OFFICE_TEMPLATES), device_count // DEVICES_PER_OFFICE)
+
+    offices = []
+    for i in range(office_count):
+        code, country, region, city, lat, lon, tz = OFFICE_TEMPLATES[i % len(OFFICE_TEMPLATES)]
+        offices.append({
+            'id': f'CO-{code}-{i:05d}',
+            'name': f'{country} {i}',
+            'country': country,
+            'region': region,
+            'city': city,
+            'latitude': round(max(-89.0, min(89.0, lat + rng.uniform(-5, 5))), 4),
+            'longitude': round((lon + rng.uniform(-5, 5) + 180) % 360 - 180, 4),
+            'timezone': tz,
+            'status': 'active' if rng.random() > 0.02 else 'maintenance'
+        })
+
+    devices = []
+    for i in range(device_count):
+        office = offices[i % office_count]
+        device_type = DEVICE_TYPES[rng.randrange(len(DEVICE_TYPES))]
+        devices.append({
+            'id': f'DEV-{i:06d}',
+            'office_id': office['id'],
+            'name': f"{office['city']}-{device_type}-{i:06d}",
+            'device_type': device_type,
+            'ip_address': f'10.{(i >> 16) & 255}.{(i >> 8) & 255}.{i & 255}',
+            'status': STATUSES[rng.randrange(len(STATUSES))]
+        })
+
+    return {'offices': offices, 'devices': devices}
+
+
+def write_inventory(path, device_count, seed=0):
+    data = synthetic_inventory(device_count, seed)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+    return data
+
+
+def synthetic_sample(rng, status, ts):
+    if status == 'offline':
+        return {'ts': ts, 'status': 'offline'}
+    return {
+        'ts': ts,
+        'status': 'online',
+        'cpu_usage': round(rng.uniform(10, 95), 2),
+        'memory_usage': round(rng.uniform(20, 90), 2),
+        'bandwidth_in': round(rng.uniform(0.5, 10), 2),
+        'bandwidth_out': round(rng.uniform(0.3, 8), 2),
+        'temperature': round(rng.uniform(35, 70), 1),
+        'uptime': rng.randint(100000, 9999999),
+        'packet_loss': round(rng.uniform(0, 2), 2),
+        'latency': round(rng.uniform(1, 80), 2)
+    }
+
+
+# name -> function(rng, inventory data) returning a path
+ENDPOINTS = {
+    'offices': lambda rng, data: '/api/v1/offices',
+    'office_devices': lambda rng, data: f"/api/v1/offices/{rng.choice(data['offices'])['id']}/devices",
+    'devices_page': lambda rng, data: '/api/v1/devices?limit=100',
+    'devices_filtered': lambda rng, data: f'/api/v1/devices?type={rng.choice(DEVICE_TYPES)}&status=online&limit=500',
+    'devices_all': lambda rng, data: '/api/v1/devices',
+    'device': lambda rng, data: f"/api/v1/devices/{rng.choice(data['devices'])['id']}",
+    'device_status': lambda rng, data: f"/api/v1/devices/{rng.choice(data['devices'])['id']}/status",
+    'summary': lambda rng, data: '/api/v1/analytics/summary',
+    'region': lambda rng, data: f"/api/v1/analytics/region/{rng.choice(OFFICE_TEMPLATES)[2]}",
+    'health_score': lambda rng, data: '/api/v1/analytics/health-score',
+    'distribution': lambda rng, data: '/api/v1/analytics/device-distribution',
+    'top_performers': lambda rng, data: '/api/v1/analytics/top-performers?limit=20',
+    'alerts': lambda rng, data: '/api/v1/analytics/alerts?limit=100',
+    'nearest': lambda rng, data: f"/api/v1/external/nearest?office_id={rng.choice(data['offices'])['id']}&k=10",
+    'office_times': lambda rng, data: '/api/v1/external/time?office_ids=' + ','.join(
+        o['id'] for o in rng.sample(data['offices'], 5)),
+    'prometheus': lambda rng, data: '/metrics',
+}
+
+
+def summarize(latencies, errors, wall_seconds):
+    """Throughput and latency percentiles for one endpoint"""
+    values = np.asarray(latencies, dtype=np.float64) * 1000
+    count = len(values)
+    if not count:
+        return {'requests': 0, 'errors': errors, 'rps': 0.0, 'mean_ms': 0.0,
+                'p50_ms': 0.0, 'p95_ms': 0.0, 'p99_ms': 0.0, 'max_ms': 0.0}
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        'requests': count,
+        'errors': errors,
+        'rps': round(count / wall_seconds, 1) if wall_seconds > 0 else 0.0,
+        'mean_ms': round(float(values.mean()), 3),
+        'p50_ms': round(float(p50), 3),
+        'p95_ms': round(float(p95), 3),
+        'p99_ms': round(float(p99), 3),
+        'max_ms': round(float(values.max()), 3)
+    }
+
+
+def run_endpoint(app, make_path, requests, concurrency, seed=0):
+    """
+    Fire requests at one endpoint from `concurrency` threads.
+
+    One unmeasured request goes first so caches and lazy indexes are
+    warm; the body of every response is read in full, streamed or not.
+    """
+    paths = [make_path(random.Random(seed + i)) for i in range(requests + 1)]
+    app.test_client().get(paths[0]).get_data()
+
+    def one(path):
+        client = app.test_client()
+        started = time.perf_counter()
+        response = client.get(path)
+        response.get_data()
+        return time.perf_counter() - started, response.status_code
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        outcomes = list(pool.map(one, paths[1:]))
+    wall = time.perf_counter() - started
+
+    latencies = [seconds for seconds, status in outcomes]
+    errors = sum(1 for seconds, status in outcomes if status >= 400)
+    return summarize(latencies, errors, wall)
+
+
+def compare(baseline, results, tolerance=0.25):
+    """Regressions against a saved baseline: p95 up or throughput down by more than tolerance"""
+    regressions = []
+    for size, endpoints in results.items():
+        for name, current in endpoints.items():
+            before = baseline.get(size, {}).get(name)
+            if not before:
+                continue
+            if before['p95_ms'] and current['p95_ms'] > before['p95_ms'] * (1 + tolerance):
+                regressions.append(f"{size} devices, {name}: p95 {before['p95_ms']} -> {current['p95_ms']} ms")
+            if before['rps'] and current['rps'] < before['rps'] * (1 - tolerance):
+                regressions.append(f"{size} devices, {name}: {before['rps']} -> {current['rps']} req/s")
+    return regressions
+
+
+def load_app():
+    """
+    The real app, minus background threads that would skew the numbers.
+
+    Config reads the environment once, when it is first imported, so the
+    switches are set on the class itself before the app is created.
+    """
+    from config import Config
+    Config.POLLER_ENABLED = False
+    Config.HISTORY_ENABLED = False
+    Config.PERF_DEBUG_ENABLED = False
+    from api.app import app
+    return app
+
+
+def prepare(size, workdir, seed=0):
+    """Point the app's inventory at a synthetic seed file and give every device a sample"""
+    from api.services.inventory_service import inventory
+    from api.services.metrics_store import latest_metrics
+    from api.services.response_cache import analytics_cache
+
+    path = os.path.join(workdir, f'seed_{size}.json')
+    data = write_inventory(path, size, seed)
+    inventory.seed_path = path
+    inventory.reload()
+    inventory.get_version()
+    analytics_cache.clear()
+
+    rng = random.Random(seed)
+    now = time.time()
+    for device in data['devices']:
+        latest_metrics.put(device['id'], synthetic_sample(rng, device['status'], now))
+    return data
+
+
+def run(sizes, requests, concurrency, endpoints=None, seed=0):
+    app = load_app()
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in sizes:
+            started = time.perf_counter()
+            data = prepare(size, workdir, seed)
+            print(f"\n📦 {size:,} devices, {len(data['offices']):,} offices "
+                  f"(prepared in {time.perf_counter() - started:.1f}s)")
+            print(f"{'endpoint':18s} {'req/s':>9s} {'p50 ms':>9s} {'p95 ms':>9s} {'p99 ms':>9s} {'errors':>7s}")
+
+            results[str(size)] = {}
+            for name, make in ENDPOINTS.items():
+                if endpoints and name not in endpoints:
+                    continue
+                stats = run_endpoint(app, lambda rng: make(rng, data), requests, concurrency, seed)
+                results[str(size)][name] = stats
+                print(f"{name:18s} {stats['rps']:9.1f} {stats['p50_ms']:9.2f} {stats['p95_ms']:9.2f} "
+                      f"{stats['p99_ms']:9.2f} {stats['errors']:7d}")
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', default=','.join(str(s) for s in DEFAULT_SIZES),
+                        help='comma-separated inventory sizes')
+    parser.add_argument('--requests', type=int, default=200, help='measured requests per endpoint')
+    parser.add_argument('--concurrency', type=int, default=8, help='client threads')
+    parser.add_argument('--endpoints', default='', help='comma-separated subset of: ' + ', '.join(ENDPOINTS))
+    parser.add_argument('--baseline', default=BASELINE_PATH, help='baseline JSON file')
+    parser.add_argument('--save', action='store_true', help='write the results as the new baseline')
+    parser.add_argument('--compare', action='store_true', help='fail on regressions against the baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed slowdown, 0.25 = 25%%')
+    args = parser.parse_args(argv)
+
+    sizes = [int(s) for s in args.sizes.split(',') if s.strip()]
+    endpoints = {e.strip() for e in args.endpoints.split(',') if e.strip()}
+    results = run(sizes, args.requests, args.concurrency, endpoints)
+
+    regressions = []
+    if args.compare:
+        if not os.path.exists(args.baseline):
+            print(f"⚠️  No baseline at {args.baseline}, run with --save first")
+            return 1
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)['results']
+        regressions = compare(baseline, results, args.tolerance)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regression(s) beyond {args.tolerance:.0%}:")
+            for line in regressions:
+                print(f"   {line}")
+        else:
+            print(f"\n✅ No regressions beyond {args.tolerance:.0%}")
+
+    if args.save:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump({
+                'meta': {
+                    'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                    'python': platform.python_version(),
+                    'machine': platform.machine(),
+                    'cpus': os.cpu_count(),
+                    'requests': args.requests,
+                    'concurrency': args.concurrency
+                },
+                'results': results
+            }, f, indent=2)
+        print(f"\n💾 Baseline written to {args.baseline}")
+
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -262,12 +262,19 @@ def test_analytics_api():
             'include_alerts': True
         }
         response = requests.post(f'{BASE_URL}/analytics/reports/generate', json=report_data)
-        assert response.status_code == 201
+        assert response.status_code == 202
         
         report_response = response.json()
-        print_success(f"Report generated: {report_response['report_id']}")
+        print_success(f"Report queued: {report_response['job_id']}")
         
         report_id = report_response['report_id']
+        for _ in range(50):
+            job = requests.get(f"{BASE_URL}/analytics/reports/jobs/{report_response['job_id']}").json()
+            if job['status'] in ('done', 'failed'):
+                break
+            time.sleep(0.2)
+        assert job['status'] == 'done'
+        print_info(f"Job finished: {job['status']}")
         
         print(f"\n[Test 9] GET /analytics/reports/{report_id}")
         response = requests.get(f"{BASE_URL}/analytics/reports/{report_id}")
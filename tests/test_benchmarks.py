@@ -0,0 +1,121 @@
+"""
+Micro-benchmarks for analytics, model serialization and distance math.
+
+They run over a synthetic 10k-device fleet (see loadgen.py) and need the
+pytest-benchmark plugin from requirements-dev.txt; without it the module
+is skipped. To keep a baseline and fail on regressions:
+
+    pytest tests/test_benchmarks.py --benchmark-autosave --benchmark-storage=tests/baselines/benchmarks
+    pytest tests/test_benchmarks.py --benchmark-storage=tests/baselines/benchmarks \
+        --benchmark-compare --benchmark-compare-fail=mean:25%
+"""
+import sys
+import os
+import json
+import random
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+pytest.importorskip('pytest_benchmark')
+
+from loadgen import write_inventory, synthetic_sample
+
+FLEET_SIZE = 10000
+
+# short calibration so the benchmarks don't dominate a normal test run
+pytestmark = pytest.mark.benchmark(max_time=0.25, min_rounds=5)
+
+
+@pytest.fixture(scope='module')
+def fleet(tmp_path_factory):
+    from api.services.inventory_service import InventoryStore
+    from api.services.metrics_store import LatestMetricsStore
+    from api.services.fleet_frame import FleetFrame
+    from api.services.alert_service import AlertEngine
+    from api.services.analytics_service import AnalyticsService
+
+    seed = tmp_path_factory.mktemp('bench') / 'seed.json'
+    data = write_inventory(str(seed), FLEET_SIZE)
+    inventory_store = InventoryStore(str(seed), check_interval=0)
+
+    store = LatestMetricsStore()
+    frame = FleetFrame(inventory_store, store)
+    alerts = AlertEngine(inventory_store=inventory_store, store=store)
+    store.subscribe(frame.on_sample)
+    store.subscribe(alerts.on_sample)
+    frame.state()
+
+    rng = random.Random(0)
+    for device in data['devices']:
+        store.put(device['id'], synthetic_sample(rng, device['status'], 1700000000.0))
+
+    analytics = AnalyticsService(inventory_store, frame=frame, alerts=alerts)
+    return {'data': data, 'inventory': inventory_store, 'analytics': analytics}
+
+
+@pytest.mark.benchmark(group='analytics')
+def test_bench_global_summary(benchmark, fleet):
+    summary = benchmark(fleet['analytics'].get_global_summary)
+    assert summary['global_health']['total_devices'] == FLEET_SIZE
+
+
+@pytest.mark.benchmark(group='analytics')
+def test_bench_region_analytics(benchmark, fleet):
+    region = benchmark(fleet['analytics'].get_region_analytics, 'Africa')
+    assert region
+
+
+@pytest.mark.benchmark(group='analytics')
+def test_bench_health_score(benchmark, fleet):
+    analytics = fleet['analytics']
+    score = benchmark(lambda: analytics.calculate_health_score(analytics.get_global_summary()))
+    assert 0 <= score['health_score'] <= 100
+
+
+@pytest.mark.benchmark(group='analytics')
+def test_bench_device_distribution(benchmark, fleet):
+    distribution = benchmark(fleet['analytics'].get_device_type_distribution)
+    assert distribution['total_devices'] == FLEET_SIZE
+
+
+@pytest.mark.benchmark(group='analytics')
+def test_bench_top_performers(benchmark, fleet):
+    assert len(benchmark(fleet['analytics'].get_top_performers, 20)) == 20
+
+
+@pytest.mark.benchmark(group='analytics')
+def test_bench_alerts(benchmark, fleet):
+    result = benchmark(fleet['analytics'].get_alerts, None, 100)
+    assert len(result['alerts']) <= 100
+
+
+@pytest.mark.benchmark(group='serialization')
+def test_bench_device_to_dict(benchmark, fleet):
+    devices = fleet['inventory'].get_devices()
+    assert len(benchmark(lambda: [d.to_dict() for d in devices])) == FLEET_SIZE
+
+
+@pytest.mark.benchmark(group='serialization')
+def test_bench_fleet_json(benchmark, fleet):
+    fleet_columns = fleet['inventory'].get_fleet()
+    rows = fleet_columns.select()
+    body = benchmark(lambda: '[' + ', '.join(fleet_columns.iter_json(rows)) + ']')
+    assert len(json.loads(body)) == FLEET_SIZE
+
+
+@pytest.mark.benchmark(group='serialization')
+def test_bench_json_provider_dumps(benchmark, fleet):
+    from api.json_provider import dumps
+
+    payload = {'devices': [d.to_dict() for d in fleet['inventory'].get_devices()]}
+    assert benchmark(dumps, payload).startswith('{"devices":[')
+
+
+@pytest.mark.benchmark(group='geo')
+def test_bench_geo_distance(benchmark):
+    from api.services.geo_service import GeoService
+
+    geo = GeoService(http=object(), store=object())
+    assert benchmark(geo.get_distance, -1.2921, 36.8219, 51.5074, -0.1278) == 6820.53
@@ -0,0 +1,1172 @@
+import sys
+import os
+import json
+import asyncio
+import time
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.services.inventory_service import InventoryStore
+
+
+def write_seed(path, offices, devices):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'offices': offices, 'devices': devices}, f)
+
+
+def make_office(office_id, region='Africa'):
+    return {
+        'id': office_id, 'name': office_id, 'country': 'Kenya', 'region': region,
+        'city': 'Nairobi', 'latitude': -1.29, 'longitude': 36.82,
+        'timezone': 'Africa/Nairobi', 'status': 'active'
+    }
+
+
+def make_device(device_id, office_id, device_type='router', status='online'):
+    return {
+        'id': device_id, 'office_id': office_id, 'name': device_id,
+        'device_type': device_type, 'ip_address': '10.0.0.1', 'status': status
+    }
+
+
+def test_inventory_indexes(tmp_path):
+    seed = tmp_path / 'seed.json'
+    write_seed(seed, [make_office('CO-1'), make_office('CO-2', 'Asia-Pacific')], [
+        make_device('DEV-1', 'CO-1'),
+        make_device('DEV-2', 'CO-1', 'switch', 'offline'),
+        make_device('DEV-3', 'CO-2', 'switch'),
+    ])
+    store = InventoryStore(str(seed), check_interval=0)
+
+    assert store.get_office('CO-2').region == 'Asia-Pacific'
+    assert store.get_device('DEV-3').office_id == 'CO-2'
+    assert [d.id for d in store.get_office_devices('CO-1')] == ['DEV-1', 'DEV-2']
+    assert [d.id for d in store.get_devices(device_type='switch', status='online')] == ['DEV-3']
+    assert [d.id for d in store.get_region_devices('Asia-Pacific')] == ['DEV-3']
+    assert store.get_device('missing') is None
+
+
+def test_inventory_reloads_on_mtime_change(tmp_path):
+    seed = tmp_path / 'seed.json'
+    write_seed(seed, [make_office('CO-1')], [make_device('DEV-1', 'CO-1')])
+    store = InventoryStore(str(seed), check_interval=0)
+    version = store.get_version()
+
+    write_seed(seed, [make_office('CO-1')], [make_device('DEV-1', 'CO-1'), make_device('DEV-2', 'CO-1')])
+    stat = os.stat(seed)
+    os.utime(seed, (stat.st_atime, stat.st_mtime + 5))
+
+    assert len(store.get_devices()) == 2
+    assert store.get_version() == version + 1
+
+
+def test_inventory_retries_half_written_seed_and_returns_copies(tmp_path):
+    seed = tmp_path / 'seed.json'
+    seed.write_text('{"offices": [')
+    store = InventoryStore(str(seed), check_interval=0)
+    assert store.get_devices() == []
+
+    # finished writing within the same mtime tick
+    stat = os.stat(seed)
+    write_seed(seed, [make_office('CO-1')], [make_device('DEV-1', 'CO-1')])
+    os.utime(seed, (stat.st_atime, stat.st_mtime))
+    assert [d.id for d in store.get_devices()] == ['DEV-1']
+
+    store.get_office_devices('CO-1').clear()
+    store.get_offices(region='Africa').clear()
+    assert len(store.get_office_devices('CO-1')) == 1
+    assert len(store.get_offices(region='Africa')) == 1
+
+
+class FakeWalkEngine:
+    def __init__(self, table):
+        self.table = table
+
+    def walk_sync(self, host, oids, community='public', port=161, max_repetitions=None, max_rows=None):
+        return {oid: self.table.get(oid, []) for oid in oids}
+
+
+def test_interface_table_is_columnar():
+    from api.services.snmp_service import SNMPService
+
+    engine = FakeWalkEngine({
+        SNMPService.OID_IF_DESCR: [('1.3.6.1.2.1.2.2.1.2.1', 'Gi0/1'), ('1.3.6.1.2.1.2.2.1.2.2', 'Gi0/2')],
+        SNMPService.OID_IF_OPER_STATUS: [('1.3.6.1.2.1.2.2.1.8.1', 1), ('1.3.6.1.2.1.2.2.1.8.2', 2)],
+        SNMPService.OID_IF_HC_IN_OCTETS: [('1.3.6.1.2.1.31.1.1.1.6.2', 500)],
+    })
+    table = SNMPService(engine=engine).get_interface_table('10.0.0.1')
+
+    assert table['interface_count'] == 2
+    assert table['interfaces']['index'] == [1, 2]
+    assert table['interfaces']['descr'] == ['Gi0/1', 'Gi0/2']
+    assert table['interfaces']['oper_status'] == ['up', 'down']
+    assert table['interfaces']['hc_in_octets'] == [None, 500]
+    assert table['interfaces']['hc_out_octets'] == [None, None]
+
+
+def test_snmp_engine_maps_varbinds_and_advances_walk_cursors(monkeypatch):
+    from pysnmp.proto.rfc1902 import ObjectName, Integer32, OctetString
+    from pysnmp.proto.rfc1905 import NoSuchObject, EndOfMibView
+    from api.services import snmp_engine
+
+    descr, status = '1.3.6.1.2.1.2.2.1.2', '1.3.6.1.2.1.2.2.1.8'
+    table = {f'{descr}.{i}': OctetString(f'Gi0/{i}') for i in range(1, 6)}
+    table.update({f'{status}.{i}': Integer32(1) for i in range(1, 3)})
+    table['1.3.6.1.2.1.2.2.1.9.1'] = Integer32(0)   # next column, ends the status walk
+    order = sorted(table, key=lambda oid: tuple(map(int, oid.split('.'))))
+    requested = []
+
+    def after(oid):
+        key = tuple(map(int, oid.split('.')))
+        return next((o for o in order if tuple(map(int, o.split('.'))) > key), None)
+
+    async def get_cmd(engine, auth, target, context, *oids, lookupMib=False):
+        values = {'1.3.6.1.2.1.1.5.0': OctetString('core-1'), '1.3.6.1.2.1.1.3.0': Integer32(42)}
+        return None, 0, 0, [(ObjectName(oid), values.get(oid, NoSuchObject(''))) for oid in oids]
+
+    async def bulk_cmd(engine, auth, target, context, non_repeaters, max_repetitions, *cursors, lookupMib=False):
+        requested.append(list(cursors))
+        rows, current = [], list(cursors)
+        for _ in range(max_repetitions):
+            current = [after(oid) for oid in current]
+            rows.extend((ObjectName(oid), table[oid]) if oid else (ObjectName('1.3.6.1.9'), EndOfMibView(''))
+                        for oid in current)
+        return None, 0, 0, rows
+
+    async def get_target(host, port, timeout, retries):
+        if host == 'no-such-host.invalid':
+            raise RuntimeError('name resolution failed')
+        return host
+
+    monkeypatch.setattr(snmp_engine, 'get_cmd', get_cmd)
+    monkeypatch.setattr(snmp_engine, 'bulk_cmd', bulk_cmd)
+    # requested OIDs reach the stubs as plain strings
+    monkeypatch.setattr(snmp_engine, 'ObjectType', type('ObjectType', (str,), {}))
+    monkeypatch.setattr(snmp_engine, 'ObjectIdentity', str)
+    engine = snmp_engine.SNMPPollingEngine(max_repetitions=2)
+    monkeypatch.setattr(engine, '_get_target', get_target)
+    try:
+        values = engine.get_sync('10.0.0.1', ['1.3.6.1.2.1.1.5.0', '1.3.6.1.2.1.1.3.0', '1.3.6.1.2.1.1.4.0'])
+        assert values == {'1.3.6.1.2.1.1.5.0': 'core-1', '1.3.6.1.2.1.1.3.0': 42}
+
+        walked = engine.walk_sync('10.0.0.1', [descr, status])
+        assert walked[descr] == [(f'{descr}.{i}', f'Gi0/{i}') for i in range(1, 6)]
+        assert walked[status] == [(f'{status}.1', 1), (f'{status}.2', 1)]
+        # each round resumes from the last row seen, and a finished column drops out
+        assert requested == [[descr, status], [f'{descr}.2', f'{status}.2'], [f'{descr}.4']]
+
+        assert engine.walk_sync('10.0.0.1', [descr], max_rows=3)[descr][-1][0] == f'{descr}.3'
+        assert engine.get_sync('no-such-host.invalid', ['1.3.6.1.2.1.1.5.0']) is None
+        assert engine.walk_sync('no-such-host.invalid', [descr]) is None
+    finally:
+        engine.close()
+
+
+def test_poller_spreads_devices_across_interval(tmp_path):
+    from api.services.poller_service import FleetPoller
+    from api.services.metrics_store import LatestMetricsStore
+
+    seed = tmp_path / 'seed.json'
+    write_seed(seed, [make_office('CO-1')], [make_device(f'DEV-{i}', 'CO-1') for i in range(4)])
+    store = LatestMetricsStore()
+    poller = FleetPoller(InventoryStore(str(seed), check_interval=0), store,
+                         interval=60, concurrency=2, simulate=True)
+
+    poller._sync_schedule(1000.0)
+    dues = sorted(due for due, _, _ in poller._schedule)
+    assert dues == [1000.0, 1015.0, 1030.0, 1045.0]
+
+    sample = poller.poll_device('DEV-0')
+    assert store.get('DEV-0') is sample
+    assert sample['status'] == 'online' and 'cpu_usage' in sample
+
+
+class FakeAsyncSNMP:
+    """Stands in for SNMPService and its engine; submit() completes immediately"""
+
+    def __init__(self, results):
+        self.results = results
+        self.engine = self
+
+    def submit(self, coro):
+        from concurrent.futures import Future
+        future = Future()
+        try:
+            future.set_result(asyncio.run(coro))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    async def get_all_metrics_async(self, host, community='public', port=161):
+        result = self.results[host]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+
+def test_poller_drives_snmp_through_async_engine(tmp_path):
+    from api.services.poller_service import FleetPoller
+    from api.services.metrics_store import LatestMetricsStore
+
+    seed = tmp_path / 'seed.json'
+    devices = [make_device(f'DEV-{i}', 'CO-1') for i in range(3)]
+    for i, device in enumerate(devices):
+        device['ip_address'] = f'10.0.0.{i}'
+    write_seed(seed, [make_office('CO-1')], devices)
+    store = LatestMetricsStore()
+    poller = FleetPoller(InventoryStore(str(seed), check_interval=0), store,
+                         interval=60, concurrency=10, simulate=False)
+    poller._snmp = FakeAsyncSNMP({
+        '10.0.0.0': {'cpu': {'cpu_1min': 42}, 'memory': {'memory_percent': 61.5}},
+        '10.0.0.1': None,
+        '10.0.0.2': TimeoutError('no response'),
+    })
+
+    poller._sync_schedule(1000.0)
+    for due, _, device_id in sorted(poller._schedule):
+        poller._in_flight.add(device_id)
+        poller._dispatch(device_id, due)
+    poller._schedule = []
+    poller._drain_completed()
+
+    assert store.get('DEV-0')['cpu_usage'] == 42 and store.get('DEV-0')['memory_usage'] == 61.5
+    assert store.get('DEV-1')['status'] == 'offline'
+    assert store.get('DEV-2') is None
+    stats = poller.stats()
+    assert stats['polls_total'] == 3 and stats['errors_total'] == 1 and stats['in_flight'] == 0
+    assert stats['devices_scheduled'] == 3
+
+
+def test_history_store_roundtrip(tmp_path):
+    from api.services.history_store import MetricsHistoryStore
+
+    now = time.time()
+    store = MetricsHistoryStore(str(tmp_path / 'history.db'), flush_interval=0.05)
+    store.start()
+    store.append('DEV-1', {'ts': now - 40 * 86400, 'cpu_usage': 50.0})
+    for i in range(5):
+        store.append('DEV-1', {'ts': now + i, 'cpu_usage': float(i), 'status': 'online'})
+    store.append('DEV-2', {'ts': now + 2, 'cpu_usage': 99.0})
+    store.flush()
+    store.prune()
+    store.stop()
+
+    history = store.query('DEV-1', start=now + 1, end=now + 3, metrics=['cpu_usage'])
+    assert history['cpu_usage'] == [1.0, 2.0, 3.0]
+    assert len(history['timestamps']) == 3
+    assert len(store.query('DEV-1', start=0, end=now + 10)['timestamps']) == 5
+    assert len(store.query('DEV-3', start=0, end=now + 10)['timestamps']) == 0
+    with pytest.raises(ValueError, match='bogus'):
+        store.query('DEV-1', start=0, metrics=['bogus'])
+
+
+def test_rollups_cascade_to_coarser_resolutions(tmp_path):
+    from api.services.rollup_service import RollupService
+
+    seed = tmp_path / 'seed.json'
+    write_seed(seed, [make_office('CO-1')], [make_device('DEV-1', 'CO-1'), make_device('DEV-2', 'CO-1')])
+    rollups = RollupService(str(tmp_path / 'rollups.db'), InventoryStore(str(seed), check_interval=0), grace_seconds=0)
+    rollups.start()
+
+    start = (time.time() // 86400 - 2) * 86400
+    for minute in range(0, 1440):
+        ts = start + minute * 60
+        for device_id, cpu in (('DEV-1', 10.0), ('DEV-2', 30.0)):
+            rollups.ingest(device_id, ts, {'cpu_usage': cpu, 'online': 1.0}, now=ts)
+    rollups.flush()
+    rollups.stop()
+
+    resolution, buckets = rollups.query('office', 'CO-1', start, start + 86399, resolution=86400)
+    day = buckets[int(start)]['cpu_usage']
+    assert resolution == 86400
+    assert day['count'] == 2880
+    assert day['avg'] == 20.0
+    assert (day['min'], day['max']) == (10.0, 30.0)
+    assert abs(day['p95'] - 30.0) < 0.5
+
+    assert rollups.pick_resolution(86400, max_points=1000) == 300
+    assert rollups.pick_resolution(365 * 86400, max_points=1000) == 86400
+
+
+def test_rollups_survive_restart_with_open_buckets(tmp_path):
+    from api.services.rollup_service import RollupService
+
+    seed = tmp_path / 'seed.json'
+    write_seed(seed, [make_office('CO-1')], [make_device('DEV-1', 'CO-1')])
+    inventory_store = InventoryStore(str(seed), check_interval=0)
+    db = str(tmp_path / 'rollups.db')
+    base = (time.time() // 86400 - 1) * 86400
+
+    first = RollupService(db, inventory_store, grace_seconds=0)
+    first.start()
+    for minute in range(570):
+        first.ingest('DEV-1', base + minute * 60, {'cpu_usage': 10.0}, now=base + minute * 60)
+    first.close_buckets(base + 570 * 60)
+    first.stop()
+
+    # the 09:00 hour and the day were only open in memory when the process stopped
+    second = RollupService(db, inventory_store, grace_seconds=0)
+    assert second.restore_open(now=base + 570 * 60) > 0
+    second.start()
+    second.ingest('DEV-1', base + 100 * 60, {'cpu_usage': 99.0}, now=base + 570 * 60)
+    assert second.samples_late == 1
+    for minute in range(570, 1440):
+        second.ingest('DEV-1', base + minute * 60, {'cpu_usage': 30.0}, now=base + minute * 60)
+    second.flush()
+    second.stop()
+
+    _, days = second.query('device', 'DEV-1', base, base + 86399, resolution=86400)
+    day = days[int(base)]['cpu_usage']
+    assert day['count'] == 1440
+    assert abs(day['avg'] - (570 * 10.0 + 870 * 30.0) / 1440) < 1e-9
+    _, hours = second.query('device', 'DEV-1', base + 9 * 3600, base + 10 * 3600 - 1, resolution=3600)
+    hour = hours[int(base + 9 * 3600)]['cpu_usage']
+    assert hour['count'] == 60 and (hour['min'], hour['max']) == (10.0, 30.0)
+    assert abs(hour['p95'] - 30.0) < 0.5
+
+
+def test_analytics_aggregates_fleet_frame(tmp_path):
+    from api.services.analytics_service import AnalyticsService
+    from api.services.fleet_frame import FleetFrame
+    from api.services.metrics_store import LatestMetricsStore
+
+    seed = tmp_path / 'seed.json'
+    write_seed(seed, [make_office('CO-1'), make_office('CO-2', 'Asia-Pacific')], [
+        make_device('DEV-1', 'CO-1'),
+        make_device('DEV-2', 'CO-1', 'switch'),
+        make_device('DEV-3', 'CO-2', 'switch'),
+    ])
+    inventory_store = InventoryStore(str(seed), check_interval=0)
+    store = LatestMetricsStore()
+    frame = FleetFrame(inventory_store, store)
+    store.subscribe(frame.on_sample)
+    store.put('DEV-1', {'status': 'online', 'cpu_usage': 40.0, 'latency': 10.0})
+    frame.state()
+    store.put('DEV-2', {'status': 'online', 'cpu_usage': 80.0, 'latency': 30.0})
+    store.put('DEV-3', {'status': 'offline'})
+
+    analytics = AnalyticsService(inventory_store, frame=frame)
+    summary = analytics.get_global_summary()
+    assert summary['global_health']['online_devices'] == 2
+    assert summary['global_health']['active_offices'] == 1
+    assert summary['performance_metrics']['average_cpu_usage_pct'] == 60.0
+    assert summary['performance_metrics']['average_response_time_ms'] == 20.0
+    regions = {r['region']: r for r in summary['regional_breakdown']}
+    assert regions['Africa']['health_score'] == 95.0
+    assert regions['Asia-Pacific']['health_score'] == 0
+
+    assert [p['device_id'] for p in analytics.get_top_performers(limit=2)] == ['DEV-1', 'DEV-2']
+    distribution = analytics.get_device_type_distribution()['distribution']
+    assert [(d['type'], d['count']) for d in distribution] == [('Switch', 2), ('Router', 1)]
+
+
+def test_null_types_and_regions_group_as_unknown(tmp_path):
+    from api.services.analytics_service import AnalyticsService
+    from api.services.metrics_exporter import MetricsExporter
+    from api.services.fleet_frame import FleetFrame
+    from api.services.metrics_store import LatestMetricsStore
+
+    seed = tmp_path / 'seed.json'
+    office = make_office('CO-2', region=None)
+    office['status'] = None
+    write_seed(seed, [make_office('CO-1'), office], [
+        make_device('DEV-1', 'CO-1'),
+        make_device('DEV-2', 'CO-2', device_type=None, status=None),
+    ])
+    inventory_store = InventoryStore(str(seed), check_interval=0)
+    store = LatestMetricsStore()
+    frame = FleetFrame(inventory_store, store)
+    store.subscribe(frame.on_sample)
+    frame.state()
+    store.put('DEV-2', {'ts': 1700000000.0, 'status': 'online', 'cpu_usage': 20.0, 'memory_usage': 30.0, 'latency': 5.0})
+
+    analytics = AnalyticsService(inventory_store, frame=frame)
+    distribution = analytics.get_device_type_distribution()['distribution']
+    assert sorted(d['type'] for d in distribution) == ['Router', 'Unknown']
+    summary = analytics.get_global_summary()
+    assert summary['global_health']['active_offices'] == 2
+    assert {r['region'] for r in summary['regional_breakdown']} == {'Africa', 'Unknown'}
+    assert analytics.get_region_analytics('Unknown')['region'] == 'Unknown'
+    top = {p['device_id']: p for p in analytics.get_top_performers(limit=2)}
+    assert (top['DEV-2']['device_type'], top['DEV-2']['region']) == ('unknown', 'Unknown')
+
+    lines = ''.join(MetricsExporter(frame, namespace='test').render()).splitlines()
+    assert 'test_device_up{device_id="DEV-2",office_id="CO-2",region="Unknown",type="unknown"} 1.0' in lines
+    assert not any('None' in line for line in lines)
+
+
+def test_alert_engine_hysteresis_and_flapping(tmp_path):
+    from api.services.alert_service import AlertEngine
+
+    seed = tmp_path / 'seed.json'
+    write_seed(seed, [make_office('CO-1')], [make_device('DEV-1', 'CO-1')])
+    rules = [{'name': 'high_cpu', 'metric': 'cpu_usage', 'op': '>', 'threshold': 80, 'clear': 75,
+              'severity': 'warning', 'type': 'High CPU Usage', 'for_samples': 2}]
+    engine = AlertEngine(rules, InventoryStore(str(seed), check_interval=0), flap_window=300)
+
+    def feed(ts, cpu):
+        return engine.evaluate('DEV-1', {'cpu_usage': cpu, 'ts': ts})
+
+    assert feed(0, 90) == []                 # one breach is not enough
+    opened = feed(60, 91)
+    assert opened[0]['state'] == 'open' and opened[0]['office_id'] == 'CO-1'
+    assert feed(120, 95) == []               # deduplicated into the open alert
+    assert feed(180, 78) == []               # inside the hysteresis band
+    resolved = feed(240, 70)
+    assert resolved[0]['state'] == 'resolved' and resolved[0]['peak_value'] == 95
+    assert engine.counts()['warning'] == 0
+
+    feed(300, 90)
+    reopened = feed(360, 90)
+    assert reopened[0]['id'] == opened[0]['id'] and reopened[0]['flapping']
+
+    alerts = engine.query(severity='warning', office_id='CO-1')
+    assert len(alerts) == 1 and alerts[0]['count'] == 3
+    assert engine.query(severity='critical') == []
+    assert engine.counts() == {'critical': 0, 'warning': 1, 'info': 0}
+    # opened at 60 but firing again since 360
+    recent = engine.query(since=300)
+    assert [a['id'] for a in recent] == [opened[0]['id']] and recent[0]['reopened_at']
+
+
+def test_broadcaster_shares_frames_and_evicts_slow_clients():
+    from api.services.stream_service import EventBroadcaster, summary_delta
+
+    broadcaster = EventBroadcaster(summary_fn=lambda: {}, interval=60, max_queue=2)
+    fast = broadcaster.subscribe()
+    slow = broadcaster.subscribe()
+
+    broadcaster.publish('alert', {'id': 'ALERT-00001'})
+    frame = fast.queue.get_nowait()
+    assert frame.startswith('id: 1\nevent: alert\ndata: ') and slow.queue.get_nowait() is frame
+
+    for i in range(3):
+        broadcaster.publish('device', {'device_id': f'DEV-{i}'})
+        fast.queue.get_nowait()
+    assert slow.evicted and not fast.evicted
+    assert broadcaster.stats()['subscribers'] == 1
+    assert list(broadcaster.events(slow))[1:] == []
+    broadcaster.stop()
+
+    assert summary_delta({'a': 1, 'b': 2, 'timestamp': 't0'}, {'a': 1, 'b': 3, 'timestamp': 't1'}) == {'b': 3, 'timestamp': 't1'}
+
+
+def test_response_cache_single_flight_and_invalidation(tmp_path):
+    import threading
+    from api.services.response_cache import ResponseCache, cache_key
+    from api.services.metrics_store import LatestMetricsStore
+
+    seed = tmp_path / 'seed.json'
+    write_seed(seed, [make_office('CO-1')], [make_device('DEV-1', 'CO-1')])
+    store = LatestMetricsStore()
+    cache = ResponseCache(max_entries=2, ttl=60, min_age=0,
+                          inventory_store=InventoryStore(str(seed), check_interval=0), store=store)
+
+    calls = []
+    release = threading.Event()
+
+    def slow():
+        calls.append(1)
+        release.wait(5)
+        return {'value': len(calls)}
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_compute('k', slow))) for _ in range(5)]
+    for t in threads:
+        t.start()
+    time.sleep(0.1)
+    release.set()
+    for t in threads:
+        t.join()
+    assert len(calls) == 1 and results == [{'value': 1}] * 5
+    assert cache.get_or_compute('k', slow) == {'value': 1}
+
+    store.put('DEV-1', {'status': 'online'})
+    assert cache.get_or_compute('k', slow) == {'value': 2}
+    assert cache.stats()['invalidations'] == 1
+
+    cache.get_or_compute('a', dict)
+    cache.get_or_compute('b', dict)
+    assert cache.stats()['evictions'] == 1 and len(cache) == 2
+
+    assert cache_key('/x', {'b': ' 2', 'a': '1', 'c': ''}) == cache_key('/x', {'a': '1', 'b': '2'})
+    assert cache_key('/x', {'A': '1'}) != cache_key('/x', {'a': '1'})
+
+
+def test_middleware_etag_and_compression():
+    import gzip
+    from flask import Flask, jsonify
+    from api import middleware
+
+    app = Flask(__name__)
+    middleware.init_app(app)
+    calls = []
+
+    @app.route('/big')
+    @middleware.versioned(lambda: 'v1', max_age=60)
+    def big():
+        calls.append(1)
+        return jsonify({'rows': list(range(1000))})
+
+    client = app.test_client()
+    first = client.get('/big', headers={'Accept-Encoding': 'gzip'})
+    assert first.headers['Content-Encoding'] == 'gzip'
+    assert first.headers['Cache-Control'] == 'public, max-age=60'
+    assert len(gzip.decompress(first.data)) > len(first.data)
+
+    again = client.get('/big', headers={'If-None-Match': first.headers['ETag']})
+    assert again.status_code == 304 and not again.data
+    assert len(calls) == 1
+
+    plain = client.get('/big')
+    assert 'Content-Encoding' not in plain.headers
+    assert plain.headers['ETag'].strip('"') + '-gzip' == first.headers['ETag'].strip('"')
+
+
+def test_keyset_pages_and_streamed_lists():
+    from flask import Flask, request
+    from api.pagination import keyset_page, list_response, parse_fields, parse_limit
+    from config import Config
+
+    ids = [f'DEV-{i:03d}' for i in range(10)]
+    page, cursor = keyset_page(ids, None, 4, key=str)
+    assert page == ids[:4] and cursor == 'DEV-003'
+    page, cursor = keyset_page(ids, 'DEV-007', 4, key=str)
+    assert page == ids[8:] and cursor is None
+    page, cursor = keyset_page(ids, 'DEV-004', 3, key=str, reverse=True)
+    assert page == ['DEV-003', 'DEV-002', 'DEV-001'] and cursor == 'DEV-001'
+
+    app = Flask(__name__)
+
+    @app.route('/items')
+    def items():
+        fields = parse_fields(request.args, ('id', 'n'))
+        records = ({'id': i, 'n': i * 2} if fields is None else {'id': i} for i in range(2500))
+        return list_response({'total': 2500}, 'items', records, 2500)
+
+    client = app.test_client()
+    streamed = client.get('/items')
+    assert streamed.is_streamed and 2500 > Config.STREAM_LIST_THRESHOLD
+    body = streamed.get_json()
+    assert body['total'] == 2500 and body['items'][-1] == {'id': 2499, 'n': 4998}
+
+    lines = client.get('/items?format=ndjson&fields=id').data.decode().splitlines()
+    assert len(lines) == 2500 and json.loads(lines[0]) == {'id': 0}
+
+    with app.test_request_context('/?limit=abc'):
+        with pytest.raises(ValueError, match='^limit must be an integer$'):
+            parse_limit(request.args)
+
+
+def test_alert_pages_seek_cursor_and_project_fields(tmp_path):
+    from api.services.alert_service import AlertEngine
+    from api.json_provider import FastJSONProvider
+
+    seed = tmp_path / 'seed.json'
+    write_seed(seed, [make_office('CO-1')], [make_device(f'DEV-{i}', 'CO-1') for i in range(30)])
+    rules = [{'name': 'high_cpu', 'metric': 'cpu_usage', 'op': '>', 'threshold': 80,
+              'severity': 'warning', 'type': 'High CPU Usage'}]
+    engine = AlertEngine(rules, InventoryStore(str(seed), check_interval=0))
+    for i in range(30):
+        engine.evaluate(f'DEV-{i}', {'cpu_usage': 90, 'ts': 1000 + i})
+
+    seen, cursor = [], None
+    while True:
+        page = engine.query(limit=7, after=cursor, fields=['id', 'device_id'])
+        if not page:
+            break
+        assert all(set(alert) == {'id', 'device_id'} for alert in page)
+        seen.extend(alert['device_id'] for alert in page)
+        cursor = page[-1]['id']
+    assert seen == [f'DEV-{i}' for i in range(29, -1, -1)]
+
+    # jsonify bodies are compact even in debug, like the streamed lists
+    assert FastJSONProvider.compact is True
+
+
+def test_fleet_columns_match_device_dicts():
+    from api.models.device import Device
+    from api.models.fleet import Fleet
+
+    devices = [Device(id=f'DEV-{i:03d}', office_id=f'CO-{i % 3}', name=f'Dev "{i}"',
+                      device_type=('router', 'switch')[i % 2], ip_address=f'10.0.0.{i}',
+                      status=('online', 'offline', 'warning')[i % 3], last_seen=1700000000 + i % 2)
+               for i in range(20)]
+    devices.append(Device(id='DEV-999', office_id=None, name='Unknown', device_type=None,
+                          ip_address='10.0.0.99', status=None, last_seen=1700000000))
+    assert not hasattr(devices[0], '__dict__')
+    assert devices[0].last_seen.isoformat() == devices[0].to_dict()['last_seen']
+
+    fleet = Fleet(reversed(devices))
+    rows = fleet.select()
+    assert [json.loads(text) for text in fleet.iter_json(rows, batch=7)] == [d.to_dict() for d in devices]
+    assert [json.loads(text) for text in fleet.iter_json(rows, ['id', 'status'])] == \
+        [d.to_dict(['id', 'status']) for d in devices]
+
+    rows = fleet.select(device_type='router', office_id='CO-0')
+    assert [fleet.ids[r] for r in rows] == ['DEV-000', 'DEV-006', 'DEV-012', 'DEV-018']
+    assert len(fleet.select(status='rebooting')) == 0
+
+    page, cursor = fleet.page(rows, None, 3)
+    assert cursor == 'DEV-012'
+    page, cursor = fleet.page(rows, cursor, 3)
+    assert [fleet.ids[r] for r in page] == ['DEV-018'] and cursor is None
+
+    columns = json.loads(fleet.columns_json(rows, ['id', 'name']))
+    assert columns == {'id': ['DEV-000', 'DEV-006', 'DEV-012', 'DEV-018'],
+                       'name': ['Dev "0"', 'Dev "6"', 'Dev "12"', 'Dev "18"']}
+
+
+def test_gateway_coalesces_and_reuses_connections():
+    import threading
+    from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+    from api.services.http_gateway import HTTPGateway
+
+    hits = []
+    ports = set()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            hits.append(self.path)
+            ports.add(self.client_address[1])
+            time.sleep(0.2)
+            body = json.dumps({
+                'main': {'temp': 21.5, 'feels_like': 21.0, 'humidity': 50, 'pressure': 1010},
+                'weather': [{'description': 'clear sky', 'icon': '01d'}],
+                'wind': {'speed': 3.0}, 'clouds': {'all': 0}
+            }).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f'http://127.0.0.1:{server.server_address[1]}'
+
+    gateway = HTTPGateway({'stub': {'concurrency': 2, 'rate': 100, 'burst': 100}})
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(gateway.get_json('stub', f'{base}/weather', {'q': 1})))
+               for _ in range(20)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(hits) == 1 and len(results) == 20
+    assert gateway.stats()['stub']['coalesced'] == 19
+
+    gateway.get_json('stub', f'{base}/other')
+    gateway.get_json('stub', f'{base}/other')
+    assert len(ports) == 1
+    server.shutdown()
+
+
+def test_circuit_breaker_and_stale_while_revalidate():
+    import threading
+    import requests
+    from api.services.http_gateway import HTTPGateway, CircuitOpen
+    from api.services.swr_cache import StaleWhileRevalidate
+
+    class DownSession:
+        calls = 0
+
+        def get(self, url, params=None, timeout=None):
+            DownSession.calls += 1
+            raise requests.exceptions.ConnectionError('refused')
+
+    gateway = HTTPGateway({'down': {'rate': 100, 'burst': 100,
+                                    'breaker': {'min_requests': 3, 'open_seconds': 0.2}}})
+    gateway.provider('down').session = DownSession()
+    for _ in range(3):
+        with pytest.raises(requests.exceptions.ConnectionError):
+            gateway.get_json('down', 'http://down/x')
+    with pytest.raises(CircuitOpen):
+        gateway.get_json('down', 'http://down/x')
+    assert DownSession.calls == 3 and gateway.stats()['down']['circuit'] == 'open'
+
+    time.sleep(0.25)
+    with pytest.raises(requests.exceptions.ConnectionError):
+        gateway.get_json('down', 'http://down/x')   # half-open probe fails, reopens
+    assert DownSession.calls == 4 and gateway.stats()['down']['circuit_opened'] == 2
+
+    swr = StaleWhileRevalidate(ttl=0.05, max_stale=60, workers=2)
+    release = threading.Event()
+    loads = []
+
+    def loader():
+        loads.append(1)
+        if len(loads) > 1:
+            release.wait(2)
+        return len(loads)
+
+    assert swr.get('k', loader) == 1
+    time.sleep(0.1)
+    assert [swr.get('k', loader) for _ in range(10)] == [1] * 10
+    assert len(loads) == 2
+    release.set()
+    time.sleep(0.1)
+    assert swr.get('k', loader) == 2
+
+    bounded = StaleWhileRevalidate(ttl=60, max_stale=60, workers=1, max_entries=2)
+    for key in ('a', 'b', 'a', 'c'):
+        bounded.get(key, lambda: key)
+    assert bounded.peek('b') is None and bounded.peek('a')[0] == 'a'
+    assert bounded.stats()['evictions'] == 1
+
+
+
+def test_tiered_cache_memory_disk_and_eviction(tmp_path):
+    from api.services.tiered_cache import DiskStore, TieredCache
+
+    disk = DiskStore(str(tmp_path / 'cache.db'), max_bytes=10 ** 6)
+    cache = TieredCache(disk, max_entries=2, ttls={'geo': 86400 * 2, 'short': 0.05})
+
+    cache.set('geo', 'a', {'city': 'Nairobi'})
+    assert cache.get('geo', 'a') == {'city': 'Nairobi'} and cache.memory_hits == 1
+
+    # a second worker only shares the file, and multi-day TTLs hold
+    other = TieredCache(DiskStore(str(tmp_path / 'cache.db')), max_entries=2, ttls=cache.ttls)
+    assert other.get('geo', 'a') == {'city': 'Nairobi'} and other.disk_hits == 1
+    assert other.get('geo', 'a') == {'city': 'Nairobi'} and other.memory_hits == 1
+
+    cache.set('short', 'x', 1)
+    time.sleep(0.1)
+    assert cache.get('short', 'x') is None and other.get('short', 'x') is None
+
+    for i in range(3):
+        cache.set('geo', str(i), i)
+    assert len(cache._memory) == 2 and cache.get('geo', '0') == 0   # evicted from memory, found on disk
+
+    disk.max_bytes = 5
+    disk.prune()
+    assert disk.stats()['bytes'] <= 5
+    assert cache.clear('geo') >= 1 and cache.get('geo', '2') is None
+
+
+def test_batch_runs_sub_requests_concurrently():
+    import threading
+    import itertools
+    from flask import Flask, Blueprint, Response, jsonify
+    from api.routes import batch
+    from api.batch import parse_ids
+
+    app = Flask(__name__)
+    app.register_blueprint(batch.bp)
+    stream = Blueprint('stream', __name__, url_prefix='/api/v1/stream')
+    stream.add_url_rule('', 'events', lambda: Response(itertools.repeat('data: 1\n\n')))
+    app.register_blueprint(stream)
+    app.add_url_rule('/api/v1/endless', 'endless', lambda: Response(itertools.repeat('x')))
+    app.add_url_rule('/api/v1/post-only', 'post_only', lambda: 'ok', methods=['POST'])
+    running = []
+    peak = []
+    lock = threading.Lock()
+
+    @app.route('/api/v1/slow/<int:n>')
+    def slow(n):
+        with lock:
+            running.append(n)
+            peak.append(len(running))
+        time.sleep(0.1)
+        with lock:
+            running.remove(n)
+        if n == 3:
+            return jsonify({'error': 'nope'}), 404
+        return jsonify({'n': n})
+
+    client = app.test_client()
+    body = client.post('/api/v1/batch', json={'requests': [
+        {'id': i, 'path': f'/api/v1/slow/{i}'} for i in range(5)
+    ]}).get_json()
+    assert [r['id'] for r in body['responses']] == [0, 1, 2, 3, 4]
+    assert body['responses'][1] == {'id': 1, 'status': 200, 'body': {'n': 1}}
+    assert body['responses'][3]['status'] == 404
+    assert max(peak) > 1
+
+    assert client.post('/api/v1/batch', json={'requests': [{'path': '/api/v1/stream'}]}).status_code == 400
+    assert client.post('/api/v1/batch', json={'requests': [{'path': '/api/v1/%73tream'}]}).status_code == 400
+    body = client.post('/api/v1/batch', json={'requests': [
+        {'path': '/api/v1/endless'}, {'path': '/api/v1/post-only'}, {'path': '/api/v1/%62atch'},
+    ]}).get_json()
+    assert [r['status'] for r in body['responses']] == [400, 405, 405]   # streamed bodies are never read
+    assert body['responses'][1]['body'] == {'error': '405 METHOD NOT ALLOWED'}
+    assert client.post('/api/v1/batch', json={'requests': [{'path': '/api/v1/slow/1', 'method': 'POST'}]}).status_code == 400
+
+    assert parse_ids({'ids': 'b, a,b,,c'}, 'ids') == ['b', 'a', 'c']
+    assert parse_ids({}, 'ids') is None
+
+
+def test_spatial_index_matches_brute_force():
+    import numpy as np
+    from api.services.geo_service import GeoService
+    from api.services.spatial_index import SpatialIndex, haversine, distance_matrix, point_distance
+
+    rng = np.random.default_rng(7)
+    lats = rng.uniform(-85, 85, 300)
+    lons = rng.uniform(-180, 180, 300)
+    records = [{'id': f'O{i:03d}', 'latitude': lat, 'longitude': lon} for i, (lat, lon) in enumerate(zip(lats, lons))]
+
+    class Inventory:
+        def get_version(self):
+            return 1
+
+        def get_office_records(self):
+            return records
+
+    index = SpatialIndex(Inventory(), cell_degrees=5.0)
+    assert GeoService().get_distance(-1.2921, 36.8219, 51.5074, -0.1278) == 6820.53   # Nairobi-London
+    assert np.isclose(point_distance(lats[0], lons[0], lats[1], lons[1]), haversine(lats[0], lons[0], lats[1], lons[1]))
+
+    ids, matrix = index.matrix()
+    assert matrix.shape == (300, 300) and np.allclose(matrix, matrix.T)
+    assert np.allclose(matrix, distance_matrix(lats, lons))
+    assert index.matrix(['O002', 'nope', 'O001'])[0] == ['O002', 'O001']
+
+    for lat, lon, radius in [(0, 179.5, 1500), (60, -10, 800), (-84, 0, 3000), (10, 20, 20000)]:
+        brute = haversine(lat, lon, lats, lons)
+        expected = {f'O{i:03d}' for i in np.nonzero(brute <= radius)[0]}
+        assert {office_id for office_id, _ in index.within(lat, lon, radius)} == expected
+
+    nearest = index.nearest(lats[0], lons[0], k=4, exclude='O000')
+    brute = haversine(lats[0], lons[0], lats, lons)
+    brute[0] = np.inf
+    assert [office_id for office_id, _ in nearest] == [f'O{i:03d}' for i in np.argsort(brute)[:4]]
+
+    from flask import Flask
+    from api.routes import external
+    app = Flask(__name__)
+    app.register_blueprint(external.bp)
+    client = app.test_client()
+    for query in ('lat=&lng=1', 'lat=1', 'lat=x&lng=1', 'lat=91&lng=0'):
+        assert client.get(f'/api/v1/external/nearest?{query}').status_code == 400
+        assert client.get(f'/api/v1/external/within?{query}&radius_km=10').status_code == 400
+
+
+def test_time_engine_transitions_and_batch_convert():
+    from datetime import datetime
+    import pytz
+    from api.services.time_engine import TimeEngine, ZoneTable
+
+    class Inventory:
+        def get_version(self):
+            return 1
+
+        def get_office_records(self):
+            return [{'id': 'NY', 'timezone': 'America/New_York'}, {'id': 'NBO', 'timezone': 'Africa/Nairobi'},
+                    {'id': 'BAD', 'timezone': 'Mars/Olympus'}]
+
+    engine = TimeEngine(Inventory())
+    assert engine.warm() == 2
+
+    winter = datetime(2024, 1, 15, 12, tzinfo=pytz.utc).timestamp()
+    summer = datetime(2024, 7, 15, 12, tzinfo=pytz.utc).timestamp()
+    times = engine.office_times(['NY', 'NBO', 'BAD'], ts=summer)
+    assert set(times) == {'NY', 'NBO'}
+    assert times['NY']['utc_offset'] == '-04:00' and times['NY']['dst'] and times['NY']['abbreviation'] == 'EDT'
+    assert times['NBO']['datetime'].startswith('2024-07-15T15:00:00+03:00')
+    assert engine.local_time('America/New_York', winter)['utc_offset'] == '-05:00'
+    assert engine.local_time('UTC', winter)['utc_offset'] == '+00:00'
+
+    # every instant agrees with pytz, including right around the DST switch
+    table = ZoneTable('Europe/Berlin')
+    tz = pytz.timezone('Europe/Berlin')
+    instants = [datetime(2024, 3, 31, 0, 59, tzinfo=pytz.utc).timestamp() + step * 30 for step in range(4)]
+    assert list(table.offsets_at(instants)) == [
+        int(datetime.fromtimestamp(ts, tz).utcoffset().total_seconds()) for ts in instants
+    ]
+
+    converted = engine.convert(['2024-03-10T01:30:00', '2024-03-10T03:30:00', '2024-03-10T12:00:00Z'],
+                               'America/New_York', 'UTC')
+    assert converted == ['2024-03-10T06:30:00+00:00', '2024-03-10T07:30:00+00:00', '2024-03-10T12:00:00+00:00']
+
+
+def test_report_jobs_stream_gzip_and_serve_ranges(tmp_path, monkeypatch):
+    import gzip
+    import threading
+    from flask import Flask
+    from config import Config
+    from api.routes import analytics
+    from api.services.report_jobs import ReportQueue
+    from api.services.report_catalog import ReportCatalog
+
+    monkeypatch.setattr(Config, 'REPORTS_DIR', str(tmp_path))
+    catalog = ReportCatalog(str(tmp_path / 'catalog.db'), str(tmp_path))
+    reports = ReportQueue(workers=2, catalog=catalog)
+    monkeypatch.setattr(analytics, 'report_queue', reports)
+    monkeypatch.setattr(analytics, 'report_catalog', catalog)
+    gate = threading.Event()
+
+    def slow_rows():
+        gate.wait(2)
+        return [{'device': f'D{i}', 'cpu': i % 100} for i in range(5000)]
+
+    sections = [('summary', lambda: {'devices': 3}), ('rows', slow_rows)]
+    job = reports.submit({'type': 'summary', 'generated_by': 'test'}, sections)
+    csv_job = reports.submit({'type': 'summary', 'generated_by': 'test'}, sections, fmt='csv')
+
+    app = Flask(__name__)
+    app.register_blueprint(analytics.bp)
+    client = app.test_client()
+
+    time.sleep(0.1)
+    pending = client.get(f'/api/v1/analytics/reports/{job.id}')
+    assert pending.status_code == 202 and pending.get_json()['step'] == 'rows'
+    assert pending.get_json()['progress'] == 0.5
+
+    gate.set()
+    for _ in range(50):
+        if job.state == csv_job.state == 'done':
+            break
+        time.sleep(0.05)
+    assert job.state == 'done' and csv_job.state == 'done'
+
+    report = json.loads(gzip.decompress(open(job.path, 'rb').read()))
+    assert report['id'] == job.id and len(report['rows']) == 5000 and report['summary'] == {'devices': 3}
+
+    plain = client.get(f'/api/v1/analytics/reports/{job.id}')
+    assert json.loads(plain.data) == report and 'Content-Encoding' not in plain.headers
+
+    full = client.get(f'/api/v1/analytics/reports/{job.id}', headers={'Accept-Encoding': 'gzip'})
+    assert full.headers['Content-Encoding'] == 'gzip' and gzip.decompress(full.data) == plain.data
+    part = client.get(f'/api/v1/analytics/reports/{job.id}', headers={'Accept-Encoding': 'gzip', 'Range': 'bytes=0-99'})
+    assert part.status_code == 206 and part.data == full.data[:100]
+
+    rows = client.get(f'/api/v1/analytics/reports/{csv_job.id}?format=csv').data.decode().splitlines()
+    assert rows[0] == 'section,key,value' and 'rows,4999.cpu,99' in rows
+
+    listing = client.get('/api/v1/analytics/reports?fields=id,formats').get_json()
+    assert listing['total'] == 2 and listing['reports'][0] == {'id': csv_job.id, 'formats': ['csv']}
+
+    # another worker: its own queue, same catalog
+    other = ReportQueue(workers=1, catalog=catalog)
+    monkeypatch.setattr(analytics, 'report_queue', other)
+    assert client.get(f'/api/v1/analytics/reports/jobs/{job.id}').get_json()['status'] == 'done'
+    twin = ReportQueue(workers=1, catalog=catalog)
+    assert other.submit({'type': 'summary'}, []).id != twin.submit({'type': 'summary'}, []).id
+
+
+def test_report_catalog_pages_filters_and_retention(tmp_path):
+    import gzip
+    from api.services.report_catalog import ReportCatalog
+
+    with open(tmp_path / 'report_RPT-20240101000000.json', 'w') as f:
+        json.dump({'id': 'RPT-20240101000000', 'type': 'legacy', 'generated_by': 'ops',
+                   'generated_at': '2024-01-01T00:00:00'}, f, indent=2)
+
+    with open(tmp_path / 'report_RPT-20240101000001.json', 'w') as f:
+        f.write('{"id": "RPT-2024')   # truncated
+    with gzip.open(tmp_path / 'report_RPT-20240101000002.csv.gz', 'wt') as f:
+        f.write('section,key,value\nreport,type\n')
+
+    catalog = ReportCatalog(str(tmp_path / 'catalog.db'), str(tmp_path), retention_days=30, max_reports=20)
+    assert catalog.sync() == (1, 0)
+    assert catalog.get('RPT-20240101000001') is None and catalog.get('RPT-20240101000002') is None
+    assert catalog.get('RPT-20240101000000')['type'] == 'legacy'
+
+    now = time.time()
+    for i in range(30):
+        report_id = f'RPT-20250101{i:06d}'
+        catalog.add(report_id, {'type': 'summary' if i % 3 else 'audit', 'generated_by': f'user{i % 2}',
+                                'generated_at': f'2025-01-01T00:00:{i:02d}'}, 'json', 100, created=now - i)
+
+    records, cursor, total = catalog.query(limit=4)
+    assert total == 31 and [r['id'] for r in records] == [f'RPT-20250101{i:06d}' for i in (29, 28, 27, 26)]
+    seen = [r['id'] for r in records]
+    while cursor:
+        records, cursor, _ = catalog.query(limit=4, after=cursor)
+        seen += [r['id'] for r in records]
+    assert len(seen) == 31 and len(set(seen)) == 31
+
+    audits, _, total = catalog.query(report_type='audit', generated_by='user0')
+    assert total == 5 and all(r['type'] == 'audit' for r in audits)
+    by_user, cursor, _ = catalog.query(limit=3, sort='generated_by', descending=False)
+    rest, _, _ = catalog.query(sort='generated_by', descending=False, after=cursor)
+    assert [r['generated_by'] for r in by_user + rest] == sorted(r['generated_by'] for r in by_user + rest)
+    assert len(by_user + rest) == 31
+    assert catalog.query(since='2025-01-01T00:00:25')[2] == 5
+
+    # only the newest 20 survive, so the legacy report goes with the 10 oldest of the rest
+    assert catalog.prune() == 11
+    assert catalog.stats()['reports'] == 20 and not (tmp_path / 'report_RPT-20240101000000.json').exists()
+
+
+@pytest.mark.parametrize('backend', ['auto', 'json'])
+def test_json_provider_extra_types_and_fragments(backend, monkeypatch):
+    from datetime import datetime
+    import numpy as np
+    from flask import Flask, jsonify
+    from api.json_provider import FastJSONProvider, Timestamps, format_timestamps, fragment
+    from api.services.report_jobs import flatten
+    from config import Config
+
+    monkeypatch.setattr(Config, 'JSON_BACKEND', backend)
+
+    stamps = [1700000000.0, 1700000000.5, 1711846799.999999, 1711850400.25]
+    assert format_timestamps(stamps) == [datetime.fromtimestamp(ts).isoformat() for ts in stamps]
+
+    app = Flask(__name__)
+    app.json = FastJSONProvider(app)
+    cached = fragment({'b': [1, 2], 'a': 'ü'})
+
+    @app.route('/payload')
+    def payload():
+        return jsonify({
+            'when': datetime(2024, 5, 1, 12, 30),
+            'values': np.array([1.5, 2.5]),
+            'count': np.int64(3),
+            'timestamps': Timestamps(stamps[:2]),
+            'cached': cached,
+            'nested': [cached]
+        })
+
+    body = app.test_client().get('/payload').get_json()
+    assert body == {
+        'when': '2024-05-01T12:30:00', 'values': [1.5, 2.5], 'count': 3,
+        'timestamps': format_timestamps(stamps[:2]),
+        'cached': {'a': 'ü', 'b': [1, 2]}, 'nested': [{'a': 'ü', 'b': [1, 2]}]
+    }
+    assert cached.text == '{"a":"ü","b":[1,2]}'
+
+    with app.app_context():
+        assert app.json.loads(app.json.dumps(cached)) == {'a': 'ü', 'b': [1, 2]}
+
+    assert list(flatten({'ts': Timestamps(stamps[:1]), 'v': np.float32(0.5)})) == \
+        [('ts.0', format_timestamps(stamps[:1])[0]), ('v', 0.5)]
+
+
+def test_metrics_exporter_renders_openmetrics(tmp_path, monkeypatch):
+    from flask import Flask
+    from api import middleware
+    from api.routes import metrics
+    from api.services.fleet_frame import FleetFrame
+    from api.services.metrics_exporter import MetricsExporter
+    from api.services.metrics_store import LatestMetricsStore
+
+    seed = tmp_path / 'seed.json'
+    office = make_office('CO-1')
+    office['region'] = 'Latin "South"'
+    write_seed(seed, [office, make_office('CO-2')], [
+        make_device('DEV-1', 'CO-1'),
+        make_device('DEV-2', 'CO-1', 'switch'),
+        make_device('DEV-3', 'CO-2'),
+        make_device('DEV-4', 'CO-1'),
+    ])
+    inventory_store = InventoryStore(str(seed), check_interval=0)
+    store = LatestMetricsStore()
+    frame = FleetFrame(inventory_store, store)
+    store.subscribe(frame.on_sample)
+    frame.state()
+    store.put('DEV-1', {'ts': 1700000000.0, 'status': 'online', 'cpu_usage': 40.0, 'temperature': 55.5})
+    store.put('DEV-2', {'ts': 1700000001.0, 'status': 'online', 'cpu_usage': 80.0})
+    store.put('DEV-3', {'ts': 1700000002.0, 'status': 'offline'})
+
+    exporter = MetricsExporter(frame, namespace='test')
+    text = ''.join(exporter.render())
+    lines = text.splitlines()
+
+    dev1 = '{device_id="DEV-1",office_id="CO-1",region="Latin \\"South\\"",type="router"}'
+    assert f'test_device_cpu_usage_percent{dev1} 40.0' in lines
+    assert f'test_device_temperature_celsius{dev1} 55.5' in lines
+    assert '# UNIT test_device_cpu_usage_percent percent' in lines
+    # unreported metrics are left out rather than exported as NaN
+    assert not any(line.startswith('test_device_cpu_usage_percent{device_id="DEV-3"') for line in lines)
+    assert any(line.startswith('test_device_up{device_id="DEV-3"') and line.endswith(' 0.0') for line in lines)
+    assert not any('device_id="DEV-4"' in line for line in lines)   # never polled
+    assert 'test_office_cpu_usage_percent{office_id="CO-1",region="Latin \\"South\\""} 60.0' in lines
+    assert 'test_office_devices_online{office_id="CO-2",region="Africa"} 0.0' in lines
+    assert 'test_region_devices{region="Africa"} 1.0' in lines
+    assert lines[-1] == '# EOF'
+    assert exporter.last_series == sum(1 for line in lines if not line.startswith('#'))
+
+    # label sets are encoded once per inventory version
+    labels = exporter._labels
+    classic = ''.join(exporter.render(openmetrics=False))
+    assert exporter._labels is labels
+    assert '# EOF' not in classic and '# UNIT' not in classic
+
+    monkeypatch.setattr(metrics, 'metrics_exporter', exporter)
+    app = Flask(__name__)
+    app.register_blueprint(metrics.bp)
+    middleware.init_app(app)
+    client = app.test_client()
+    plain = client.get('/metrics')
+    assert plain.is_streamed and plain.get_data(as_text=True) == classic
+    packed = client.get('/metrics', headers={'Accept-Encoding': 'gzip'})
+    assert packed.headers['Content-Encoding'] == 'gzip'
+
+
+def test_perf_histograms_and_request_instrumentation(tmp_path, monkeypatch):
+    from flask import Flask, jsonify
+    from api import instrumentation
+    from api.services.perf_stats import LatencyHistogram, perf
+    from config import Config
+
+    histogram = LatencyHistogram()
+    for ms in range(1, 101):
+        histogram.observe(ms / 1000, ok=ms != 100)
+    stats = histogram.to_dict()
+    assert stats['count'] == 100 and stats['errors'] == 1
+    assert (stats['min_ms'], stats['max_ms']) == (1.0, 100.0)
+    assert 40 <= stats['p50_ms'] <= 55 and 90 <= stats['p95_ms'] <= 100
+    assert sum(stats['buckets']['counts']) == 100
+
+    monkeypatch.setattr(Config, 'SLOW_REQUEST_MS', 20)
+    monkeypatch.setattr(Config, 'PERF_DEBUG_ENABLED', True)
+    monkeypatch.setattr(Config, 'SLOW_REQUEST_LOG', str(tmp_path / 'logs' / 'slow.log'))
+    perf.reset()
+
+    app = Flask(__name__)
+    instrumentation.init_app(app)
+
+    @app.route('/items/<item_id>')
+    def item(item_id):
+        if item_id == 'slow':
+            time.sleep(0.03)
+        return jsonify({'id': item_id})
+
+    client = app.test_client()
+    for item_id in ('a', 'b', 'slow'):
+        assert client.get(f'/items/{item_id}').status_code == 200
+
+    endpoints = perf.snapshot('endpoint')
+    assert endpoints['GET /items/<item_id>']['count'] == 3
+    slow = list(perf.slow_requests)
+    assert len(slow) == 1 and slow[0]['path'] == '/items/slow' and slow[0]['duration_ms'] >= 20
+
+    profiled = client.get('/items/a?_profile=1')
+    assert profiled.mimetype == 'text/plain' and profiled.headers['X-Profile-Status'] == '200'
+    assert 'function calls' in profiled.get_data(as_text=True)
+
+    with perf.timer('upstream', 'snmp.get'):
+        pass
+    with pytest.raises(ValueError):
+        with perf.timer('upstream', 'snmp.get'):
+            raise ValueError('timeout')
+    assert perf.snapshot('upstream')['snmp.get']['errors'] == 1
+
+
+def test_loadgen_inventory_summary_and_regressions():
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from loadgen import synthetic_inventory, summarize, compare
+
+    data = synthetic_inventory(1000)
+    assert len(data['devices']) == 1000 and len(data['offices']) == 20
+    office_ids = {o['id'] for o in data['offices']}
+    assert all(d['office_id'] in office_ids for d in data['devices'])
+    assert synthetic_inventory(1000) == data
+
+    stats = summarize([i / 1000 for i in range(1, 101)], errors=2, wall_seconds=2.0)
+    assert stats['requests'] == 100 and stats['rps'] == 50.0 and stats['errors'] == 2
+    assert stats['p50_ms'] == 50.5 and stats['p99_ms'] == 99.01
+
+    baseline = {'1000': {'summary': {'p95_ms': 1.0, 'rps': 1000.0}, 'alerts': {'p95_ms': 2.0, 'rps': 500.0}}}
+    results = {'1000': {'summary': {'p95_ms': 1.2, 'rps': 900.0}, 'alerts': {'p95_ms': 3.0, 'rps': 300.0},
+                        'devices_all': {'p95_ms': 50.0, 'rps': 10.0}}}
+    regressions = compare(baseline, results, tolerance=0.25)
+    assert len(regressions) == 2 and all('alerts' in line for line in regressions)